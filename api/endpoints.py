@@ -1,15 +1,26 @@
 """
 API endpoints for the Graph RAG system.
 """
-from fastapi import APIRouter, HTTPException
+import json
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from langchain_core.prompts import PromptTemplate
 
-from .schemas import ChatRequest, ChatResponse, HealthResponse
+from .schemas import BatchChatItem, BatchChatRequest, BatchChatResponse, ChatRequest, ChatResponse, HealthResponse
 from src.llm import get_llm_client
 from src.llm.graph_client import GraphManager
+from src.llm.neo4j_driver import pool_metrics
 from src.llm.hybrid_search import HybridRetriever
-from src.llm.guardrail import DepartmentGuardrail, GuardrailResult
-from config.settings import settings
+from src.llm.guardrail import DepartmentGuardrail
+from src.llm.answer_cache import AnswerCache
+from src.llm.cache import load_questions
+from src.llm.chat_pipeline import ChatPipeline
+from src.llm.dag import StageError
+from src.llm.embeddings import get_embedding_model
+from src.llm import telemetry
+from src.llm.metrics import Sample, register_collector, render_prometheus
+from src.startup import startup_timer
+from config.settings import settings, resolve_path
 
 
 router = APIRouter()
@@ -19,6 +30,8 @@ _llm = None
 _retriever = None
 _guardrail = None
 _chain = None
+_pipeline = None
+_collector_registered = False
 
 
 def get_components():
@@ -31,21 +44,54 @@ def get_components():
     return _llm, _retriever, _guardrail, _chain
 
 
+def get_pipeline() -> ChatPipeline:
+    """Get the chat pipeline (lazy init if not pre-warmed)."""
+    if _pipeline is None:
+        init_components()
+    return _pipeline
+
+
+def preload_models():
+    """
+    Loads the embedding model weights without running inference. A prefork
+    master calls this before forking so workers share the weights
+    copy-on-write; running the model first would start thread pools that do
+    not survive fork.
+    """
+    with startup_timer.step("load embedding model"):
+        get_embedding_model()
+
+
 def init_components():
     """Initialize all components. Call at startup for pre-warming."""
-    global _llm, _retriever, _guardrail, _chain
+    global _llm, _retriever, _guardrail, _chain, _pipeline, _collector_registered
+    
+    if telemetry.configure(settings.general.api.observability) and not _collector_registered:
+        register_collector(_component_metrics)
+        _collector_registered = True
     
     print("[API] Initializing LLM client...")
-    _llm = get_llm_client()
+    with startup_timer.step("LLM client"):
+        _llm = get_llm_client()
     
     print("[API] Initializing Graph Manager & Hybrid Retriever...")
-    graph_manager = GraphManager()
-    _retriever = HybridRetriever(graph_manager)
+    with startup_timer.step("retriever (embedding model)"):
+        graph_manager = GraphManager()
+        _retriever = HybridRetriever(graph_manager)
+    if _retriever.vector_index is not None:
+        with startup_timer.step("local vector index"):
+            _retriever.vector_index.refresh(graph_manager)
+        print(f"[API] Local vector index ready with {len(_retriever.vector_index)} chunks")
+    with startup_timer.step("query cache warm-up"):
+        warmed = _retriever.warm_query_cache()
+    if warmed:
+        print(f"[API] Warmed query embedding cache with {warmed} questions")
     
     # Only init guardrail if enabled
     if settings.env.enable_guardrail:
         print("[API] Initializing Guardrail...")
-        _guardrail = DepartmentGuardrail(llm=_llm)
+        with startup_timer.step("guardrail"):
+            _guardrail = DepartmentGuardrail.from_settings(llm=_llm, embedding_model=_retriever.embedding_model)
     else:
         print("[API] Guardrail DISABLED")
         _guardrail = None
@@ -58,90 +104,174 @@ def init_components():
         template=template
     )
     _chain = prompt | _llm
+    _pipeline = ChatPipeline(_retriever, _guardrail, _chain, top_k=3, answer_cache=AnswerCache.from_settings())
     
     print("[API] All components initialized!")
 
 
+async def warm_answer_cache():
+    """Answer the configured frequent questions so they are served from cache."""
+    warmup_file = settings.general.api.answer_cache.warmup_file
+    pipeline = get_pipeline()
+    if not warmup_file or pipeline.answer_cache is None:
+        return
+    questions = load_questions(resolve_path(warmup_file))
+    print(f"[API] Warming answer cache with {len(questions)} questions...")
+    answered = await pipeline.warm_answer_cache(questions)
+    print(f"[API] Answer cache warm-up done ({answered}/{len(questions)} answered)")
+
+
+def _component_metrics():
+    """Cache, connection pool and startup figures read at scrape time."""
+    caches = {
+        "query_embedding": _retriever.query_cache if _retriever is not None else None,
+        "answer": _pipeline.answer_cache if _pipeline is not None else None,
+        "guardrail": _guardrail.decisions if _guardrail is not None else None,
+    }
+    for name, cache in caches.items():
+        if cache is None:
+            continue
+        stats = cache.stats()
+        labels = {"cache": name}
+        yield Sample("cache_hits_total", "counter", "Cache hits", labels, stats.hits)
+        yield Sample("cache_misses_total", "counter", "Cache misses", labels, stats.misses)
+        yield Sample("cache_entries", "gauge", "Entries held in memory", labels, stats.entries)
+
+    for driver, pool in pool_metrics().items():
+        labels = {"driver": driver}
+        yield Sample("neo4j_operations_in_flight", "gauge", "Neo4j sessions and queries running or awaiting a connection",
+                     labels, pool["in_flight"])
+        yield Sample("neo4j_pool_max_size", "gauge", "Neo4j connection pool size", labels, pool["max_size"])
+        yield Sample("neo4j_operations_total", "counter", "Neo4j sessions and queries started", labels, pool["operations"])
+        yield Sample("neo4j_operation_failures_total", "counter", "Failed Neo4j sessions and queries",
+                     labels, pool["failures"])
+
+    for step, seconds, _ in startup_timer.steps:
+        yield Sample("startup_step_seconds", "gauge", "Duration of each startup step", {"step": step}, seconds)
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
-    return HealthResponse()
+    return HealthResponse(neo4j_pool=pool_metrics())
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms (chat_stage_seconds),
+    LLM token counts, cache hit/miss counters and Neo4j pool demand.
+    """
+    if not telemetry.enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled (api.observability.enabled)")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response):
     """
     Chat endpoint for department-related questions.
     
-    1. Guardrail checks if question is department-related (if enabled)
+    1. Guardrail checks if question is department-related (if enabled),
+       concurrently with 2.
     2. Retrieves context via Hybrid RAG
     3. Generates answer using LLM
+    
+    Stage durations are returned in a Server-Timing header.
     """
-    llm, retriever, guardrail, chain = get_components()
+    pipeline = get_pipeline()
+    
+    # Guardrail, retrieval and generation run as a DAG: the guardrail is
+    # checked concurrently with embedding and retrieval (see ChatPipeline)
+    try:
+        result = await pipeline.run(request.question)
+    except StageError as e:
+        if e.stage == "generate":
+            raise HTTPException(status_code=500, detail=f"LLM error: {str(e.cause)}")
+        raise HTTPException(status_code=500, detail=f"Retrieval error: {str(e.cause)}")
     
-    # 1. Guardrail Check (if enabled)
-    if guardrail is not None:
-        guardrail_result = guardrail.check(request.question)
+    header = telemetry.server_timing(result.timings)
+    if header:
+        response.headers["Server-Timing"] = header
+    return ChatResponse(**_response_fields(result))
+
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answers many questions in one request (evaluation runs, bulk FAQs).
+    
+    Embedding, guardrail classification, retrieval and expansion each run
+    once for the whole batch; generations run concurrently up to
+    api.batch.max_in_flight. With `stream` set, results are sent as NDJSON
+    lines (each with its `index`) as soon as they are ready.
+    """
+    config = settings.general.api.batch
+    if len(request.questions) > config.max_questions:
+        raise HTTPException(status_code=422, detail=f"At most {config.max_questions} questions per batch")
+    pipeline = get_pipeline()
+    results = pipeline.run_batch(request.questions, max_in_flight=config.max_in_flight)
+    
+    if request.stream:
+        async def lines():
+            try:
+                async for index, result in results:
+                    item = BatchChatItem(index=index, error=result.error, **_response_fields(result))
+                    yield item.model_dump_json() + "\n"
+            except Exception as e:
+                yield json.dumps({"error": f"Batch failed: {str(e)}"}) + "\n"
         
-        if not guardrail_result.is_allowed:
-            return ChatResponse(
-                answer="I only answer questions about UET Lahore departments, programs, and faculty. " + guardrail_result.reason,
-                is_department_related=False,
-                guardrail_reason=guardrail_result.reason,
-                sources=[]
-            )
-    else:
-        # Guardrail disabled - always allow
-        guardrail_result = GuardrailResult(is_allowed=True, reason="Guardrail disabled")
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
     
-    # 2. Hybrid Retrieval
+    items = [None] * len(request.questions)
     try:
-        context = retriever.search(request.question, top_k=3)
+        async for index, result in results:
+            items[index] = BatchChatItem(index=index, error=result.error, **_response_fields(result))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Retrieval error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch failed: {str(e)}")
+    return BatchChatResponse(results=items)
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (server-sent events).
     
-    if not context:
-        return ChatResponse(
-            answer="I couldn't find any relevant information in the documents.",
-            is_department_related=True,
-            guardrail_reason=guardrail_result.reason,
-            sources=[]
-        )
+    Emits a `meta` event with sources and guardrail metadata as soon as
+    retrieval is done, then `token` events as the answer is generated,
+    and a final `done` event with the full answer. Failures are reported
+    as an `error` event.
+    """
+    pipeline = get_pipeline()
     
-    # 3. Generate Answer
-    try:
-        response = chain.invoke({"context": context, "question": request.question})
-        
-        # Robustly extract content
-        content = ""
-        raw_content = response.content if hasattr(response, "content") else response
-        
-        if isinstance(raw_content, list):
-            # Handle list of blocks (e.g. from Gemini: [{'type': 'text', 'text': '...'}])
-            for block in raw_content:
-                if isinstance(block, dict) and "text" in block:
-                    content += block["text"]
-                elif isinstance(block, str):
-                    content += block
-        else:
-            content = str(raw_content)
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
+    async def event_stream():
+        try:
+            async for event, data in pipeline.astream(request.question):
+                yield _sse(event, data)
+        except StageError as e:
+            yield _sse("error", {"detail": f"Retrieval error: {str(e.cause)}"})
+        except Exception as e:
+            yield _sse("error", {"detail": f"LLM error: {str(e)}"})
     
-    # Extract source chunk IDs from context
-    sources = []
-    for line in context.split("\n"):
-        if "ID:" in line:
-            try:
-                chunk_id = line.split("ID: ")[1].split(",")[0]
-                sources.append(chunk_id)
-            except:
-                pass
-    
-    return ChatResponse(
-        answer=content,
-        is_department_related=True,
-        guardrail_reason=guardrail_result.reason,
-        sources=sources
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+def _response_fields(result) -> dict:
+    """ChatResponse fields for a ChatResult."""
+    return {
+        "answer": result.answer,
+        "is_department_related": result.is_department_related,
+        "guardrail_reason": result.guardrail_reason,
+        "sources": result.sources,
+        "cached": result.cache_match is not None,
+        "cache_match": result.cache_match,
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -2,7 +2,7 @@
 Pydantic schemas for API request/response models.
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Annotated, Dict, List, Optional
 
 
 class ChatRequest(BaseModel):
@@ -16,9 +16,31 @@ class ChatResponse(BaseModel):
     is_department_related: bool = Field(..., description="Whether the question was classified as department-related")
     guardrail_reason: Optional[str] = Field(None, description="Reason from guardrail classification")
     sources: list[str] = Field(default_factory=list, description="List of source chunk IDs used for the answer")
+    cached: bool = Field(False, description="Whether the answer was served from the answer cache")
+    cache_match: Optional[str] = Field(None, description="Cache match type: 'exact' or 'semantic'")
+
+
+class BatchChatRequest(BaseModel):
+    """Request body for the /chat/batch endpoint."""
+    questions: List[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(
+        ..., min_length=1, description="Questions to answer"
+    )
+    stream: bool = Field(False, description="Stream results as NDJSON in completion order instead of one ordered JSON body")
+
+
+class BatchChatItem(ChatResponse):
+    """One answer in a /chat/batch response."""
+    index: int = Field(..., description="Position of the question in the request")
+    error: Optional[str] = Field(None, description="Set if answering this question failed")
+
+
+class BatchChatResponse(BaseModel):
+    """Response body for the /chat/batch endpoint."""
+    results: List[BatchChatItem] = Field(..., description="One result per question, in request order")
 
 
 class HealthResponse(BaseModel):
     """Response body for the /health endpoint."""
     status: str = "ok"
     version: str = "1.0.0"
+    neo4j_pool: Dict[str, Dict] = Field(default_factory=dict, description="Neo4j sessions and queries in flight per driver, against the pool size")
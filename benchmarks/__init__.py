@@ -0,0 +1,7 @@
+"""
+Offline stage-level benchmarks for the chat and ingestion paths.
+
+Everything runs in-process: a deterministic fake chat model is returned by
+get_llm_client, an in-memory graph stands in for GraphManager, and chunks
+come from the bundled prospectus PDF. See benchmarks/run.py.
+"""
@@ -0,0 +1,435 @@
+"""
+Local stand-ins for the LLM, the embedding model and Neo4j.
+
+- FakeChatModel answers deterministically from the prompt text, including
+  structured output for the guardrail and (packed) extraction schemas.
+- HashingEmbeddings embeds text by hashing its words into a fixed number of
+  dimensions, for machines without the sentence-transformers model.
+- InMemoryGraph is a GraphManager that keeps the graph in dictionaries and
+  answers the retrieval, expansion and write statements the app sends.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from src.llm.graph_client import GRAPH_VERSION_QUERY, GraphManager
+from src.llm.guardrail import GuardrailResult
+from src.llm.hybrid_search import (
+    BATCH_LOCAL_RETRIEVAL_QUERY,
+    BATCH_RETRIEVAL_QUERY,
+    LOCAL_RETRIEVAL_QUERY,
+    RETRIEVAL_QUERY,
+)
+from src.prompt_engineering.extraction import ChunkGraphData, Entity, GraphData, PackedGraphData, Relationship
+
+IN_SCOPE_WORDS = ("department", "program", "faculty", "admission", "degree", "uet", "engineering",
+                  "campus", "professor", "eligibility", "fee", "course", "lab", "bsc", "msc", "phd")
+NAME_PATTERN = re.compile(r"\b[A-Z][a-zA-Z]+(?: [A-Z][a-zA-Z]+)*")
+ENTITY_TYPES = ("Department", "Person", "DegreeProgram", "Facility")
+RELATIONSHIP_TYPES = ("OFFERS", "PART_OF", "TEACHES_IN", "LOCATED_IN")
+PACKED_CHUNK = re.compile(r"^### Chunk (\d+)$", re.MULTILINE)
+# Present in the single and the batched expansion query
+EXPANSION_MARKER = "WITH collect(DISTINCT s) AS seeds"
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _property_text(value) -> str:
+    # Mirrors ENTITY_PROJECTION: list values are joined with ", "
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def _prompt_text(prompt) -> str:
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, dict):
+        return " ".join(str(v) for v in prompt.values())
+    return str(prompt)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model whose output depends only on its input. `latency` (seconds)
+    is slept per call to model a provider's response time.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _result(self, messages) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        question = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+        names = list(dict.fromkeys(NAME_PATTERN.findall(prompt)))[:5]
+        answer = f"[{_digest(prompt) % 10_000:04d}] {question[:120]} See: {', '.join(names)}."
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    def with_structured_output(self, schema, **kwargs):
+        def respond(prompt):
+            if self.latency:
+                time.sleep(self.latency)
+            return structured_response(schema, _prompt_text(prompt))
+
+        async def arespond(prompt):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return structured_response(schema, _prompt_text(prompt))
+
+        return RunnableLambda(respond, afunc=arespond)
+
+
+def structured_response(schema, text: str):
+    if schema is GuardrailResult:
+        question = text.split("Question:")[-1].lower()
+        allowed = any(word in question for word in IN_SCOPE_WORDS)
+        return GuardrailResult(is_allowed=allowed, reason="keyword match" if allowed else "no department keywords")
+    if schema is GraphData:
+        return _graph_from_text(text.split("Text chunk:")[-1])
+    if schema is PackedGraphData:
+        parts = PACKED_CHUNK.split(text.split("Text chunks:")[-1])[1:]
+        return PackedGraphData(chunks=[
+            ChunkGraphData(chunk=int(number), **_graph_from_text(chunk).model_dump())
+            for number, chunk in zip(parts[::2], parts[1::2])
+        ])
+    raise NotImplementedError(f"No fake structured output for {schema.__name__}")
+
+
+def _graph_from_text(text: str, max_nodes: int = 12) -> GraphData:
+    names = list(dict.fromkeys(name for name in NAME_PATTERN.findall(text) if len(name) > 3))[:max_nodes]
+    nodes = []
+    for name in names:
+        entity_type = ENTITY_TYPES[_digest(name) % len(ENTITY_TYPES)]
+        node_id = f"{entity_type.lower()}::{re.sub(r'[^a-z0-9]+', '_', name.lower())}"
+        nodes.append(Entity(id=node_id, type=entity_type, name=name,
+                            properties={"description": f"{name} ({entity_type})"}))
+    edges = [
+        Relationship(source=a.id, target=b.id,
+                     type=RELATIONSHIP_TYPES[_digest(a.id + b.id) % len(RELATIONSHIP_TYPES)])
+        for a, b in zip(nodes, nodes[1:])
+    ]
+    return GraphData(nodes=nodes, edges=edges)
+
+
+@contextmanager
+def patch_llm_client(llm):
+    """
+    Makes get_llm_client return `llm` everywhere it has been imported.
+    """
+    import sys
+
+    replacement = lambda provider=None: llm  # noqa: E731
+    modules = ["src.llm.factory", "src.llm", "src.llm.extractor", "src.llm.guardrail", "api.endpoints"]
+    patched = []
+    for name in modules:
+        module = sys.modules.get(name)
+        if module is not None and hasattr(module, "get_llm_client"):
+            patched.append((module, module.get_llm_client))
+            module.get_llm_client = replacement
+    try:
+        yield llm
+    finally:
+        for module, original in patched:
+            module.get_llm_client = original
+
+
+class HashingEmbeddings:
+    """
+    Bag-of-words embeddings: every word adds +-1 to a hashed dimension.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.model_name = f"hashing-{dimension}"
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            h = _digest(word)
+            vector[h % self.dimension] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+class InMemoryGraph(GraphManager):
+    """
+    GraphManager whose graph lives in this process. Writes go through the
+    real GraphManager methods, which build the same UNWIND statements as
+    against Neo4j; _execute_write applies those statements here. Reads
+    answer the app's retrieval and expansion queries in Python.
+    """
+
+    def __init__(self):
+        self.chunks: Dict[str, Dict[str, Any]] = {}
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.mentions: Dict[str, set] = defaultdict(set)  # entity id -> chunk ids
+        self.mentioned: Dict[str, set] = defaultdict(set)  # chunk id -> entity ids
+        self.edges: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.adjacency: Dict[str, List[Tuple[str, str, str]]] = defaultdict(list)
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # Tombstones: deleted chunk id -> deletion time (ms)
+        self.deleted: Dict[str, int] = {}
+        self.version = 0
+        self._matrix: Optional[Tuple[List[str], np.ndarray]] = None
+        self._lock = threading.RLock()
+
+    # --- Writes ---
+    def _execute_write(self, statements: List[Tuple[str, dict]]):
+        with self._lock:
+            for cypher, params in statements:
+                rows = params["rows"]
+                if "MERGE (c:Chunk {id: row.id})" in cypher:
+                    self._write_chunks(rows)
+                elif "MATCH (c:Chunk {id: row.id})" in cypher:
+                    for row in rows:
+                        if row["id"] in self.chunks:
+                            self._set_chunk(row["id"], embedding=row["embedding"])
+                elif "MERGE (e:`" in cypher:
+                    label = re.search(r"MERGE \(e:`([^`]+)`", cypher).group(1)
+                    self._write_nodes(label, rows)
+                elif "MERGE (a)-[r:`" in cypher:
+                    rel_type = re.search(r"\[r:`([^`]+)`\]", cypher).group(1)
+                    self._write_edges(rel_type, rows)
+                else:
+                    raise NotImplementedError(f"Unsupported write statement: {cypher[:80]}")
+
+    def _write_chunks(self, rows: List[dict]):
+        for row in rows:
+            chunk = self._set_chunk(row["id"], text=row["text"])
+            if row.get("embedding") is not None:
+                chunk["embedding"] = np.asarray(row["embedding"], dtype=np.float32)
+            if row.get("doc_id") is not None:
+                chunk["doc_id"] = row["doc_id"]
+                self.documents.setdefault(row["doc_id"], {"chunk_ids": []})
+
+    def _set_chunk(self, chunk_id: str, **fields) -> Dict[str, Any]:
+        chunk = self.chunks.setdefault(chunk_id, {"id": chunk_id, "text": "", "embedding": None, "doc_id": None})
+        chunk.update(fields)
+        chunk["updated_at"] = int(time.time() * 1000)
+        self._matrix = None
+        return chunk
+
+    def _write_nodes(self, label: str, rows: List[dict]):
+        for row in rows:
+            node = self.nodes.setdefault(row["id"], {"labels": set(), "props": {}})
+            node["labels"].add(label)
+            node["props"].update(row["props"])
+            for chunk_id in row["chunk_ids"]:
+                if chunk_id in self.chunks:
+                    self.mentions[row["id"]].add(chunk_id)
+                    self.mentioned[chunk_id].add(row["id"])
+
+    def _write_edges(self, rel_type: str, rows: List[dict]):
+        for row in rows:
+            source, target = row["source"], row["target"]
+            if source not in self.nodes or target not in self.nodes:
+                continue
+            key = (source, rel_type, target)
+            if key not in self.edges:
+                self.adjacency[source].append(key)
+                if target != source:
+                    self.adjacency[target].append(key)
+            self.edges.setdefault(key, {}).update(row["props"])
+
+    def create_chunk_constraint(self):
+        pass
+
+    def create_vector_index(self, dimension: int = 384):
+        pass
+
+    def get_document_manifest(self, doc_id: str) -> set:
+        return set(self.documents.get(doc_id, {}).get("manifest", []))
+
+    def get_document_source(self, doc_id: str) -> Optional[str]:
+        return self.documents.get(doc_id, {}).get("source")
+
+    def set_document_manifest(self, doc_id: str, source: str, chunk_ids: List[str]):
+        with self._lock:
+            self.documents.setdefault(doc_id, {}).update(manifest=sorted(chunk_ids), source=source)
+
+    def get_document_chunk_ids(self, doc_id: str) -> set:
+        return {cid for cid, chunk in self.chunks.items() if chunk["doc_id"] == doc_id}
+
+    def delete_chunks(self, chunk_ids: List[str]) -> Tuple[int, int]:
+        with self._lock:
+            removed, orphans = 0, set()
+            for chunk_id in chunk_ids:
+                if self.chunks.pop(chunk_id, None) is not None:
+                    removed += 1
+                    self.deleted[chunk_id] = int(time.time() * 1000)
+                for entity_id in self.mentioned.pop(chunk_id, set()):
+                    self.mentions[entity_id].discard(chunk_id)
+                    if not self.mentions[entity_id]:
+                        orphans.add(entity_id)
+            for entity_id in orphans:
+                self.nodes.pop(entity_id, None)
+                for key in self.adjacency.pop(entity_id, []):
+                    self.edges.pop(key, None)
+            self._matrix = None
+            return removed, len(orphans)
+
+    def get_graph_version(self) -> int:
+        return self.version
+
+    async def aget_graph_version(self) -> int:
+        return self.version
+
+    def bump_graph_version(self) -> int:
+        with self._lock:
+            self.version += 1
+            return self.version
+
+    # --- Reads used by the local vector index ---
+    def get_chunk_embedding_page(self, updated_after: int = None, after_id: str = "", limit: int = 2000) -> List[dict]:
+        rows = sorted(
+            (chunk for chunk in self.chunks.values()
+             if chunk["embedding"] is not None
+             and chunk["id"] > (after_id or "")
+             and (updated_after is None or chunk["updated_at"] > updated_after)),
+            key=lambda chunk: chunk["id"],
+        )[:limit]
+        return [{"id": c["id"], "embedding": c["embedding"].tolist(), "updated_at": c["updated_at"]} for c in rows]
+
+    def get_deleted_chunk_ids(self, deleted_after: int) -> Optional[set]:
+        return {cid for cid, deleted_at in self.deleted.items() if deleted_at > deleted_after}
+
+    def get_embedded_chunk_ids(self) -> set:
+        return {cid for cid, chunk in self.chunks.items() if chunk["embedding"] is not None}
+
+    def backfill_chunk_timestamps(self, batch_size: int = 10_000) -> int:
+        # Chunks written here always carry updated_at
+        return 0
+
+    # --- Cypher reads ---
+    def query(self, cypher: str, params: dict = None) -> List[dict]:
+        raise NotImplementedError(f"Unsupported statement for the in-memory graph: {cypher[:80]}")
+
+    def read(self, cypher: str, params: dict = None) -> List[dict]:
+        return self._answer(cypher, params or {})
+
+    async def aquery(self, cypher: str, params: dict = None) -> List[dict]:
+        return self._answer(cypher, params or {})
+
+    def _answer(self, cypher: str, params: dict) -> List[dict]:
+        if cypher == GRAPH_VERSION_QUERY:
+            return [{"version": self.version}]
+        if cypher == RETRIEVAL_QUERY:
+            return self._retrieve(self._vector_hits(params["embedding"], params["k"]), params)
+        if cypher == LOCAL_RETRIEVAL_QUERY:
+            return self._retrieve(params["hits"], params)
+        if cypher in (BATCH_RETRIEVAL_QUERY, BATCH_LOCAL_RETRIEVAL_QUERY):
+            records = []
+            for i, item in enumerate(params["batch"]):
+                hits = self._vector_hits(item, params["k"]) if cypher == BATCH_RETRIEVAL_QUERY else item
+                records.extend({"i": i, **record} for record in self._retrieve(hits, params))
+            return records
+        if EXPANSION_MARKER in cypher:
+            hops = cypher.count("CALL (frontier, seen, budget)")
+            if "$batch" in cypher:
+                return [{"i": i, "facts": self._expand(ids, params, hops)} for i, ids in enumerate(params["batch"])]
+            return [{"facts": self._expand(params["chunk_ids"], params, hops)}]
+        raise NotImplementedError(f"Unsupported query for the in-memory graph: {cypher[:80]}")
+
+    def _vector_hits(self, embedding: List[float], k: int) -> List[dict]:
+        with self._lock:
+            if self._matrix is None:
+                ids = [cid for cid, chunk in self.chunks.items() if chunk["embedding"] is not None]
+                matrix = np.vstack([self.chunks[cid]["embedding"] for cid in ids]) if ids else np.zeros((0, 0))
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True) if ids else 1.0
+                self._matrix = (ids, matrix / np.where(norms == 0, 1.0, norms))
+            ids, matrix = self._matrix
+        if not ids:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        similarities = matrix @ (query / (np.linalg.norm(query) or 1.0))
+        top = np.argsort(similarities)[::-1][:k]
+        return [{"id": ids[i], "score": float((1.0 + similarities[i]) / 2.0)} for i in top]
+
+    def _retrieve(self, hits: List[dict], params: dict) -> List[dict]:
+        hits = sorted((h for h in hits if h["id"] in self.chunks), key=lambda h: h["score"], reverse=True)
+        if not hits:
+            return []
+        chunks = [{"id": h["id"], "text": self.chunks[h["id"]]["text"], "score": h["score"]} for h in hits]
+
+        mentions: Dict[str, List[str]] = defaultdict(list)
+        for hit in hits:
+            for entity_id in self.mentioned.get(hit["id"], ()):
+                props = self.nodes[entity_id]["props"]
+                mentions[props.get("name") or entity_id].append(entity_id)
+        entities = []
+        for name, entity_ids in sorted(mentions.items(), key=lambda item: len(item[1]), reverse=True):
+            node = self.nodes[entity_ids[0]]
+            props = node["props"]
+            entities.append({
+                "name": name,
+                "properties": [["type", sorted(node["labels"])[0]]] + [
+                    [k, _property_text(props[k])[:params["max_length"]]]
+                    for k in params["properties"] if props.get(k) is not None
+                ],
+            })
+        return [{"chunks": chunks, "entities": entities[:params["max_entities"]]}]
+
+    def _degree(self, node_id: str) -> int:
+        return len(self.adjacency.get(node_id, ())) + len(self.mentions.get(node_id, ()))
+
+    def _expand(self, chunk_ids: List[str], params: dict, hops: int) -> List[dict]:
+        seeds = list(dict.fromkeys(e for cid in chunk_ids for e in self.mentioned.get(cid, ())))
+        seen = set(seeds)
+        frontier = [s for s in seeds if self._degree(s) <= params["max_degree"]]
+        budget = params["max_nodes"]
+        allowed_types = set(params["relationship_types"])
+        facts = []
+        for hop in range(1, hops + 1):
+            reached: Dict[str, Tuple[str, str, str]] = {}
+            for node_id in frontier:
+                followed = 0
+                for key in self.adjacency.get(node_id, ()):
+                    if followed >= params["fan_out"]:
+                        break
+                    source, rel_type, target = key
+                    other = target if source == node_id else source
+                    if other in seen or (allowed_types and rel_type not in allowed_types):
+                        continue
+                    followed += 1
+                    reached.setdefault(other, key)
+            ranked = sorted(reached.items(), key=lambda item: self._degree(item[0]))[:max(budget, 0)]
+            for other, (source, rel_type, target) in ranked:
+                facts.append({
+                    "source": self.nodes[source]["props"].get("name", source),
+                    "type": rel_type,
+                    "target": self.nodes[target]["props"].get("name", target),
+                    "hop": hop,
+                })
+            seen.update(other for other, _ in ranked)
+            frontier = [other for other, _ in ranked if self._degree(other) <= params["max_degree"]]
+            budget -= len(ranked)
+        return facts
@@ -0,0 +1,334 @@
+"""
+Stage-level latency and throughput benchmark, fully offline.
+
+Usage:
+    python -m benchmarks.run --output .cache/bench.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+    python -m benchmarks.run --llm-latency-ms 200 --embeddings model
+    python -m benchmarks.run --llm-latency-ms 200 --packed
+
+Ingestion runs the real IngestionPipeline over the bundled prospectus PDF
+into an in-memory graph, timing every chunk, extraction call and graph
+write (a chunk's time includes parsing its page unless the page is in
+the parsed-text cache, which it is on re-runs). The questions in
+tests/test_queries.json are then answered against that graph through the
+local vector index, timing each stage on its own (guardrail, embedding,
+vector search, enrichment, generation) and the whole /chat pipeline, one
+question at a time and as one batch.
+
+The LLM is a deterministic fake (optionally sleeping --llm-latency-ms per
+call) and, unless --embeddings model is given and the model is cached
+locally, embeddings are word hashes. The numbers therefore measure this
+code base, not the model providers.
+
+Every stage reports count, mean, p50, p95 and p99 latency (ms) and
+throughput (items per second of time spent in the stage). With --baseline,
+p50 and p95 are compared with a stored result; the exit code is 1 if any
+stage is slower than the baseline by more than --tolerance.
+"""
+import os
+
+# Settings require a password even though nothing connects to Neo4j
+os.environ.setdefault("NEO4J_PASSWORD", "benchmark")
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+
+from config.settings import settings, resolve_path
+
+STAGES = ("chunking", "extraction", "graph_writes", "ingestion",
+          "embedding", "guardrail", "vector_search", "enrichment", "generation", "chat", "chat_batch")
+DEFAULT_PDF = "data/files/UET lahore Document.pdf"
+DEFAULT_QUESTIONS = "tests/test_queries.json"
+
+
+class StageTimer:
+    """
+    Collects one latency sample per call; `items` is how many units of
+    work (chunks, questions) the call covered, for throughput.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.items: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def measure(self, stage: str, items: int = 1):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, items)
+
+    def record(self, stage: str, seconds: float, items: int = 1):
+        self.samples[stage].append(seconds)
+        self.items[stage] += items
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for stage in STAGES:
+            samples = np.asarray(self.samples.get(stage, []), dtype=np.float64)
+            if not len(samples):
+                continue
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+            total = float(samples.sum())
+            result[stage] = {
+                "count": int(len(samples)),
+                "items": self.items[stage],
+                "total_s": round(total, 4),
+                "mean_ms": round(float(samples.mean()) * 1000, 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "throughput_per_s": round(self.items[stage] / total, 2) if total else None,
+            }
+        return result
+
+
+def load_embedding_model(kind: str):
+    from benchmarks.fakes import HashingEmbeddings
+
+    if kind == "hashing":
+        return HashingEmbeddings(), "hashing"
+    # Only a model already in the local cache; never download
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    try:
+        from src.llm.embeddings import get_embedding_model
+        model = get_embedding_model()
+        model.embed_query("warm-up")
+        return model, settings.general.llm.embedding_model
+    except Exception as e:
+        if kind == "model":
+            raise
+        print(f"[Bench] Embedding model unavailable ({e}); using hashing embeddings", file=sys.stderr)
+        return HashingEmbeddings(), "hashing"
+
+
+def bench_ingestion(timer: StageTimer, graph, embedding_model, pdf_path: str, max_in_flight: int,
+                    packed: bool = False):
+    """
+    Runs the ingestion pipeline once with its stages instrumented. With
+    `packed`, an extraction sample is one packed request covering several chunks.
+    """
+    from src.ingestion import pipeline as ingestion
+
+    pipeline = ingestion.IngestionPipeline(graph_manager=graph, embedding_model=embedding_model,
+                                           max_in_flight=max_in_flight, requests_per_minute=0,
+                                           pack_extraction=packed)
+
+    iter_chunks = pipeline._iter_chunks
+
+    def timed_chunks(path):
+        chunks = iter_chunks(path)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            timer.record("chunking", time.perf_counter() - started)
+            yield chunk
+
+    def timed(stage, func, items=lambda *args, **kwargs: 1):
+        def wrapper(*args, **kwargs):
+            with timer.measure(stage, items(*args, **kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+
+    extract = ingestion.extract_graph_from_text
+    extract_packed = ingestion.extract_graphs_from_texts
+    pipeline._iter_chunks = timed_chunks
+    # Chunk upserts (embed stage) and entity/relationship batches (write stage)
+    graph.add_chunks = timed("graph_writes", graph.add_chunks, items=lambda batch: len(batch))
+    graph.add_graph_batch = timed("graph_writes", graph.add_graph_batch, items=lambda batch: len(batch))
+    ingestion.extract_graph_from_text = timed(
+        "extraction", lambda text, rate_limiter=None: extract(text, use_cache=False, rate_limiter=rate_limiter)
+    )
+    ingestion.extract_graphs_from_texts = timed(
+        "extraction",
+        lambda texts, rate_limiter=None: extract_packed(texts, use_cache=False, rate_limiter=rate_limiter),
+        items=lambda texts, **kwargs: len(texts),
+    )
+    try:
+        stats = pipeline.run(pdf_path, incremental=False)
+    finally:
+        ingestion.extract_graph_from_text = extract
+        ingestion.extract_graphs_from_texts = extract_packed
+        del graph.add_chunks, graph.add_graph_batch
+    timer.record("ingestion", stats.elapsed, items=stats.chunks)
+    return stats
+
+
+async def bench_questions(timer: StageTimer, graph, embedding_model, llm, questions: List[str],
+                          repeat: int, concurrency: int, top_k: int):
+    from langchain_core.prompts import PromptTemplate
+    from src.llm.chat_pipeline import ChatPipeline
+    from src.llm.guardrail import DepartmentGuardrail
+    from src.llm.hybrid_search import LOCAL_RETRIEVAL_QUERY, HybridRetriever
+    from src.llm.vector_index import LocalVectorIndex
+
+    local = settings.general.retrieval.local_index
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as index_path:
+        index = LocalVectorIndex(index_path, refresh_interval=float("inf"),
+                                 quantization=local.quantization, rescore_factor=local.rescore_factor)
+        index.sync(graph)
+        retriever = HybridRetriever(graph, embedding_model, vector_index=index)
+        # Every sample does the full work: no query embedding cache
+        retriever.query_cache = None
+        guardrail = DepartmentGuardrail.from_settings(llm=llm, embedding_model=embedding_model)
+        chain = PromptTemplate(input_variables=["context", "question"], template=settings.prompts.rag_prompt) | llm
+
+        for _ in range(repeat):
+            guardrail.decisions.clear()
+            for question in questions:
+                with timer.measure("embedding"):
+                    embedding = retriever.embed_query(question)
+                with timer.measure("guardrail"):
+                    await guardrail.acheck(question, embedding=embedding)
+                with timer.measure("vector_search"):
+                    hits = index.search(embedding, top_k=top_k)
+                with timer.measure("enrichment"):
+                    records = await graph.aquery(LOCAL_RETRIEVAL_QUERY, {**retriever._projection_params(), "hits": hits})
+                    chunks, entities = retriever._unpack(records)
+                    facts = await retriever.aexpand([c["id"] for c in chunks])
+                    context = retriever.build_context(chunks, entities, facts)
+                with timer.measure("generation"):
+                    await chain.ainvoke({"context": context.text, "question": question})
+
+        pipeline = ChatPipeline(retriever, guardrail, chain, top_k=top_k, answer_cache=None)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def chat(question):
+            async with slots:
+                with timer.measure("chat"):
+                    await pipeline.run(question)
+
+        for _ in range(repeat):
+            guardrail.decisions.clear()
+            await asyncio.gather(*(chat(q) for q in questions))
+
+        for _ in range(repeat):
+            guardrail.decisions.clear()
+            with timer.measure("chat_batch", items=len(questions)):
+                async for _ in pipeline.run_batch(questions, max_in_flight=concurrency):
+                    pass
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Prints p50/p95 against the baseline; returns the regressed stages.
+    """
+    regressions = []
+    print(f"\n{'stage':<14} {'p50 ms':>10} {'base':>10} {'change':>8}   {'p95 ms':>10} {'base':>10} {'change':>8}")
+    for stage, stats in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            print(f"{stage:<14} {stats['p50_ms']:>10.3f} {'-':>10} {'new':>8}")
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms"):
+            changes.append(stats[key] / base[key] - 1.0 if base[key] else 0.0)
+        print(f"{stage:<14} {stats['p50_ms']:>10.3f} {base['p50_ms']:>10.3f} {changes[0]:>+8.1%}"
+              f"   {stats['p95_ms']:>10.3f} {base['p95_ms']:>10.3f} {changes[1]:>+8.1%}")
+        if max(changes) > tolerance:
+            regressions.append(stage)
+    return regressions
+
+
+def print_summary(stages: Dict[str, Dict]):
+    print(f"\n{'stage':<14} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'items/s':>10}")
+    for stage, stats in stages.items():
+        print(f"{stage:<14} {stats['count']:>6} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+              f"{stats['p99_ms']:>10.3f} {stats['throughput_per_s'] or 0:>10.1f}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline stage-level benchmark.")
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the questions per stage")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions in flight for chat / chat_batch")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM response time")
+    parser.add_argument("--embeddings", choices=["auto", "model", "hashing"], default="auto",
+                        help="auto: the configured model if cached locally, else word hashing")
+    parser.add_argument("--packed", action="store_true", help="Extract several chunks per LLM request")
+    parser.add_argument("--skip-ingestion", action="store_true", help="Only report the question stages")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    from benchmarks.fakes import FakeChatModel, InMemoryGraph, patch_llm_client
+    from src.llm.cache import load_questions
+
+    questions = load_questions(resolve_path(args.questions))
+    embedding_model, embeddings_name = load_embedding_model(args.embeddings)
+    llm = FakeChatModel(latency=args.llm_latency_ms / 1000.0)
+    timer = StageTimer()
+    graph = InMemoryGraph()
+
+    with patch_llm_client(llm):
+        stats = bench_ingestion(timer, graph, embedding_model, resolve_path(args.pdf),
+                                max_in_flight=settings.general.ingestion.max_in_flight, packed=args.packed)
+        if stats.errors:
+            print(f"[Bench] Ingestion reported {len(stats.errors)} errors, first: {stats.errors[0]}", file=sys.stderr)
+        if args.skip_ingestion:
+            # The graph is still built, its timings are just not reported
+            for stage in ("chunking", "extraction", "graph_writes", "ingestion"):
+                timer.samples.pop(stage, None)
+        asyncio.run(bench_questions(timer, graph, embedding_model, llm, questions,
+                                    repeat=args.repeat, concurrency=args.concurrency, top_k=args.top_k))
+
+    result = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "embeddings": embeddings_name,
+            "llm_latency_ms": args.llm_latency_ms,
+            "questions": len(questions),
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "pdf": os.path.basename(args.pdf),
+            "packed_extraction": args.packed,
+            "chunks": stats.chunks,
+            "entities": len(graph.nodes),
+            "relationships": len(graph.edges),
+        },
+        "stages": timer.summary(),
+    }
+    print_summary(result["stages"])
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("embeddings") != embeddings_name:
+            print(f"[Bench] Baseline used {baseline.get('meta', {}).get('embeddings')} embeddings, "
+                  f"this run {embeddings_name}", file=sys.stderr)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\nSlower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
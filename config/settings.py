@@ -1,11 +1,10 @@
+import functools
 import yaml
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import BaseModel, Field
 
-from src.llm.enums import LLMProvider
-
 
 # --- 1. Environment Settings (Secrets & Infrastructure) ---
 # These come from .env file. This is the SINGLE SOURCE OF TRUTH for provider selection.
@@ -18,7 +17,7 @@ class EnvSettings(BaseSettings):
     # LLM Provider Selection (single source of truth)
     llm_provider: str = Field("gemini", validation_alias="LLM_PROVIDER")
     
-    # Ollama
+    # Ollama (several replicas may be given comma-separated)
     ollama_base_url: str = Field("http://localhost:11434", validation_alias="OLLAMA_BASE_URL")
     ollama_model: str = Field("gemma3:4b", validation_alias="OLLAMA_MODEL")
     
@@ -26,7 +25,7 @@ class EnvSettings(BaseSettings):
     gemini_api_key: Optional[str] = Field(None, validation_alias="GEMINI_API_KEY")
     gemini_model: str = Field("gemini-3-flash-preview", validation_alias="GEMINI_MODEL")
     
-    # vLLM
+    # vLLM (several replicas may be given comma-separated)
     vllm_base_url: str = Field("http://localhost:8000/v1", validation_alias="VLLM_BASE_URL")
     vllm_api_key: str = Field("EMPTY", validation_alias="VLLM_API_KEY")
     vllm_model: str = Field("meta-llama/Meta-Llama-3-8B-Instruct", validation_alias="VLLM_MODEL")
@@ -46,24 +45,233 @@ class EnvSettings(BaseSettings):
 
 
 # --- 2. YAML Config Models (Application Logic) ---
+class ResilienceConfig(BaseModel):
+    # Attempts per call, including the first
+    max_attempts: int = 3
+    # Exponential backoff (seconds) with jitter, capped at max_delay
+    initial_delay: float = 0.5
+    max_delay: float = 8.0
+    # A longer Retry-After hint fails the call instead of waiting
+    max_retry_after: float = 30.0
+    # No retry is started that would end later than this after the first attempt
+    deadline: float = 60.0
+    # Retries per call allowed on average (per provider), with a burst allowance
+    retry_budget_ratio: float = 0.2
+    retry_budget_burst: float = 10.0
+    # Consecutive transient failures that open the circuit, and how long it stays open
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+class LLMPoolConfig(BaseModel):
+    max_connections: int = 32              # HTTP connections per model endpoint
+    max_keepalive_connections: int = 16
+    keepalive_expiry: float = 30.0         # seconds an idle connection is kept open
+    timeout: float = 60.0                  # seconds per request
+
+
+class LoadBalancingConfig(BaseModel):
+    # Consecutive transient failures after which an endpoint is taken out of rotation
+    failure_threshold: int = 3
+    # Seconds an ejected endpoint stays out before it is tried again
+    eject_seconds: float = 30.0
+
+
 class LLMConfig(BaseModel):
     temperature: float = 0.0
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    resilience: ResilienceConfig = ResilienceConfig()
+    pool: LLMPoolConfig = LLMPoolConfig()
+    load_balancing: LoadBalancingConfig = LoadBalancingConfig()
+
+
+class Neo4jPoolConfig(BaseModel):
+    max_size: int = 50                     # connections per driver (sync and async each)
+    acquisition_timeout: float = 30.0      # seconds to wait for a free connection
+    connection_timeout: float = 15.0       # seconds to establish a connection
+    max_connection_lifetime: float = 3600.0
+    max_transaction_retry_time: float = 15.0
 
 
 class GraphConfig(BaseModel):
     chunk_size: int = 2000
     chunk_overlap: int = 500
+    write_batch_size: int = 1000
+    database: str = "neo4j"
+    pool: Neo4jPoolConfig = Neo4jPoolConfig()
+
+
+class ExtractionPackingConfig(BaseModel):
+    # Extract several chunks per LLM request, sharing one copy of the prompt
+    enabled: bool = False
+    max_chunks: int = 8
+    # Context window (tokens) per provider; packs are sized to fit in it
+    context_tokens: Dict[str, int] = Field(default_factory=lambda: {"gemini": 1_000_000, "ollama": 8192, "vllm": 8192})
+    # Tokens reserved for the extracted graph of each chunk
+    output_tokens_per_chunk: int = 1024
+
+
+class PDFParsingConfig(BaseModel):
+    # Parser processes; 0 uses one per CPU core, 1 parses in-process
+    workers: int = 0
+    pages_per_task: int = 8
+    # Parsed page text cache, keyed by file hash and page (relative paths: project root)
+    cache_enabled: bool = True
+    cache_path: str = ".cache/pdf_text.sqlite"
+    cache_max_bytes: Optional[int] = 256 * 1024 * 1024
+
+
+class IngestionConfig(BaseModel):
+    queue_size: int = 64
+    embedding_batch_size: int = 32
+    reembed_page_size: int = 512
+    max_in_flight: int = 4
+    write_batch_size: int = 16
+    # 0 disables the limit for that provider
+    requests_per_minute: Dict[str, int] = Field(default_factory=dict)
+    packing: ExtractionPackingConfig = ExtractionPackingConfig()
+    pdf: PDFParsingConfig = PDFParsingConfig()
+
+
+class ExtractionCacheConfig(BaseModel):
+    enabled: bool = True
+    # Relative paths are resolved against the project root
+    path: str = ".cache/extraction.sqlite"
+    max_entries: Optional[int] = 100_000
+    max_bytes: Optional[int] = 512 * 1024 * 1024
+
+
+class QueryCacheConfig(BaseModel):
+    enabled: bool = True
+    max_size: int = 4096
+    # Optional on-disk tier that survives restarts
+    persistent: bool = False
+    path: str = ".cache/query_embeddings.sqlite"
+    max_entries: Optional[int] = 100_000
+    # Asked questions are appended here and used to warm the cache at startup
+    question_log: Optional[str] = None
+    warm_limit: int = 2000
+
+
+class ExpansionConfig(BaseModel):
+    # Graph hops followed from entities in the retrieved chunks (0 disables expansion)
+    hops: int = 2
+    fan_out: int = 10          # relationships followed per node and hop
+    max_degree: int = 50       # nodes with more relationships are not expanded further
+    max_nodes: int = 50        # total new nodes across all hops
+    relationship_types: List[str] = Field(default_factory=list)  # empty: any type
+
+
+class ContextConfig(BaseModel):
+    max_tokens: int = 2000      # prompt context budget
+    min_overlap: int = 50       # shortest repeated span (chars) trimmed between chunks
+    # tokenizer.json path or Hugging Face id found in the local cache; defaults to the vLLM model, else a length estimate
+    tokenizer: Optional[str] = None
+
+
+class LocalIndexConfig(BaseModel):
+    path: str = ".cache/vector_index"
+    refresh_interval: float = 30.0  # seconds between manifest / graph version checks
+    page_size: int = 2000           # chunks fetched per query while syncing
+    # "int8" or "binary" codes for the first search pass, rescored exactly in float32
+    quantization: str = "none"
+    rescore_factor: int = 4         # shortlist = top_k * rescore_factor
+
+
+class RetrievalConfig(BaseModel):
+    # "neo4j" (vector index over Bolt) or "local" (memory-mapped index in-process)
+    vector_backend: str = "neo4j"
+    local_index: LocalIndexConfig = LocalIndexConfig()
+    query_cache: QueryCacheConfig = QueryCacheConfig()
+    expansion: ExpansionConfig = ExpansionConfig()
+    context: ContextConfig = ContextConfig()
+    # Entity properties returned with retrieved chunks, after the entity's type
+    # (its label); everything else stays in Neo4j. Values are cut to max_property_length.
+    entity_properties: List[str] = Field(default_factory=lambda: [
+        "description", "title", "role", "designation", "department", "program", "location", "duration", "raw_text"
+    ])
+    max_entities: int = 25
+    max_property_length: int = 200
+
+
+class AnswerCacheConfig(BaseModel):
+    enabled: bool = True
+    max_size: int = 2048
+    ttl_seconds: Optional[float] = 3600
+    # Cosine similarity needed to reuse the answer to a different wording
+    similarity_threshold: float = 0.95
+    # How often (seconds) the graph version stamp is re-read from Neo4j
+    version_check_interval: float = 5.0
+    # Questions answered in the background at startup (JSON or one per line)
+    warmup_file: Optional[str] = None
+
+
+class GuardrailConfig(BaseModel):
+    # Score questions locally with the embedding model before asking the LLM
+    local_classifier: bool = True
+    examples_file: str = "config/guardrail_examples.yaml"
+    # score = mean top-k similarity to in-scope minus out-of-scope examples;
+    # only scores strictly between the two thresholds go to the LLM
+    allow_threshold: float = 0.10
+    reject_threshold: float = -0.05
+    top_k: int = 3
+    cache_size: int = 4096
+
+
+class EmbeddingBatchConfig(BaseModel):
+    # Concurrent query embeddings are grouped into one forward pass
+    enabled: bool = True
+    max_batch_size: int = 32
+    max_wait_ms: float = 5.0
+
+
+class BatchChatConfig(BaseModel):
+    # Largest number of questions accepted by /chat/batch
+    max_questions: int = 500
+    # LLM requests (generation and guardrail) running at once per batch
+    max_in_flight: int = 8
+
+
+class OpenTelemetryConfig(BaseModel):
+    # Export stage spans over OTLP/HTTP (needs opentelemetry-sdk and
+    # opentelemetry-exporter-otlp-proto-http)
+    enabled: bool = False
+    service_name: str = "graph-rag-api"
+    # e.g. "http://localhost:4318/v1/traces"; None uses OTEL_EXPORTER_OTLP_* variables
+    endpoint: Optional[str] = None
+
+
+class ObservabilityConfig(BaseModel):
+    # Per-stage latency histograms and token / cache counters on /metrics
+    enabled: bool = True
+    # Stage durations in a Server-Timing header on /chat responses
+    server_timing: bool = True
+    otel: OpenTelemetryConfig = OpenTelemetryConfig()
+
+
+class ApiConfig(BaseModel):
+    # Threads reserved for CPU-bound query embedding on the request path
+    embedding_workers: int = 2
+    embedding_batch: EmbeddingBatchConfig = EmbeddingBatchConfig()
+    batch: BatchChatConfig = BatchChatConfig()
+    observability: ObservabilityConfig = ObservabilityConfig()
+    answer_cache: AnswerCacheConfig = AnswerCacheConfig()
 
 
 class GeneralConfig(BaseModel):
     llm: LLMConfig
     graph: GraphConfig
+    ingestion: IngestionConfig = IngestionConfig()
+    extraction_cache: ExtractionCacheConfig = ExtractionCacheConfig()
+    api: ApiConfig = ApiConfig()
+    retrieval: RetrievalConfig = RetrievalConfig()
+    guardrail: GuardrailConfig = GuardrailConfig()
 
 
 # --- 3. Prompt Models (Text Templates) ---
 class PromptsConfig(BaseModel):
     extraction_prompt: str
+    packed_extraction_prompt: str = ""
     rag_prompt: str
 
 
@@ -74,20 +282,27 @@ class Settings(BaseModel):
     prompts: PromptsConfig
 
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def resolve_path(path: str) -> str:
+    """Resolves a configured path relative to the project root."""
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
 def load_settings() -> Settings:
     # 1. Load Env
     env_settings = EnvSettings()
 
     # 2. Load General YAML
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    general_path = os.path.join(base_dir, "config", "general_config.yaml")
+    general_path = os.path.join(BASE_DIR, "config", "general_config.yaml")
 
     with open(general_path, "r") as f:
         general_dict = yaml.safe_load(f)
     general_config = GeneralConfig(**general_dict)
 
     # 3. Load Prompts YAML
-    prompts_path = os.path.join(base_dir, "config", "prompts.yaml")
+    prompts_path = os.path.join(BASE_DIR, "config", "prompts.yaml")
     with open(prompts_path, "r") as f:
         prompts_dict = yaml.safe_load(f)
     prompts_config = PromptsConfig(**prompts_dict)
@@ -95,5 +310,21 @@ def load_settings() -> Settings:
     return Settings(env=env_settings, general=general_config, prompts=prompts_config)
 
 
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Loads the settings once, on first use."""
+    return load_settings()
+
+
+class _LazySettings:
+    """
+    Stands in for the Settings singleton so importing this module does not
+    read .env and the YAML files; they are loaded on first attribute access.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+
 # Singleton instance
-settings = load_settings()
+settings = _LazySettings()
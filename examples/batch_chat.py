@@ -0,0 +1,89 @@
+"""
+Answer a file of questions in one batch (nightly evaluation, bulk FAQs),
+in-process and without running the API server.
+
+Usage:
+    python examples/batch_chat.py tests/test_queries.json
+    python examples/batch_chat.py questions.txt --output answers.ndjson --stream
+
+Questions are read like the answer cache warm-up file: a JSON list (of
+strings or {"question": ...} objects) or a text file with one per line.
+By default one JSON list is written in question order; with --stream every
+result is written as an NDJSON line as soon as it is ready.
+"""
+import sys
+sys.path.insert(0, ".")
+
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+from dataclasses import asdict
+
+from api.endpoints import get_pipeline
+from src.llm.cache import load_questions
+from config.settings import settings
+
+
+def _record(index, question, result) -> dict:
+    return {
+        "index": index,
+        "question": question,
+        "answer": result.answer,
+        "is_department_related": result.is_department_related,
+        "guardrail_reason": result.guardrail_reason,
+        "sources": result.sources,
+        "cached": result.cache_match is not None,
+        "error": result.error,
+        "context_stats": asdict(result.context_stats) if result.context_stats else None,
+    }
+
+
+async def run(questions, out, stream: bool, max_in_flight: int):
+    # Component start-up logs go to stderr so stdout carries only results
+    with contextlib.redirect_stdout(sys.stderr):
+        pipeline = get_pipeline()
+    records = [None] * len(questions)
+    started = time.perf_counter()
+    done = 0
+    async for index, result in pipeline.run_batch(questions, max_in_flight=max_in_flight):
+        record = _record(index, questions[index], result)
+        if stream:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+        else:
+            records[index] = record
+        done += 1
+        print(f"  [{done}/{len(questions)}] {questions[index][:60]}", file=sys.stderr)
+    if not stream:
+        json.dump(records, out, indent=2)
+        out.write("\n")
+    elapsed = time.perf_counter() - started
+    print(f"Answered {len(questions)} questions in {elapsed:.1f}s "
+          f"({len(questions) / elapsed if elapsed else 0:.2f} q/s)", file=sys.stderr)
+
+
+def main():
+    config = settings.general.api.batch
+    parser = argparse.ArgumentParser(description="Answer a file of questions in one batch.")
+    parser.add_argument("questions", help="JSON list or text file with one question per line")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument("--stream", action="store_true", help="Write NDJSON lines in completion order")
+    parser.add_argument("--max-in-flight", type=int, default=config.max_in_flight,
+                        help=f"Concurrent LLM requests (default: {config.max_in_flight})")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    print(f"Loaded {len(questions)} questions from {args.questions}", file=sys.stderr)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        asyncio.run(run(questions, out, args.stream, args.max_in_flight))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,7 @@ def chat_loop():
     llm = get_llm_client()
     
     # 2. Initialize Graph Manager & Hybrid Retriever
-    # Note: get_graph_client returns Neo4jGraph, but GraphManager wraps it with our logic.
-    # We should instantiate GraphManager directly or refactor get_graph_client.
-    # For now, let's just make a new GraphManager instance as it is lightweight.
+    # GraphManager uses the process-wide Neo4j driver, so creating one is cheap.
     graph_manager = GraphManager()
     retriever = HybridRetriever(graph_manager)
     
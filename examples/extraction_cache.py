@@ -0,0 +1,63 @@
+"""
+Inspect and prune the on-disk LLM extraction cache.
+
+Usage:
+    python examples/extraction_cache.py stats
+    python examples/extraction_cache.py prune --max-entries 50000 --max-mb 256 --older-than-days 30
+    python examples/extraction_cache.py clear
+"""
+import sys
+sys.path.insert(0, ".")
+
+import argparse
+import datetime
+from src.llm.extraction_cache import ExtractionCache
+from config.settings import settings
+
+
+def _fmt_time(ts):
+    return datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else "-"
+
+
+def show_stats(cache: ExtractionCache):
+    stats = cache.store.stats()
+    print(f"Cache file:   {cache.store.path}")
+    print(f"Entries:      {stats.entries}")
+    print(f"Size:         {stats.total_bytes / (1024 * 1024):.2f} MB")
+    print(f"Oldest use:   {_fmt_time(stats.oldest)}")
+    print(f"Newest use:   {_fmt_time(stats.newest)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the LLM extraction cache.")
+    parser.add_argument("--path", help=f"Cache file (default: {settings.general.extraction_cache.path})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Show entry count and size")
+
+    prune = sub.add_parser("prune", help="Evict least-recently-used entries")
+    prune.add_argument("--max-entries", type=int)
+    prune.add_argument("--max-mb", type=float)
+    prune.add_argument("--older-than-days", type=float)
+
+    sub.add_parser("clear", help="Remove every entry")
+    args = parser.parse_args()
+
+    cache = ExtractionCache(path=args.path)
+
+    if args.command == "stats":
+        show_stats(cache)
+    elif args.command == "prune":
+        removed = cache.store.prune(
+            max_entries=args.max_entries,
+            max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None,
+            older_than=args.older_than_days * 86400 if args.older_than_days is not None else None,
+        )
+        print(f"Pruned {removed} entries.")
+        show_stats(cache)
+    elif args.command == "clear":
+        print(f"Removed {cache.store.clear()} entries.")
+
+
+if __name__ == "__main__":
+    main()
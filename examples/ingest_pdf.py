@@ -1,77 +1,65 @@
 import os
-import uuid
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from src.llm.extractor import extract_graph_from_text
-from src.llm.graph_client import GraphManager
-from src.llm import get_llm_client
+import argparse
 from config.settings import settings
 
-def ingest(pdf_path="data/files/UET lahore Document.pdf"):
+def ingest(
+    pdf_path="data/files/UET lahore Document.pdf",
+    max_in_flight: int = None,
+    requests_per_minute: int = None,
+    embedding_batch_size: int = None,
+    incremental: bool = True,
+    doc_id: str = None,
+):
     if not os.path.exists(pdf_path):
         print(f"Error: File {pdf_path} not found.")
         return
 
-    print("Loading PDF...")
-    loader = PyPDFLoader(pdf_path)
-    documents = loader.load()
-    
-    print("Initializing Graph Manager...")
-    graph_manager = GraphManager()
-    
-    # Initialize Embedding Model
-    print(f"Loading Embedding Model: {settings.general.llm.embedding_model}...")
-    embedding_model = HuggingFaceEmbeddings(model_name=settings.general.llm.embedding_model)
-    
-    # Ensure Vector Index Exists
-    graph_manager.create_vector_index()
+    # Imported here: PDF parser processes re-import this script and only need pypdf
+    from src.ingestion import IngestionPipeline
 
-    # Optimize chunk size for Gemini
-    chunk_size = settings.general.graph.chunk_size
-    chunk_overlap = settings.general.graph.chunk_overlap
-    
-    # Use extraction provider for logic
-    provider = getattr(settings.general.llm, "extraction_provider", "ollama")
-    print(f"Using LLM Provider: {provider}")
-    
-    if provider == "gemini":
-        print("Optimizing chunk size for Gemini (2500 chars, 500 overlap)...")
-        chunk_size = 2500
-        chunk_overlap = 500
-    
-    print(f"Splitting {len(documents)} pages with chunk_size={chunk_size}...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap
+    config = settings.general.ingestion
+    print(f"Loading Embedding Model: {settings.general.llm.embedding_model}...")
+    pipeline = IngestionPipeline(
+        max_in_flight=max_in_flight,
+        requests_per_minute=requests_per_minute,
+        embedding_batch_size=embedding_batch_size,
     )
-    texts = text_splitter.split_documents(documents)
-    
-    print(f"Processing {len(texts)} chunks...")
-    for i, doc in enumerate(texts):
-        print(f"  - Chunk {i+1}/{len(texts)}")
-        try:
-            # 1. Generate unique Chunk ID
-            chunk_id = str(uuid.uuid4())
-            chunk_text = doc.page_content
-            
-            # 2. Store Chunk Text & Embedding (Hybrid RAG)
-            embedding = embedding_model.embed_query(chunk_text)
-            graph_manager.add_chunk(chunk_id, chunk_text, embedding=embedding)
+    print(f"Using LLM Provider: {pipeline.provider} "
+          f"(in-flight={pipeline.max_in_flight}, "
+          f"rpm={pipeline.rate_limiter.requests_per_minute or 'unlimited'}, "
+          f"embedding batch={pipeline.embedding_batch_size}, queue={config.queue_size})")
 
-            # 3. Extract Graph Data using LLM
-            print(f"    Extracting from chunk {chunk_id[:8]}...")
-            graph_data = extract_graph_from_text(chunk_text)
-            print("    Extraction complete.")
-            
-            # 4. Ingest Graph Data & Link to Chunk
-            if graph_data:
-                graph_manager.add_graph_data(graph_data, chunk_id=chunk_id)
-                
-        except Exception as e:
-            print(f"Failed to process chunk {i+1}: {e}")
+    mode = "incremental" if incremental else "full"
+    print(f"Ingesting {pdf_path} ({mode})...")
+    stats = pipeline.run(pdf_path, incremental=incremental, doc_id=doc_id)
 
+    rate = stats.chunks / stats.elapsed if stats.elapsed else 0.0
+    print(f"Processed {stats.pages} pages / {stats.chunks} chunks in {stats.elapsed:.1f}s ({rate:.2f} chunks/s)")
+    print(f"  embedded={stats.embedded} extracted={stats.extracted} "
+          f"graph_writes={stats.graph_writes} failed={stats.failed}")
+    print(f"  unchanged={stats.unchanged} removed_chunks={stats.removed_chunks} "
+          f"removed_entities={stats.removed_entities}")
     print("Ingestion Complete!")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a PDF into the knowledge graph.")
+    parser.add_argument("pdf_path", nargs="?", default="data/files/UET lahore Document.pdf")
+    parser.add_argument("--max-in-flight", type=int, help="Concurrent extraction requests")
+    parser.add_argument("--rpm", type=int, help="Extraction requests per minute (0 = unlimited)")
+    parser.add_argument("--embedding-batch-size", type=int, help="Chunks per embedding call")
+    parser.add_argument("--full", action="store_true", help="Re-process every chunk, not only new or changed ones")
+    parser.add_argument("--doc-id", help="Document id (default: derived from the file name)")
+    args = parser.parse_args()
+
+    ingest(
+        args.pdf_path,
+        max_in_flight=args.max_in_flight,
+        requests_per_minute=args.rpm,
+        embedding_batch_size=args.embedding_batch_size,
+        incremental=not args.full,
+        doc_id=args.doc_id,
+    )
 
 if __name__ == "__main__":
-    ingest()
+    main()
@@ -1,73 +1,54 @@
 """
 Script to add embeddings to existing Chunk nodes in Neo4j.
-This updates chunks that were ingested before embedding support was added.
+This updates chunks that were ingested before embedding support was added,
+or (with --all) re-embeds every chunk after an embedding model change.
 """
 import sys
 sys.path.insert(0, ".")
 
-from langchain_huggingface import HuggingFaceEmbeddings
+import argparse
+from src.llm.embeddings import EmbeddingService
 from src.llm.graph_client import GraphManager
 from config.settings import settings
 
 
-def update_embeddings():
+def update_embeddings(only_missing: bool = True, batch_size: int = None, page_size: int = None):
     print("=" * 50)
     print("Embedding Update Script")
     print("=" * 50)
     
     # 1. Initialize
-    print(f"\n[1/4] Loading embedding model: {settings.general.llm.embedding_model}")
-    embedding_model = HuggingFaceEmbeddings(model_name=settings.general.llm.embedding_model)
+    print(f"\n[1/3] Loading embedding model: {settings.general.llm.embedding_model}")
+    service = EmbeddingService(batch_size=batch_size)
     
-    print("[2/4] Connecting to Neo4j...")
+    print("[2/3] Connecting to Neo4j...")
     graph_manager = GraphManager()
-    
-    # 2. Create vector index if missing
-    print("[3/4] Ensuring vector index exists...")
+    graph_manager.create_chunk_constraint()
     graph_manager.create_vector_index()
     
-    # 3. Fetch all Chunk nodes without embeddings
-    print("[4/4] Fetching chunks without embeddings...")
-    cypher = """
-    MATCH (c:Chunk)
-    WHERE c.embedding IS NULL
-    RETURN c.id AS id, c.text AS text
-    """
-    chunks = graph_manager.driver.query(cypher)
+    # 2. Stream chunks page by page and embed them in batches
+    scope = "chunks without embeddings" if only_missing else "all chunks"
+    print(f"[3/3] Embedding {scope} (batch size {service.batch_size})...")
+
+    def report(stats):
+        print(f"  {stats.processed} chunks embedded ({stats.chunks_per_second:.1f} chunks/s)")
+
+    stats = service.reembed(graph_manager, only_missing=only_missing, page_size=page_size, on_progress=report)
     
-    if not chunks:
+    if stats.processed == 0 and stats.skipped == 0:
         print("\n✅ All chunks already have embeddings. Nothing to update.")
-        return
+        return stats
     
-    print(f"\nFound {len(chunks)} chunks without embeddings. Updating...")
-    
-    # 4. Process each chunk
-    for i, chunk in enumerate(chunks):
-        chunk_id = chunk['id']
-        chunk_text = chunk['text']
-        
-        if not chunk_text:
-            print(f"  [{i+1}/{len(chunks)}] Skipping chunk {chunk_id[:8]}... (no text)")
-            continue
-            
-        try:
-            # Compute embedding
-            embedding = embedding_model.embed_query(chunk_text)
-            
-            # Update chunk in Neo4j
-            update_cypher = """
-            MATCH (c:Chunk {id: $id})
-            SET c.embedding = $embedding
-            """
-            graph_manager.driver.query(update_cypher, {"id": chunk_id, "embedding": embedding})
-            
-            print(f"  [{i+1}/{len(chunks)}] Updated chunk {chunk_id[:8]}...")
-            
-        except Exception as e:
-            print(f"  [{i+1}/{len(chunks)}] Error updating {chunk_id[:8]}: {e}")
-    
-    print("\n✅ Embedding update complete!")
+    print(f"\n✅ Embedding update complete! {stats.processed} updated, {stats.skipped} skipped (no text) "
+          f"in {stats.elapsed:.1f}s ({stats.chunks_per_second:.1f} chunks/s)")
+    return stats
 
 
 if __name__ == "__main__":
-    update_embeddings()
+    parser = argparse.ArgumentParser(description="Embed Chunk nodes stored in Neo4j.")
+    parser.add_argument("--all", action="store_true", help="Re-embed every chunk (e.g. after a model change)")
+    parser.add_argument("--batch-size", type=int, help="Chunks per embedding call")
+    parser.add_argument("--page-size", type=int, help="Chunks read from Neo4j per page")
+    args = parser.parse_args()
+
+    update_embeddings(only_missing=not args.all, batch_size=args.batch_size, page_size=args.page_size)
@@ -1,8 +1,9 @@
 """
 API Client for Graph RAG Backend
 """
+import json
 import requests
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 
 
 class GraphRAGClient:
@@ -37,3 +38,34 @@ class GraphRAGClient:
         )
         response.raise_for_status()
         return response.json()
+
+    def stream_message(self, question: str) -> Iterator[Tuple[str, dict]]:
+        """
+        Send a question to the streaming endpoint.
+        
+        Yields (event, data) pairs as they arrive:
+            ("meta", {"is_department_related", "guardrail_reason", "sources"})
+            ("token", {"text": str})   - repeated
+            ("done", {"answer": str})
+            ("error", {"detail": str})
+        """
+        with requests.post(
+            f"{self.api_base}/chat/stream",
+            json={"question": question},
+            stream=True,
+            timeout=(5, 60)  # connect, and max gap between chunks
+        ) as response:
+            response.raise_for_status()
+            event, data_lines = None, []
+            for line in response.iter_lines(decode_unicode=True):
+                if line is None:
+                    continue
+                if line == "":
+                    # Blank line terminates an event
+                    if event is not None:
+                        yield event, json.loads("\n".join(data_lines) or "{}")
+                    event, data_lines = None, []
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].strip())
@@ -87,37 +87,44 @@ if prompt := st.chat_input("Ask about UET departments, programs, or faculty...")
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get response from backend
+    # Get response from backend (streamed token by token)
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                response = st.session_state.client.send_message(prompt)
-                
-                # Display answer
-                st.markdown(response["answer"])
-                
-                # Show metadata
-                if response.get("is_department_related"):
-                    st.caption("✅ Department-related question")
-                else:
-                    st.caption("⚠️ Out of scope")
-                
-                # Sources
-                if response.get("sources"):
-                    with st.expander("📚 Sources"):
-                        for i, source in enumerate(response["sources"], 1):
-                            st.code(f"{i}. Chunk ID: {source}", language=None)
-                
-                # Save assistant message
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": response["answer"],
-                    "metadata": {
-                        "is_department_related": response.get("is_department_related"),
-                        "sources": response.get("sources", [])
-                    }
-                })
-                
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
-                st.info("Make sure the backend is running: `python main.py`")
+        metadata = {}
+        
+        def answer_tokens():
+            for event, data in st.session_state.client.stream_message(prompt):
+                if event == "meta":
+                    metadata.update(data)
+                elif event == "token":
+                    yield data["text"]
+                elif event == "error":
+                    raise RuntimeError(data.get("detail", "Unknown error"))
+        
+        try:
+            answer = st.write_stream(answer_tokens())
+            
+            # Show metadata
+            if metadata.get("is_department_related"):
+                st.caption("✅ Department-related question")
+            else:
+                st.caption("⚠️ Out of scope")
+            
+            # Sources
+            if metadata.get("sources"):
+                with st.expander("📚 Sources"):
+                    for i, source in enumerate(metadata["sources"], 1):
+                        st.code(f"{i}. Chunk ID: {source}", language=None)
+            
+            # Save assistant message
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": answer,
+                "metadata": {
+                    "is_department_related": metadata.get("is_department_related"),
+                    "sources": metadata.get("sources", [])
+                }
+            })
+            
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+            st.info("Make sure the backend is running: `python main.py`")
@@ -1,26 +1,53 @@
 """
 Main entry point for the Graph RAG API.
-Run with: python main.py
+Run with: python main.py [--workers N]
 Or: uvicorn main:app --reload
+
+With --workers N (N > 1) the process preloads the embedding model, binds
+the listening socket and forks N uvicorn workers that share both; the model
+weights stay shared copy-on-write instead of being loaded N times. The
+master re-forks any worker that exits until it is told to stop.
 """
-import uvicorn
-from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict
+
+from src.startup import startup_timer
+
+with startup_timer.step("import FastAPI / uvicorn"):
+    import uvicorn
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Pre-warm components at startup."""
-    from api.endpoints import init_components
+    from api.endpoints import init_components, warm_answer_cache
     print("[Startup] Pre-warming components...")
     init_components()
+    # Answer cache warm-up runs in the background so startup is not delayed
+    warmup = asyncio.create_task(warm_answer_cache())
+    print(startup_timer.report())
     print("[Startup] Ready to serve requests!")
     yield
+    warmup.cancel()
     print("[Shutdown] Cleaning up...")
+    from src.llm import telemetry
+    from src.llm.neo4j_driver import close_async_driver, close_driver
+    telemetry.shutdown()
+    await close_async_driver()
+    close_driver()
 
 
 # Import app after defining lifespan to avoid circular import
-from api.endpoints import router
+with startup_timer.step("import API"):
+    from api.endpoints import router
 
 app = FastAPI(
     title="Graph RAG API",
@@ -32,9 +59,104 @@ app = FastAPI(
 app.include_router(router, prefix="/api/v1", tags=["chat"])
 
 
+def serve_prefork(host: str, port: int, workers: int):
+    """
+    Preloads models, then forks `workers` uvicorn servers on one shared socket.
+    """
+    from api.endpoints import preload_models
+
+    # Tokenizers disable their thread pool after a fork anyway; say so up front
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    preload_models()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Objects allocated so far are never collected, so the GC does not
+    # touch (and un-share) their pages in the workers
+    gc.freeze()
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            # The master's handlers would make a worker kill its siblings
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+            server.run(sockets=[sock])
+            os._exit(0)
+        return pid
+
+    supervisor = WorkerSupervisor(spawn)
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: supervisor.stop())
+    supervisor.start(workers)
+    print(f"[Startup] Master {os.getpid()} serving http://{host}:{port} with workers {list(supervisor.children)}")
+    supervisor.run()
+    sock.close()
+
+
+class WorkerSupervisor:
+    """
+    Keeps `workers` forked processes running: a worker that exits is logged
+    and replaced, until stop() terminates them all.
+
+    Args:
+        spawn: Forks a worker and returns its pid.
+        min_uptime: A worker that dies sooner is replaced only after this
+            many seconds, so a crash loop does not spin the master.
+    """
+
+    def __init__(self, spawn: Callable[[], int], min_uptime: float = 1.0, wait=os.wait, kill=os.kill):
+        self.spawn = spawn
+        self.min_uptime = min_uptime
+        self._wait = wait
+        self._kill = kill
+        # pid -> time.monotonic() at fork
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+
+    def start(self, workers: int):
+        for _ in range(workers):
+            self.children[self.spawn()] = time.monotonic()
+
+    def run(self):
+        """Blocks until every worker has exited after stop()."""
+        while self.children:
+            try:
+                pid, status = self._wait()
+            except ChildProcessError:
+                return
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            print(f"[Startup] Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting it")
+            if time.monotonic() - started < self.min_uptime:
+                time.sleep(self.min_uptime)
+            if not self.stopping:
+                self.children[self.spawn()] = time.monotonic()
+
+    def stop(self):
+        self.stopping = True
+        for child in list(self.children):
+            try:
+                self._kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000
-    )
+    parser = argparse.ArgumentParser(description="Run the Graph RAG API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+                        help="Forked workers sharing the preloaded model (default: $WEB_CONCURRENCY or 1)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        serve_prefork(args.host, args.port, args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
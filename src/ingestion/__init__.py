@@ -0,0 +1,10 @@
+# The pipeline pulls in LangChain, the embedding service and the Neo4j driver;
+# it is imported on first use so PDF parser processes (pdf_loader) start quickly.
+__all__ = ["IngestionPipeline", "IngestionStats"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import pipeline
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
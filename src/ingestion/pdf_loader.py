@@ -0,0 +1,193 @@
+"""
+Streaming, parallel PDF parsing.
+
+StreamingPDFLoader yields one Document per page, in page order, while
+worker processes parse the following page ranges. Only a bounded window of
+ranges is in flight, so memory stays flat however long the PDF is, and the
+chunker can start on page 1 before the last page has been parsed.
+
+Parsed page text is cached by file hash and page (PDFTextCache), so
+re-ingesting an unchanged file skips parsing entirely and an edited file
+only re-parses its pages. The text is extracted exactly like PyPDFLoader
+does, so chunk ids do not change when switching loaders.
+
+Parser processes are spawned, not forked: ingestion runs its stages in
+threads, and forking a threaded process is unsafe. This module therefore
+imports nothing heavy at the top; parsing itself only needs pypdf.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import pypdf
+
+# Bump when the extracted text changes (e.g. different extraction options)
+PARSER_VERSION = 1
+
+
+def parse_pages(path: str, start: int, end: int) -> List[str]:
+    """
+    Text of pages [start, end), as PyPDFLoader extracts it. A fresh reader
+    per call keeps memory bounded (readers cache every object they resolve).
+    """
+    reader = pypdf.PdfReader(path)
+    return [reader.pages[i].extract_text(extraction_mode="plain").strip() for i in range(start, end)]
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PDFTextCache:
+    """
+    Parsed page text per (file hash, page). The key also covers the pypdf
+    version, whose text extraction changes between releases.
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None):
+        from config.settings import settings, resolve_path
+        from src.llm.cache import DiskCache
+
+        config = settings.general.ingestion.pdf
+        self.store = DiskCache(
+            resolve_path(path or config.cache_path),
+            max_bytes=max_bytes if max_bytes is not None else config.cache_max_bytes,
+        )
+
+    @staticmethod
+    def key(digest: str, page: int) -> str:
+        return f"v{PARSER_VERSION}:pypdf-{pypdf.__version__}:{digest}:{page}"
+
+    def __contains__(self, item: Tuple[str, int]) -> bool:
+        return self.key(*item) in self.store
+
+    def get(self, digest: str, page: int) -> Optional[str]:
+        raw = self.store.get(self.key(digest, page))
+        return raw.decode("utf-8") if raw is not None else None
+
+    def put(self, digest: str, page: int, text: str):
+        self.store.set(self.key(digest, page), text.encode("utf-8"))
+
+
+_cache: Optional[PDFTextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_text_cache() -> Optional[PDFTextCache]:
+    """
+    Returns the shared parsed-text cache, or None when disabled in config.
+    """
+    global _cache
+    from config.settings import settings
+
+    if not settings.general.ingestion.pdf.cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PDFTextCache()
+        return _cache
+
+
+class StreamingPDFLoader:
+    """
+    Page-per-Document PDF loader with the same text and page metadata as
+    PyPDFLoader(path).load(), parsed in parallel and streamed.
+
+    Usage:
+        for page in StreamingPDFLoader("data/files/UET lahore Document.pdf").lazy_load():
+            ...
+    """
+
+    def __init__(self, path: str, workers: int = None, pages_per_task: int = None, use_cache: bool = True):
+        from config.settings import settings
+
+        config = settings.general.ingestion.pdf
+        self.path = path
+        workers = config.workers if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.pages_per_task = max(1, pages_per_task or config.pages_per_task)
+        self.cache = get_pdf_text_cache() if use_cache else None
+
+    def load(self) -> list:
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator:
+        from langchain_core.documents import Document
+
+        # Opening the reader only loads the page tree; pages are parsed on access
+        reader = pypdf.PdfReader(self.path)
+        total = len(reader.pages)
+        labels = reader.page_labels
+        digest = file_hash(self.path) if self.cache is not None else None
+        metadata = {"source": self.path, "total_pages": total}
+
+        def document(page: int, text: str):
+            return Document(page_content=text, metadata={**metadata, "page": page, "page_label": labels[page]})
+
+        ranges = deque(self._uncached_ranges(digest, total))
+        parsed_pages = sum(end - start for start, end in ranges)
+        pool = None
+        if self.workers > 1 and parsed_pages > self.pages_per_task:
+            # Otherwise not worth starting processes
+            pool = ProcessPoolExecutor(max_workers=min(self.workers, len(ranges)),
+                                       mp_context=multiprocessing.get_context("spawn"))
+
+        # Futures of the next ranges, in page order; at most two per worker at a time
+        pending = deque()
+        upcoming = iter(list(ranges))
+
+        def submit_next():
+            next_range = next(upcoming, None)
+            if next_range is not None:
+                pending.append(pool.submit(parse_pages, self.path, *next_range))
+
+        try:
+            if pool is not None:
+                for _ in range(2 * self.workers):
+                    submit_next()
+            page = 0
+            while page < total:
+                if ranges and ranges[0][0] == page:
+                    start, end = ranges.popleft()
+                    if pool is not None:
+                        texts = pending.popleft().result()
+                        submit_next()
+                    else:
+                        texts = parse_pages(self.path, start, end)
+                    for number, text in enumerate(texts, start):
+                        if self.cache is not None:
+                            self.cache.put(digest, number, text)
+                        yield document(number, text)
+                    page = end
+                    continue
+
+                text = self.cache.get(digest, page) if self.cache is not None else None
+                if text is None:
+                    # Evicted since the ranges were planned
+                    text = parse_pages(self.path, page, page + 1)[0]
+                yield document(page, text)
+                page += 1
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def _uncached_ranges(self, digest: Optional[str], total: int) -> List[Tuple[int, int]]:
+        """Consecutive uncached pages, split into ranges of at most pages_per_task."""
+        ranges = []
+        start = None
+        for page in range(total + 1):
+            cached = page == total or (self.cache is not None and (digest, page) in self.cache)
+            if start is not None and (cached or page - start == self.pages_per_task):
+                ranges.append((start, page))
+                start = None
+            if start is None and not cached:
+                start = page
+        return ranges
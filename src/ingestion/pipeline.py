@@ -0,0 +1,357 @@
+"""
+Pipelined PDF ingestion.
+
+Stages run in their own threads and are connected by bounded queues, so
+chunking, embedding, LLM extraction and graph writes overlap instead of
+running one after another:
+
+    chunker (streamed pages) -> embedder (batched) -> extractors (concurrent, rate limited, optionally packed) -> writer (batched)
+
+Chunk ids are derived from the document and the chunk text, and every
+Document keeps a manifest of its fully ingested chunks. In incremental mode
+only new or changed chunks are embedded and extracted; chunks that
+disappeared are deleted together with entities no other chunk mentions.
+"""
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config.settings import settings
+from src.llm.embeddings import EmbeddingService
+from src.llm.extractor import extract_graph_from_text, extract_graphs_from_texts, get_extraction_provider
+from src.llm.graph_client import GraphManager
+from src.llm.rate_limit import RateLimiter, get_rate_limiter
+from .pdf_loader import StreamingPDFLoader
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+def document_id(pdf_path: str) -> str:
+    """
+    Stable id for a source document, based on its file name so that an
+    edited copy of the same PDF maps to the same Document node. Files with
+    the same name in different directories collide; IngestionPipeline.run
+    refuses those unless given an explicit doc_id.
+    """
+    name = os.path.splitext(os.path.basename(pdf_path))[0].lower()
+    return "doc::" + re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+
+
+def chunk_id(doc_id: str, text: str, occurrence: int = 0) -> str:
+    """
+    Deterministic chunk id from the document and the chunk content.
+    `occurrence` disambiguates identical chunks within one document.
+    """
+    payload = f"{doc_id}\x00{occurrence}\x00{text}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+@dataclass
+class IngestionStats:
+    pages: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    extracted: int = 0
+    failed: int = 0
+    graph_writes: int = 0
+    unchanged: int = 0
+    removed_chunks: int = 0
+    removed_entities: int = 0
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+class IngestionPipeline:
+    """
+    Concurrent ingestion of a PDF into Neo4j (chunks, embeddings and graph data).
+
+    Usage:
+        stats = IngestionPipeline().run("data/files/UET lahore Document.pdf")
+    """
+
+    def __init__(
+        self,
+        graph_manager: GraphManager = None,
+        embedding_model=None,
+        max_in_flight: int = None,
+        requests_per_minute: int = None,
+        embedding_batch_size: int = None,
+        write_batch_size: int = None,
+        queue_size: int = None,
+        pack_extraction: bool = None,
+    ):
+        config = settings.general.ingestion
+        self.graph_manager = graph_manager or GraphManager()
+        self.provider = get_extraction_provider()
+        self.max_in_flight = max_in_flight or config.max_in_flight
+        self.embedding_batch_size = embedding_batch_size or config.embedding_batch_size
+        self.embedder = EmbeddingService(embedding_model, batch_size=self.embedding_batch_size)
+        self.write_batch_size = write_batch_size or config.write_batch_size
+        self.queue_size = queue_size or config.queue_size
+        # Several chunks per extraction request (see extractor.extract_graphs_from_texts)
+        self.pack_extraction = config.packing.enabled if pack_extraction is None else pack_extraction
+        self.pack_size = config.packing.max_chunks
+
+        self.rate_limiter = get_rate_limiter(self.provider)
+        if requests_per_minute is not None:
+            # Explicit override only applies to this pipeline
+            self.rate_limiter = RateLimiter(requests_per_minute)
+
+        self.stats = IngestionStats()
+        self._stats_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def run(self, pdf_path: str, incremental: bool = True, doc_id: str = None) -> IngestionStats:
+        """
+        Ingests a PDF and blocks until every stage has drained.
+
+        Args:
+            pdf_path: Path of the PDF.
+            incremental: Skip chunks already recorded in the document's
+                manifest. With False every chunk is processed again.
+                Stale chunks are removed in both modes.
+            doc_id: Document id to ingest into. Defaults to document_id(pdf_path),
+                which is refused if it was ingested from a different path.
+        """
+        self.stats = IngestionStats()
+        start = time.perf_counter()
+
+        source = os.path.abspath(pdf_path)
+        self.doc_id = doc_id or document_id(pdf_path)
+        if doc_id is None:
+            self._check_source(source)
+
+        self.graph_manager.create_chunk_constraint()
+        self.graph_manager.create_vector_index()
+
+        manifest = self.graph_manager.get_document_manifest(self.doc_id)
+        self._skip_ids = manifest if incremental else set()
+        self._seen_ids = set()
+        self._completed_ids = set()
+        self._chunking_failed = False
+
+        to_embed = queue.Queue(maxsize=self.queue_size)
+        to_extract = queue.Queue(maxsize=self.queue_size)
+        to_write = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._chunk_stage, args=(pdf_path, to_embed), name="ingest-chunker"),
+            threading.Thread(target=self._embed_stage, args=(to_embed, to_extract), name="ingest-embedder"),
+            threading.Thread(target=self._extract_stage, args=(to_extract, to_write), name="ingest-extractor"),
+            threading.Thread(target=self._write_stage, args=(to_write,), name="ingest-writer"),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self._finalize(source, manifest)
+        self.stats.elapsed = time.perf_counter() - start
+        return self.stats
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+    def _chunk_stage(self, pdf_path: str, out: queue.Queue):
+        try:
+            for chunk in self._iter_chunks(pdf_path):
+                out.put(chunk)
+        except Exception as e:
+            self._chunking_failed = True
+            self._record_error(f"Chunking failed: {e}")
+        finally:
+            out.put(_DONE)
+
+    def _embed_stage(self, inp: queue.Queue, out: queue.Queue):
+        done = False
+        while not done:
+            batch, done = _take_batch(inp, self.embedding_batch_size)
+            if not batch:
+                continue
+            try:
+                self.embedder.embed_chunks(batch)
+                self.graph_manager.add_chunks(batch)
+                self._bump("embedded", len(batch))
+            except Exception as e:
+                self._record_error(f"Embedding batch of {len(batch)} failed: {e}", failed=len(batch))
+                continue
+            for chunk in batch:
+                out.put(chunk)
+        out.put(_DONE)
+
+    def _extract_stage(self, inp: queue.Queue, out: queue.Queue):
+        # The semaphore keeps at most max_in_flight requests running, so the
+        # input queue (and with it every upstream stage) applies backpressure.
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+
+        def work(chunk):
+            try:
+                graph_data = extract_graph_from_text(chunk["text"], rate_limiter=self.rate_limiter)
+                self._collect(chunk, graph_data, out)
+            except Exception as e:
+                self._record_error(f"Extraction failed for chunk {chunk['id'][:8]}: {e}")
+            finally:
+                slots.release()
+
+        def work_packed(chunks):
+            try:
+                results = extract_graphs_from_texts([c["text"] for c in chunks], rate_limiter=self.rate_limiter)
+                for chunk, graph_data in zip(chunks, results):
+                    if isinstance(graph_data, Exception):
+                        self._record_error(f"Extraction failed for chunk {chunk['id'][:8]}: {graph_data}")
+                    else:
+                        self._collect(chunk, graph_data, out)
+            except Exception as e:
+                self._record_error(f"Extraction failed for {len(chunks)} chunks: {e}", failed=len(chunks))
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="ingest-llm") as pool:
+            if self.pack_extraction:
+                # Chunks arriving together share packed requests
+                done = False
+                while not done:
+                    chunks, done = _take_batch(inp, self.pack_size)
+                    if chunks:
+                        slots.acquire()
+                        pool.submit(work_packed, chunks)
+            else:
+                while True:
+                    chunk = inp.get()
+                    if chunk is _DONE:
+                        break
+                    slots.acquire()
+                    pool.submit(work, chunk)
+        out.put(_DONE)
+
+    def _collect(self, chunk: dict, graph_data: dict, out: queue.Queue):
+        self._bump("extracted")
+        if graph_data:
+            out.put((graph_data, chunk["id"]))
+        else:
+            self._mark_completed([chunk["id"]])
+
+    def _write_stage(self, inp: queue.Queue):
+        done = False
+        while not done:
+            batch, done = _take_batch(inp, self.write_batch_size)
+            if not batch:
+                continue
+            try:
+                self.graph_manager.add_graph_batch(batch)
+                self._bump("graph_writes")
+                self._mark_completed([cid for _, cid in batch])
+            except Exception as e:
+                self._record_error(f"Graph write of {len(batch)} chunks failed: {e}", failed=len(batch))
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _iter_chunks(self, pdf_path: str) -> Iterator[dict]:
+        chunk_size = settings.general.graph.chunk_size
+        chunk_overlap = settings.general.graph.chunk_overlap
+        if self.provider == "gemini":
+            # Larger chunks for Gemini's bigger context window
+            chunk_size = 2500
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        occurrences = {}
+        # Pages stream in while later ones are still being parsed. The splitter
+        # handles each page on its own anyway, so chunks match a full load.
+        for page in StreamingPDFLoader(pdf_path).lazy_load():
+            self._bump("pages")
+            for doc in splitter.split_documents([page]):
+                text = doc.page_content
+                n = occurrences[text] = occurrences.get(text, -1) + 1
+                cid = chunk_id(self.doc_id, text, n)
+                self._bump("chunks")
+                self._seen_ids.add(cid)
+                if cid in self._skip_ids:
+                    self._bump("unchanged")
+                    continue
+                yield {"id": cid, "doc_id": self.doc_id, "text": text, "metadata": doc.metadata}
+
+    def _check_source(self, source: str):
+        """
+        Refuses a file whose derived id belongs to another file: syncing it
+        would delete that document's chunks as stale.
+        """
+        recorded = self.graph_manager.get_document_source(self.doc_id)
+        if recorded and os.path.abspath(recorded) != source:
+            raise ValueError(
+                f"Document id {self.doc_id} was ingested from {recorded}, not {source}. "
+                f"Pass doc_id to ingest this file as a separate document, or the existing "
+                f"id to replace that document's content with it."
+            )
+
+    def _finalize(self, source: str, manifest: set):
+        """
+        Removes chunks that are no longer part of the document and records
+        the new manifest. Skipped when chunking failed, since the seen set
+        would then be incomplete.
+        """
+        if self._chunking_failed or self.stats.chunks == 0:
+            return
+
+        stale = self.graph_manager.get_document_chunk_ids(self.doc_id) - self._seen_ids
+        if stale:
+            chunks, entities = self.graph_manager.delete_chunks(sorted(stale))
+            self.stats.removed_chunks = chunks
+            self.stats.removed_entities = entities
+
+        # Chunks that failed stay out of the manifest and are retried next run
+        completed = (manifest & self._seen_ids) | self._completed_ids
+        self.graph_manager.set_document_manifest(self.doc_id, source, sorted(completed))
+
+        # Invalidate answer caches that were built on the previous graph
+        if stale or self.stats.embedded:
+            self.graph_manager.bump_graph_version()
+
+    def _mark_completed(self, chunk_ids: List[str]):
+        with self._stats_lock:
+            self._completed_ids.update(chunk_ids)
+
+    def _bump(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            setattr(self.stats, name, getattr(self.stats, name) + amount)
+
+    def _record_error(self, message: str, failed: int = 1):
+        print(f"[Ingest] {message}")
+        with self._stats_lock:
+            self.stats.failed += failed
+            self.stats.errors.append(message)
+
+
+def _take_batch(inp: queue.Queue, max_items: int, wait: float = 0.05) -> tuple:
+    """
+    Blocks for the first item, then gathers up to max_items that arrive
+    within `wait` seconds. Returns (items, reached_end).
+    """
+    first = inp.get()
+    if first is _DONE:
+        return [], True
+    items = [first]
+    deadline = time.monotonic() + wait
+    while len(items) < max_items:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = inp.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is _DONE:
+            return items, True
+        items.append(item)
+    return items, False
@@ -0,0 +1,161 @@
+"""
+Answer cache in front of the chat pipeline.
+
+Answers are looked up first by exact normalized question, then by embedding
+similarity against previously answered questions. Every entry expires after
+a TTL, and the whole cache is dropped when the graph version stamp (bumped
+by ingestion) changes, so answers never outlive the data they came from.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+from .cache import CacheStats, LRUCache, normalize_question
+
+
+@dataclass
+class CacheHit:
+    value: Any
+    match: str  # "exact" or "semantic"
+    similarity: float = 1.0
+
+
+class AnswerCache:
+    """
+    Args:
+        max_size: Maximum cached answers (LRU).
+        ttl: Seconds an answer stays valid (None = until invalidated).
+        similarity_threshold: Minimum cosine similarity for a semantic hit.
+        version_check_interval: Seconds between graph version checks.
+    """
+
+    def __init__(self, max_size: int = 2048, ttl: float = None,
+                 similarity_threshold: float = 0.95, version_check_interval: float = 5.0):
+        self.entries = LRUCache(max_size=max_size, ttl=ttl)
+        self.similarity_threshold = similarity_threshold
+        self.version_check_interval = version_check_interval
+        self.graph_version: Optional[int] = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._last_version_check = 0.0
+        self._keys: List[str] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> Optional["AnswerCache"]:
+        config = settings.general.api.answer_cache
+        if not config.enabled:
+            return None
+        return cls(
+            max_size=config.max_size,
+            ttl=config.ttl_seconds,
+            similarity_threshold=config.similarity_threshold,
+            version_check_interval=config.version_check_interval,
+        )
+
+    async def sync_version(self, get_version: Callable[[], Awaitable[int]]):
+        """
+        Re-reads the graph version at most every version_check_interval
+        seconds and clears the cache when it changed.
+        """
+        now = time.monotonic()
+        if now - self._last_version_check < self.version_check_interval:
+            return
+        self._last_version_check = now
+        try:
+            version = await get_version()
+        except Exception as e:
+            print(f"Answer cache: could not read graph version: {e}")
+            return
+        if version != self.graph_version:
+            if self.graph_version is not None:
+                print(f"Answer cache: graph version {self.graph_version} -> {version}, invalidating")
+            self.clear()
+            self.graph_version = version
+
+    async def lookup(self, question: str, embed: Callable[[str], Awaitable[List[float]]]) -> Optional[CacheHit]:
+        """
+        Exact normalized match first, then semantic match. The question is
+        only embedded when there are entries to compare against.
+        """
+        hit = self.get_exact(question)
+        if hit is None and self._keys:
+            hit = self.get_similar(await embed(question))
+        if hit is None:
+            self.misses += 1
+        elif hit.match == "exact":
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        return hit
+
+    def get_exact(self, question: str) -> Optional[CacheHit]:
+        value = self.entries.get(normalize_question(question))
+        return CacheHit(value, "exact") if value is not None else None
+
+    def get_similar(self, embedding: List[float]) -> Optional[CacheHit]:
+        with self._lock:
+            if self._vectors is None or not self._keys:
+                return None
+            query = _unit(np.asarray(embedding, dtype=np.float32))
+            scores = self._vectors @ query
+            best = int(np.argmax(scores))
+            similarity, key = float(scores[best]), self._keys[best]
+
+        if similarity < self.similarity_threshold:
+            return None
+        value = self.entries.get(key)
+        if value is None:
+            # Expired or evicted from the LRU since it was indexed
+            self._drop(key)
+            return None
+        return CacheHit(value, "semantic", similarity)
+
+    def put(self, question: str, value: Any, embedding: List[float] = None):
+        key = normalize_question(question)
+        self.entries.set(key, value)
+        if embedding is None:
+            return
+        vector = _unit(np.asarray(embedding, dtype=np.float32))[None, :]
+        with self._lock:
+            if key in self._keys:
+                self._vectors[self._keys.index(key)] = vector[0]
+            else:
+                self._keys.append(key)
+                self._vectors = vector if self._vectors is None else np.vstack([self._vectors, vector])
+            # Drop index rows whose entries were evicted once the index outgrows the LRU
+            if len(self._keys) > 2 * self.entries.max_size:
+                live = [i for i, k in enumerate(self._keys) if k in self.entries]
+                self._keys = [self._keys[i] for i in live]
+                self._vectors = self._vectors[live] if live else None
+
+    def clear(self):
+        self.entries.clear()
+        with self._lock:
+            self._keys = []
+            self._vectors = None
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            entries=len(self.entries),
+            hits=self.exact_hits + self.semantic_hits,
+            misses=self.misses,
+        )
+
+    def _drop(self, key: str):
+        with self._lock:
+            if key in self._keys:
+                i = self._keys.index(key)
+                del self._keys[i]
+                self._vectors = np.delete(self._vectors, i, axis=0) if self._keys else None
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,191 @@
+"""
+Load balancing across replicas of one model endpoint.
+
+VLLM_BASE_URL / OLLAMA_BASE_URL may list several comma-separated replicas.
+The provider client then builds one chat model per replica and wraps them in
+a BalancedRunnable: each request goes to the replica with the fewest requests
+in flight, and a replica that keeps failing with transient errors is taken
+out of rotation for eject_seconds. If every replica is out, the one due back
+first is used rather than failing outright.
+
+Balancing sits inside the retry layer (resilience.py), so a retry is routed
+afresh and usually lands on another replica.
+"""
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain_core.runnables import Runnable
+
+from config.settings import settings
+from .metrics import Sample, counter, register_collector
+from .resilience import is_retryable
+
+
+def split_urls(value: str) -> List[str]:
+    """'http://a:8000/v1, http://b:8000/v1' -> ['http://a:8000/v1', 'http://b:8000/v1']"""
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class Endpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+
+class LoadBalancer:
+    """
+    Least-outstanding-requests routing with passive health checks.
+
+    Usage:
+        with balancer.route() as index:
+            result = replicas[index].invoke(prompt)
+    """
+
+    def __init__(self, name: str, urls: List[str], failure_threshold: int = 3, eject_seconds: float = 30.0):
+        self.name = name
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        # Rotates the starting point so ties are spread round-robin
+        self._rotation = itertools.count()
+        self._lock = threading.Lock()
+        register_collector(self.samples)
+
+    @classmethod
+    def from_settings(cls, name: str, urls: List[str]) -> "LoadBalancer":
+        config = settings.general.llm.load_balancing
+        return cls(name, urls, failure_threshold=config.failure_threshold, eject_seconds=config.eject_seconds)
+
+    def acquire(self) -> int:
+        """Picks a replica and counts the request as in flight on it."""
+        with self._lock:
+            now = time.monotonic()
+            count = len(self.endpoints)
+            start = next(self._rotation) % count
+            order = [self.endpoints[(start + i) % count] for i in range(count)]
+            healthy = [e for e in order if e.ejected_until <= now]
+            if healthy:
+                endpoint = min(healthy, key=lambda e: e.outstanding)
+            else:
+                endpoint = min(order, key=lambda e: e.ejected_until)
+            endpoint.outstanding += 1
+            return self.endpoints.index(endpoint)
+
+    def release(self, index: int, error: Optional[BaseException] = None):
+        """Ends a request; transient errors count towards ejecting the replica."""
+        with self._lock:
+            endpoint = self.endpoints[index]
+            endpoint.outstanding -= 1
+            if error is None or not is_retryable(error):
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            if endpoint.failures < self.failure_threshold:
+                return
+            endpoint.failures = 0
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        counter("llm_endpoint_ejections_total", "LLM replicas taken out of rotation",
+                {"provider": self.name, "endpoint": endpoint.url}).inc()
+        print(f"[LLM] {self.name}: ejecting {endpoint.url} for {self.eject_seconds:.0f}s "
+              f"after {self.failure_threshold} consecutive failures ({type(error).__name__})")
+
+    @contextmanager
+    def route(self) -> Iterator[int]:
+        index = self.acquire()
+        try:
+            yield index
+        except Exception as e:
+            self.release(index, e)
+            raise
+        except BaseException:
+            # Cancelled or closed early: not the replica's fault
+            self.release(index)
+            raise
+        else:
+            self.release(index)
+
+    @asynccontextmanager
+    async def aroute(self) -> AsyncIterator[int]:
+        with self.route() as index:
+            yield index
+
+    def samples(self):
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            labels = {"provider": self.name, "endpoint": endpoint.url}
+            yield Sample("llm_endpoint_in_flight", "gauge", "LLM requests in flight per replica", labels,
+                         endpoint.outstanding)
+            yield Sample("llm_endpoint_healthy", "gauge", "Whether an LLM replica is in rotation", labels,
+                         int(endpoint.ejected_until <= now))
+
+
+class BalancedRunnable(Runnable):
+    """
+    Routes invoke, ainvoke, stream and astream (and so the default batch
+    methods) to one of several equivalent runnables, one per replica.
+    with_structured_output and bind_tools apply to every replica and keep
+    the same balancer; other attributes are the first replica's.
+    """
+
+    def __init__(self, replicas: List[Runnable], balancer: LoadBalancer):
+        self.replicas = replicas
+        self.balancer = balancer
+
+    def __getattr__(self, name):
+        if name in ("replicas", "balancer"):
+            raise AttributeError(name)
+        return getattr(self.replicas[0], name)
+
+    def __repr__(self) -> str:
+        urls = ", ".join(e.url for e in self.balancer.endpoints)
+        return f"BalancedRunnable({self.replicas[0]!r}, endpoints=[{urls}])"
+
+    @property
+    def InputType(self):
+        return self.replicas[0].InputType
+
+    @property
+    def OutputType(self):
+        return self.replicas[0].OutputType
+
+    def get_name(self, suffix: Optional[str] = None, *, name: Optional[str] = None) -> str:
+        return self.replicas[0].get_name(suffix, name=name)
+
+    def invoke(self, input, config=None, **kwargs):
+        with self.balancer.route() as index:
+            return self.replicas[index].invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        async with self.balancer.aroute() as index:
+            return await self.replicas[index].ainvoke(input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        with self.balancer.route() as index:
+            yield from self.replicas[index].stream(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        async with self.balancer.aroute() as index:
+            async for chunk in self.replicas[index].astream(input, config, **kwargs):
+                yield chunk
+
+    def with_structured_output(self, *args, **kwargs) -> "BalancedRunnable":
+        return BalancedRunnable([r.with_structured_output(*args, **kwargs) for r in self.replicas], self.balancer)
+
+    def bind_tools(self, *args, **kwargs) -> "BalancedRunnable":
+        return BalancedRunnable([r.bind_tools(*args, **kwargs) for r in self.replicas], self.balancer)
+
+
+def balanced(name: str, urls: List[str], build) -> Runnable:
+    """
+    One client per URL via build(url); a single URL returns its client unwrapped.
+    """
+    replicas = [build(url) for url in urls]
+    if len(replicas) == 1:
+        return replicas[0]
+    print(f"[LLM] {name}: balancing across {len(urls)} endpoints")
+    return BalancedRunnable(replicas, LoadBalancer.from_settings(name, urls))
@@ -0,0 +1,222 @@
+"""
+Caching primitives shared by the LLM and retrieval layers.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Hashable, List, Optional
+
+
+@dataclass
+class CacheStats:
+    entries: int = 0
+    total_bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    oldest: Optional[float] = None
+    newest: Optional[float] = None
+
+
+def normalize_question(text: str) -> str:
+    """
+    Canonical form of a question for cache keys: Unicode-normalized,
+    lowercased, whitespace collapsed and trailing punctuation removed, so
+    "What is CS?" and "  what is   cs " share an entry.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.").strip()
+
+
+def load_questions(path: str, limit: int = None) -> List[str]:
+    """
+    Reads questions from a JSON file (a list of strings or of objects with
+    a "question" key, like tests/test_queries.json) or a text file with one
+    question per line. With a limit, only the last `limit` questions are
+    kept; text files are streamed, so a long log is never held in memory.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            items = json.load(f)
+            questions = [item["question"] if isinstance(item, dict) else item for item in items]
+            return questions[-limit:] if limit else questions
+        lines = deque((line for line in f if line.strip()), maxlen=limit or None)
+        return [line.strip() for line in lines]
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with hit/miss counters and optional TTL.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl is not None and time.monotonic() - entry[1] > self.ttl):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(entries=len(self._data), hits=self.hits, misses=self.misses)
+
+
+class DiskCache:
+    """
+    Persistent key/value store on SQLite with LRU eviction.
+
+    Entries are evicted least-recently-used first whenever the cache grows
+    beyond max_entries or max_bytes (either limit may be None). Safe to share
+    between threads; WAL mode lets several processes read concurrently.
+    """
+
+    def __init__(self, path: str, max_entries: int = None, max_bytes: int = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: bytes):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict(self.max_entries, self.max_bytes)
+            self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        # Unlike get, does not count as a hit or refresh the entry
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def prune(self, max_entries: int = None, max_bytes: int = None, older_than: float = None) -> int:
+        """
+        Evicts entries beyond the given limits (LRU first) and entries not
+        accessed for `older_than` seconds. Returns the number removed.
+        """
+        with self._lock:
+            before = self._evictions
+            if older_than is not None:
+                cursor = self._conn.execute("DELETE FROM entries WHERE accessed < ?", (time.time() - older_than,))
+                self._evictions += cursor.rowcount
+            self._evict(max_entries, max_bytes)
+            self._conn.commit()
+            return self._evictions - before
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries, total, oldest, newest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(accessed), MAX(accessed) FROM entries"
+            ).fetchone()
+        return CacheStats(
+            entries=entries, total_bytes=total, hits=self._hits, misses=self._misses,
+            evictions=self._evictions, oldest=oldest, newest=newest,
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self, max_entries: Optional[int], max_bytes: Optional[int]):
+        # Caller holds the lock
+        if max_entries is not None:
+            cursor = self._conn.execute("""
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+            """, (max_entries,))
+            self._evictions += cursor.rowcount
+        if max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > max_bytes:
+                excess = total - max_bytes
+                victims = []
+                for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                self._evictions += len(victims)
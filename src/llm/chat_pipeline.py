@@ -0,0 +1,382 @@
+"""
+Chat request pipeline expressed as a DAG of async stages.
+
+          ┌──> guardrail ──────────────────────────────┐
+    embed ┴──> retrieve ──> expand ──> context ──> generate
+
+The guardrail reuses the query embedding for its local classifier and runs
+alongside retrieval, since its verdict does not change what is retrieved.
+Retrieval is one Neo4j query returning chunks and their linked entities;
+expansion is a second, bounded k-hop query from those entities.
+When the guardrail rejects a question the run is aborted and any retrieval
+still in flight is cancelled.
+
+run_batch answers many questions with the same stages, but each stage runs
+once for the whole batch (one embedding call, one guardrail pass, one
+retrieval and one expansion query) before the generations are fanned out.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from . import telemetry
+from .answer_cache import AnswerCache
+from .context_builder import BuiltContext, ContextStats
+from .dag import PipelineAborted, StageGraph
+from .embeddings import get_embedding_executor
+from .guardrail import GuardrailResult
+
+OUT_OF_SCOPE_MESSAGE = "I only answer questions about UET Lahore departments, programs, and faculty. "
+NO_CONTEXT_MESSAGE = "I couldn't find any relevant information in the documents."
+
+
+@dataclass
+class ChatResult:
+    answer: str
+    is_department_related: bool
+    guardrail_reason: Optional[str] = None
+    # The guardrail's LLM check failed and its verdict is a fallback guess
+    guardrail_fallback: bool = False
+    sources: List[str] = field(default_factory=list)
+    context: str = ""
+    # "exact" or "semantic" when served from the answer cache
+    cache_match: Optional[str] = None
+    context_stats: Optional[ContextStats] = None
+    # Set instead of raising when one question of a batch fails
+    error: Optional[str] = None
+    timings: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+
+def extract_content(response) -> str:
+    """Robustly extract text content from an LLM response or chunk."""
+    content = ""
+    raw_content = response.content if hasattr(response, "content") else response
+
+    if isinstance(raw_content, list):
+        # Handle list of blocks (e.g. from Gemini: [{'type': 'text', 'text': '...'}])
+        for block in raw_content:
+            if isinstance(block, dict) and "text" in block:
+                content += block["text"]
+            elif isinstance(block, str):
+                content += block
+    else:
+        content = str(raw_content)
+    return content
+
+
+def extract_sources(context: str) -> List[str]:
+    """Extract source chunk IDs from the formatted context."""
+    sources = []
+    for line in context.split("\n"):
+        if "ID:" in line:
+            try:
+                chunk_id = line.split("ID: ")[1].split(",")[0]
+                sources.append(chunk_id)
+            except IndexError:
+                pass
+    return sources
+
+
+class ChatPipeline:
+    """
+    Runs guardrail, retrieval and generation for one question.
+
+    Args:
+        retriever: HybridRetriever used for embedding and retrieval.
+        guardrail: DepartmentGuardrail, or None to allow every question.
+        chain: Runnable taking {"context", "question"} and returning the answer.
+        top_k: Number of chunks to retrieve.
+        answer_cache: Optional AnswerCache consulted before running the pipeline.
+    """
+
+    def __init__(self, retriever, guardrail, chain, top_k: int = 3, answer_cache: AnswerCache = None):
+        self.retriever = retriever
+        self.guardrail = guardrail
+        self.chain = chain
+        self.top_k = top_k
+        self.answer_cache = answer_cache
+        self.retrieval_graph = self._build_retrieval_graph()
+        self.graph = self._build_graph()
+
+    def _build_retrieval_graph(self) -> StageGraph:
+        graph = StageGraph()
+        graph.add("embed", lambda ctx: self.retriever.aembed(ctx["question"]))
+        graph.add("guardrail", self._guardrail_stage, deps=["embed"])
+        graph.add("retrieve", lambda ctx: self.retriever.aretrieve(ctx["embed"], top_k=self.top_k),
+                  deps=["embed"])
+        graph.add("expand", lambda ctx: self.retriever.aexpand([c["id"] for c in ctx["retrieve"][0]]),
+                  deps=["retrieve"])
+        graph.add("context", self._context_stage, deps=["retrieve", "expand"])
+        return graph
+
+    def _build_graph(self) -> StageGraph:
+        graph = self._build_retrieval_graph()
+        graph.add("generate", self._generate_stage, deps=["guardrail", "context"])
+        return graph
+
+    async def run(self, question: str) -> ChatResult:
+        """
+        Answers a question. Guardrail rejections are returned as results, not raised.
+        """
+        started = time.perf_counter()
+        hit = await self._cache_lookup(question)
+        cache_span = (started, time.perf_counter())
+        if hit is not None:
+            hit.timings = {"cache": cache_span}
+            telemetry.record_run("chat", hit.timings)
+            return hit
+
+        try:
+            run = await self.graph.run(question=question)
+        except PipelineAborted as aborted:
+            result = replace(aborted.result, timings={"cache": cache_span, **aborted.timings})
+        else:
+            result = self._build_result(run.results["guardrail"], run.results["context"],
+                                        run.results["generate"], {"cache": cache_span, **run.timings})
+
+        telemetry.record_run("chat", result.timings)
+        await self._cache_store(question, result)
+        return result
+
+    async def astream(self, question: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streams an answer as (event, data) pairs:
+
+        - ("meta", {...}) once retrieval and the guardrail are done, carrying
+          sources, guardrail and cache metadata,
+        - ("token", {"text": ...}) for each piece of the answer from astream,
+        - ("done", {"answer": ...}) with the full answer at the end.
+        """
+        started = time.perf_counter()
+        hit = await self._cache_lookup(question)
+        timings = {"cache": (started, time.perf_counter())}
+        if hit is not None:
+            result = hit
+        else:
+            try:
+                run = await self.retrieval_graph.run(question=question)
+            except PipelineAborted as aborted:
+                result = aborted.result
+                timings.update(aborted.timings)
+            else:
+                timings.update(run.timings)
+                guardrail_result, context = run.results["guardrail"], run.results["context"]
+                if context.text:
+                    result = self._build_result(guardrail_result, context, "", timings)
+                    yield "meta", _meta(result)
+
+                    generate_started = time.perf_counter()
+                    async for chunk in self.chain.astream({"context": context.text, "question": question}):
+                        telemetry.record_tokens(chunk)
+                        text = extract_content(chunk)
+                        if text:
+                            result.answer += text
+                            yield "token", {"text": text}
+                    timings["generate"] = (generate_started, time.perf_counter())
+                    telemetry.record_tokens(None, context_tokens=context.stats.tokens)
+                    telemetry.record_run("stream", timings)
+                    yield "done", {"answer": result.answer}
+                    await self._cache_store(question, result)
+                    return
+                result = self._build_result(guardrail_result, context, None, timings)
+            await self._cache_store(question, result)
+        telemetry.record_run("stream", timings)
+
+        # Rejected, empty or cached answers are sent in one piece
+        yield "meta", _meta(result)
+        yield "token", {"text": result.answer}
+        yield "done", {"answer": result.answer}
+
+    async def run_batch(self, questions: List[str], max_in_flight: int = 8) -> AsyncIterator[Tuple[int, ChatResult]]:
+        """
+        Answers many questions, yielding (index, ChatResult) pairs as each
+        answer completes. Cached answers and guardrail rejections come
+        first; at most max_in_flight LLM requests run at a time. A failed
+        generation sets the result's error instead of failing the batch.
+        """
+        loop = asyncio.get_running_loop()
+        timings = {}
+        started = time.perf_counter()
+        embeddings = await loop.run_in_executor(get_embedding_executor(), self.retriever.embed_queries, questions)
+        timings["embed"] = (started, time.perf_counter())
+
+        # The query cache now holds every embedding, so lookups stay on the loop
+        started = time.perf_counter()
+        pending = []
+        for i, question in enumerate(questions):
+            hit = await self._cache_lookup(question)
+            if hit is not None:
+                yield i, hit
+            else:
+                pending.append(i)
+        timings["cache"] = (started, time.perf_counter())
+        if not pending:
+            telemetry.record_run("batch", timings)
+            return
+
+        started = time.perf_counter()
+        if self.guardrail is None:
+            verdicts = [GuardrailResult(is_allowed=True, reason="Guardrail disabled")] * len(pending)
+        else:
+            verdicts = await self.guardrail.acheck_batch([questions[i] for i in pending],
+                                                         embeddings=[embeddings[i] for i in pending],
+                                                         max_concurrency=max_in_flight)
+        timings["guardrail"] = (started, time.perf_counter())
+        allowed = []
+        for i, verdict in zip(pending, verdicts):
+            if verdict.is_allowed:
+                allowed.append((i, verdict))
+            else:
+                result = _rejected(verdict)
+                await self._cache_store(questions[i], result)
+                yield i, result
+        if not allowed:
+            telemetry.record_run("batch", timings)
+            return
+
+        started = time.perf_counter()
+        retrieved = await self.retriever.aretrieve_batch([embeddings[i] for i, _ in allowed], top_k=self.top_k)
+        timings["retrieve"] = (started, time.perf_counter())
+        started = time.perf_counter()
+        facts = await self.retriever.aexpand_batch([[c["id"] for c in chunks] for chunks, _ in retrieved])
+        timings["expand"] = (started, time.perf_counter())
+        generate_started = time.perf_counter()
+        slots = asyncio.Semaphore(max_in_flight)
+
+        async def answer(i, verdict, chunks, entities, chunk_facts):
+            context = await self._context_stage({"retrieve": (chunks, entities), "expand": chunk_facts})
+            if not context.text:
+                return i, self._build_result(verdict, context, None, {})
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    response = await self.chain.ainvoke({"context": context.text, "question": questions[i]})
+                except Exception as e:
+                    return i, replace(self._build_result(verdict, context, "", {}), error=f"LLM error: {e}")
+                finally:
+                    telemetry.observe_stage("batch", "generate_one", time.perf_counter() - started)
+            telemetry.record_tokens(response, context_tokens=context.stats.tokens)
+            return i, self._build_result(verdict, context, extract_content(response), {})
+
+        tasks = [
+            asyncio.ensure_future(answer(i, verdict, chunks, entities, chunk_facts))
+            for (i, verdict), (chunks, entities), chunk_facts in zip(allowed, retrieved, facts)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, result = await next_done
+                if result.error is None:
+                    await self._cache_store(questions[i], result)
+                yield i, result
+            timings["generate"] = (generate_started, time.perf_counter())
+            telemetry.record_run("batch", timings)
+        finally:
+            # The consumer may stop early (e.g. a client disconnecting mid-stream)
+            for task in tasks:
+                task.cancel()
+
+    async def warm_answer_cache(self, questions: List[str], concurrency: int = 4) -> int:
+        """
+        Answers questions ahead of time so they are served from the cache.
+        Returns the number of questions answered successfully.
+        """
+        if self.answer_cache is None:
+            return 0
+        slots = asyncio.Semaphore(concurrency)
+
+        async def answer(question):
+            async with slots:
+                try:
+                    await self.run(question)
+                    return True
+                except Exception as e:
+                    print(f"Answer cache warm-up failed for '{question[:40]}': {e}")
+                    return False
+
+        return sum(await asyncio.gather(*(answer(q) for q in questions)))
+
+    def _build_result(self, guardrail_result, context: BuiltContext, answer: Optional[str], timings) -> ChatResult:
+        if not context.text:
+            return ChatResult(
+                answer=NO_CONTEXT_MESSAGE,
+                is_department_related=True,
+                guardrail_reason=guardrail_result.reason,
+                guardrail_fallback=guardrail_result.fallback,
+                timings=timings,
+            )
+        return ChatResult(
+            answer=answer,
+            is_department_related=True,
+            guardrail_reason=guardrail_result.reason,
+            guardrail_fallback=guardrail_result.fallback,
+            sources=extract_sources(context.text),
+            context=context.text,
+            context_stats=context.stats,
+            timings=timings,
+        )
+
+    async def _cache_lookup(self, question: str) -> Optional[ChatResult]:
+        if self.answer_cache is None:
+            return None
+        await self.answer_cache.sync_version(self.retriever.graph_manager.aget_graph_version)
+        hit = await self.answer_cache.lookup(question, self.retriever.aembed)
+        if hit is None:
+            return None
+        return replace(hit.value, cache_match=hit.match)
+
+    async def _cache_store(self, question: str, result: ChatResult):
+        if self.answer_cache is None:
+            return
+        if result.is_department_related and not result.context:
+            # Retrieval swallows Neo4j errors and returns nothing, so an empty
+            # context may be an outage; answering it again costs no LLM call
+            return
+        if result.guardrail_fallback:
+            # The guardrail LLM failed; its guess must not outlive the outage
+            return
+        # The embedding is already in the query cache, so this is cheap
+        embedding = await self.retriever.aembed(question)
+        self.answer_cache.put(question, replace(result, context="", timings={}), embedding=embedding)
+
+    # --- Stages ---
+    async def _guardrail_stage(self, ctx) -> GuardrailResult:
+        if self.guardrail is None:
+            return GuardrailResult(is_allowed=True, reason="Guardrail disabled")
+
+        result = await self.guardrail.acheck(ctx["question"], embedding=ctx["embed"])
+        if not result.is_allowed:
+            raise PipelineAborted(_rejected(result))
+        return result
+
+    async def _context_stage(self, ctx) -> BuiltContext:
+        chunks, entities = ctx["retrieve"]
+        if not chunks:
+            return BuiltContext(text="", stats=ContextStats())
+        return self.retriever.build_context(chunks, entities, ctx["expand"])
+
+    async def _generate_stage(self, ctx) -> Any:
+        if not ctx["context"].text:
+            return None
+        response = await self.chain.ainvoke({"context": ctx["context"].text, "question": ctx["question"]})
+        telemetry.record_tokens(response, context_tokens=ctx["context"].stats.tokens)
+        return extract_content(response)
+
+
+def _rejected(guardrail_result: GuardrailResult) -> ChatResult:
+    return ChatResult(
+        answer=OUT_OF_SCOPE_MESSAGE + guardrail_result.reason,
+        is_department_related=False,
+        guardrail_reason=guardrail_result.reason,
+        guardrail_fallback=guardrail_result.fallback,
+    )
+
+
+def _meta(result: ChatResult) -> Dict[str, Any]:
+    return {
+        "is_department_related": result.is_department_related,
+        "guardrail_reason": result.guardrail_reason,
+        "sources": result.sources,
+        "cached": result.cache_match is not None,
+        "cache_match": result.cache_match,
+    }
@@ -0,0 +1,212 @@
+"""
+Token-budgeted prompt context assembly.
+
+Retrieved chunks overlap their neighbours (chunk_overlap), so the builder
+first trims spans already present in a higher-scoring chunk, then fills the
+token budget in priority order: chunks by score, entities, related facts.
+"""
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import settings
+from .enums import LLMProvider
+
+TokenCounter = Callable[[str], int]
+
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextStats:
+    # Tokens the untrimmed, unbounded context would have used
+    raw_tokens: int = 0
+    tokens: int = 0
+    chunks: int = 0
+    dropped_chunks: int = 0
+    overlap_chars: int = 0
+    entities: int = 0
+    facts: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.tokens
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    stats: ContextStats
+
+
+def approximate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(tokenizer_name: Optional[str] = None) -> TokenCounter:
+    """
+    Token counter for the generation model.
+
+    Uses the configured Hugging Face tokenizer, or the vLLM model's own
+    tokenizer, and falls back to a character estimate when no tokenizer is
+    available locally (e.g. Gemini). Nothing is downloaded: the name is a
+    tokenizer.json path, a directory holding one, or a Hub id already in the
+    local Hugging Face cache.
+    """
+    name = tokenizer_name or settings.general.retrieval.context.tokenizer
+    if name is None and settings.env.llm_provider == LLMProvider.VLLM.value:
+        name = settings.env.vllm_model
+    if name is None:
+        return approximate_tokens
+
+    try:
+        path = _local_tokenizer_file(name)
+        if path is None:
+            print(f"Tokenizer '{name}' not found locally, estimating tokens from length")
+            return approximate_tokens
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_file(path)
+    except Exception as e:
+        print(f"Tokenizer '{name}' unavailable, estimating tokens from length: {e}")
+        return approximate_tokens
+
+    def count(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return count
+
+
+def _local_tokenizer_file(name: str) -> Optional[str]:
+    if os.path.isfile(name):
+        return name
+    if os.path.isdir(name):
+        path = os.path.join(name, "tokenizer.json")
+        return path if os.path.isfile(path) else None
+    # A cache lookup only: a cold start must not wait on (or time out at) the Hub
+    from huggingface_hub import try_to_load_from_cache
+    path = try_to_load_from_cache(repo_id=name, filename="tokenizer.json")
+    return path if isinstance(path, str) else None
+
+
+def _overlap(left: str, right: str, min_overlap: int) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`
+    (0 if shorter than min_overlap).
+    """
+    if min(len(left), len(right)) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    start = max(0, len(left) - len(right))
+    pos = left.find(probe, start)
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
+
+
+class ContextBuilder:
+    def __init__(self, max_tokens: int = 2000, min_overlap: int = 50, count_tokens: TokenCounter = None):
+        self.max_tokens = max_tokens
+        self.min_overlap = min_overlap
+        self.count_tokens = count_tokens or get_token_counter()
+
+    @classmethod
+    def from_settings(cls, count_tokens: TokenCounter = None) -> "ContextBuilder":
+        config = settings.general.retrieval.context
+        return cls(max_tokens=config.max_tokens, min_overlap=config.min_overlap, count_tokens=count_tokens)
+
+    def build(self, chunks: List[Dict[str, Any]], entities: List[Dict[str, Any]] = None,
+              facts: List[Dict[str, Any]] = None) -> BuiltContext:
+        stats = ContextStats()
+        chunks = sorted(chunks, key=lambda c: c['score'], reverse=True)
+        entity_lines = [self._entity_line(e) for e in entities or []]
+        fact_lines = [f"{f['source']} -[{f['type']}]-> {f['target']}" for f in facts or []]
+
+        stats.raw_tokens = sum(self.count_tokens(self._chunk_block(c, c['text'])) for c in chunks)
+        stats.raw_tokens += sum(self.count_tokens(line) for line in entity_lines + fact_lines)
+
+        parts = []
+        budget = self.max_tokens
+        kept_texts = []
+        for chunk in chunks:
+            text = self._trim_overlap(chunk['text'], kept_texts, stats)
+            if not text:
+                stats.dropped_chunks += 1
+                continue
+            block = self._chunk_block(chunk, text)
+            cost = self._cost(block, first=not parts)
+            if cost > budget:
+                stats.dropped_chunks += 1
+                continue
+            parts.append(block)
+            kept_texts.append(chunk['text'])
+            budget -= cost
+            stats.chunks += 1
+
+        # Entities and facts only make sense alongside at least one chunk
+        if parts:
+            budget = self._fill(parts, "\n--- Key Entities Mentioned in Context ---", entity_lines, budget, stats, "entities")
+            self._fill(parts, "\n--- Related Facts ---", fact_lines, budget, stats, "facts")
+
+        text = SEPARATOR.join(parts)
+        stats.tokens = self.count_tokens(text) if text else 0
+        return BuiltContext(text=text, stats=stats)
+
+    def _trim_overlap(self, text: str, kept_texts: List[str], stats: ContextStats) -> str:
+        """
+        Removes spans of `text` already present in higher-scoring chunks:
+        a leading span that repeats a kept chunk's tail, a trailing span that
+        repeats a kept chunk's head, or the whole chunk if it is contained.
+        """
+        for kept in kept_texts:
+            if text in kept:
+                stats.overlap_chars += len(text)
+                return ""
+            head = _overlap(kept, text, self.min_overlap)
+            if head:
+                stats.overlap_chars += head
+                text = text[head:].lstrip()
+            tail = _overlap(text, kept, self.min_overlap)
+            if tail:
+                stats.overlap_chars += tail
+                text = text[:-tail].rstrip()
+            if not text:
+                return ""
+        return text
+
+    def _fill(self, parts: List[str], header: str, lines: List[str], budget: int,
+              stats: ContextStats, counter: str) -> int:
+        if not lines:
+            return budget
+        header_cost = self._cost(header)
+        if header_cost >= budget:
+            return budget
+        taken = []
+        remaining = budget - header_cost
+        for line in lines:
+            cost = self._cost(line)
+            if cost <= remaining:
+                taken.append(line)
+                remaining -= cost
+        if not taken:
+            return budget
+        parts.append(header)
+        parts.extend(taken)
+        setattr(stats, counter, len(taken))
+        return remaining
+
+    def _cost(self, piece: str, first: bool = False) -> int:
+        # Includes the separator the piece is joined with
+        return self.count_tokens(piece if first else SEPARATOR + piece)
+
+    @staticmethod
+    def _chunk_block(chunk: Dict[str, Any], text: str) -> str:
+        return f"--- Document Chunk (ID: {chunk['id']}, Score: {chunk['score']:.2f}) ---\n{text}"
+
+    @staticmethod
+    def _entity_line(entity: Dict[str, Any]) -> str:
+        props_str = ", ".join(f"{k}: {v}" for k, v in entity['properties'])
+        return f"Entity: {entity['name']} | Details: {props_str}"
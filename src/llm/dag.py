@@ -0,0 +1,116 @@
+"""
+Minimal async DAG executor.
+
+Stages declare the stages they depend on; each stage starts as soon as all
+of its dependencies have finished, so independent stages run concurrently and
+total latency is the longest path through the graph rather than the sum of
+all stages. A stage can stop the whole run early by raising PipelineAborted,
+which cancels every stage that is still pending or running.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+
+class PipelineAborted(Exception):
+    """
+    Raised by a stage to stop the run; `result` is handed to the caller,
+    together with the `timings` of the stages that had finished.
+    """
+
+    def __init__(self, result: Any = None):
+        super().__init__(result)
+        self.result = result
+        self.timings: Dict[str, Tuple[float, float]] = {}
+
+
+class StageError(Exception):
+    """Wraps an unexpected exception raised inside a stage."""
+
+    def __init__(self, stage: str, cause: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {cause}")
+        self.stage = stage
+        self.cause = cause
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+
+
+@dataclass
+class RunResult:
+    results: Dict[str, Any] = field(default_factory=dict)
+    # stage name -> (start, end) in time.perf_counter() seconds
+    timings: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+
+class StageGraph:
+    """
+    Usage:
+        graph = StageGraph()
+        graph.add("embed", embed)
+        graph.add("search", search, deps=["embed"])
+        result = await graph.run(question="...")
+
+    Every stage function receives one dict holding the run inputs plus the
+    results of all stages it depends on (keyed by stage name).
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Awaitable[Any]], deps: Iterable[str] = ()):
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage '{name}'")
+        # Stages may only depend on earlier stages, so the graph is acyclic by construction
+        self.stages[name] = Stage(name, func, deps)
+        return self
+
+    async def run(self, **inputs) -> RunResult:
+        run = RunResult()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def execute(stage: Stage):
+            if stage.deps:
+                await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            ctx = dict(inputs)
+            ctx.update({dep: run.results[dep] for dep in stage.deps})
+            start = time.perf_counter()
+            try:
+                run.results[stage.name] = await stage.func(ctx)
+            except (PipelineAborted, StageError, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                raise StageError(stage.name, e) from e
+            finally:
+                run.timings[stage.name] = (start, time.perf_counter())
+            return run.results[stage.name]
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(execute(stage), name=f"stage:{stage.name}")
+
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        if isinstance(task.exception(), PipelineAborted):
+                            task.exception().timings = dict(run.timings)
+                        raise task.exception()
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            # Let cancelled stages unwind before returning
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        return run
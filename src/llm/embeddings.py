@@ -0,0 +1,278 @@
+"""
+Shared embedding model and batched embedding service.
+"""
+import array
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from config.settings import settings, resolve_path
+from .cache import CacheStats, DiskCache, LRUCache, normalize_question
+from .metrics import SIZE_BUCKETS, histogram
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_model(model_name: str = None):
+    """
+    Returns a process-wide embedding model (loaded once per model name).
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name or settings.general.llm.embedding_model)
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_executor() -> ThreadPoolExecutor:
+    """
+    Dedicated, bounded thread pool for CPU-bound query embedding, so model
+    inference never runs on (or starves) the event loop's default executor.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.general.api.embedding_workers,
+        thread_name_prefix="embed",
+    )
+
+
+class EmbeddingMicroBatcher:
+    """
+    Groups concurrent single-text embedding requests into batches.
+
+    A batch is sent as soon as it reaches max_batch_size, or max_wait_ms
+    after its first text arrived. Each batch is one embed_batch call on the
+    executor, so while one batch runs the next one fills up. Identical texts
+    within a batch are embedded once.
+
+    Records the "embedding_batch_size" and "embedding_queue_wait_seconds"
+    histograms.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[List[float]]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, executor: ThreadPoolExecutor = None):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.batch_sizes = histogram("embedding_batch_size", SIZE_BUCKETS, "Texts per batched embedding call")
+        self.queue_wait = histogram("embedding_queue_wait_seconds", description="Time a text waited for its batch")
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @classmethod
+    def from_settings(cls, embed_batch: Callable[[List[str]], List[List[float]]]) -> Optional["EmbeddingMicroBatcher"]:
+        config = settings.general.api.embedding_batch
+        if not config.enabled:
+            return None
+        return cls(embed_batch, max_batch_size=config.max_batch_size, max_wait_ms=config.max_wait_ms,
+                   executor=get_embedding_executor())
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        loop = asyncio.get_running_loop()
+        if self._pending:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        if batch:
+            loop.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        now = time.perf_counter()
+        for _, _, queued_at in batch:
+            self.queue_wait.observe(now - queued_at)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batch_sizes.observe(len(texts))
+
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self.executor, self.embed_batch, texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future, _ in batch:
+            # Callers may have been cancelled (e.g. the guardrail aborted the run)
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache of query embeddings keyed by the normalized question.
+
+    The in-memory tier is a bounded LRU. The optional persistent tier stores
+    float32 vectors on disk (keyed by model name too) so that restarts do not
+    start cold. Hits in the persistent tier are promoted to memory.
+    """
+
+    def __init__(self, model_name: str, max_size: int = 4096, persistent_path: str = None,
+                 max_entries: int = None, question_log: str = None):
+        self.model_name = model_name
+        self.memory = LRUCache(max_size=max_size)
+        self.disk = DiskCache(persistent_path, max_entries=max_entries) if persistent_path else None
+        self.question_log = question_log
+        self.hits = 0
+        self.misses = 0
+        self._log_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, model_name: str) -> Optional["QueryEmbeddingCache"]:
+        config = settings.general.retrieval.query_cache
+        if not config.enabled:
+            return None
+        return cls(
+            model_name,
+            max_size=config.max_size,
+            persistent_path=resolve_path(config.path) if config.persistent else None,
+            max_entries=config.max_entries,
+            question_log=resolve_path(config.question_log) if config.question_log else None,
+        )
+
+    def get(self, question: str, memory_only: bool = False) -> Optional[List[float]]:
+        """
+        Looks a question up in memory, then on disk. With memory_only=True a
+        memory miss returns None without counting it (used on the event loop,
+        where the disk lookup is deferred to a worker thread).
+        """
+        vector = self._lookup(normalize_question(question), memory_only)
+        if vector is not None:
+            self.hits += 1
+        elif not memory_only:
+            self.misses += 1
+        return vector
+
+    def contains(self, question: str) -> bool:
+        """Whether either tier holds the question (does not touch counters)."""
+        return self._lookup(normalize_question(question), memory_only=False) is not None
+
+    def set(self, question: str, vector: List[float]):
+        key = normalize_question(question)
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.set(self._disk_key(key), array.array("f", vector).tobytes())
+
+    def log_question(self, question: str):
+        """Appends a question to the question log (if configured)."""
+        if not self.question_log:
+            return
+        with self._log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.question_log)), exist_ok=True)
+            with open(self.question_log, "a", encoding="utf-8") as f:
+                f.write(question.replace("\n", " ").strip() + "\n")
+
+    def stats(self) -> CacheStats:
+        return CacheStats(entries=len(self.memory), hits=self.hits, misses=self.misses)
+
+    def _lookup(self, key: str, memory_only: bool) -> Optional[List[float]]:
+        vector = self.memory.get(key)
+        if vector is None and not memory_only and self.disk is not None:
+            raw = self.disk.get(self._disk_key(key))
+            if raw is not None:
+                vector = array.array("f", raw).tolist()
+                self.memory.set(key, vector)
+        return vector
+
+    def _disk_key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class EmbeddingStats:
+    processed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+class EmbeddingService:
+    """
+    Embeds text in batches through embed_documents and writes chunk
+    vectors back to Neo4j with batched UNWIND updates.
+    """
+
+    def __init__(self, embedding_model=None, batch_size: int = None):
+        self.embedding_model = embedding_model or get_embedding_model()
+        self.batch_size = batch_size or settings.general.ingestion.embedding_batch_size
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts in batches of batch_size, preserving order.
+        """
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self.embedding_model.embed_documents(texts[i:i + self.batch_size]))
+        return vectors
+
+    def embed_chunks(self, chunks: List[dict]) -> List[dict]:
+        """
+        Sets chunk['embedding'] for every chunk dict with a 'text' key.
+        """
+        vectors = self.embed_texts([c["text"] for c in chunks])
+        for chunk, vector in zip(chunks, vectors):
+            chunk["embedding"] = vector
+        return chunks
+
+    def reembed(
+        self,
+        graph_manager,
+        only_missing: bool = True,
+        page_size: int = None,
+        on_progress: Optional[Callable[[EmbeddingStats], None]] = None,
+    ) -> EmbeddingStats:
+        """
+        Streams Chunk nodes from Neo4j page by page (keyset pagination on id),
+        embeds each page and writes the vectors back, so memory stays constant
+        regardless of how many chunks exist.
+
+        Args:
+            graph_manager: GraphManager used for reads and writes.
+            only_missing: Only process chunks without an embedding.
+            page_size: Chunks fetched per page.
+            on_progress: Called with the running stats after every page.
+        """
+        page_size = page_size or settings.general.ingestion.reembed_page_size
+        stats = EmbeddingStats()
+        start = time.perf_counter()
+        after_id = ""
+
+        while True:
+            page = graph_manager.get_chunk_page(after_id=after_id, limit=page_size, only_missing=only_missing)
+            if not page:
+                break
+            after_id = page[-1]["id"]
+
+            chunks = [c for c in page if c.get("text")]
+            stats.skipped += len(page) - len(chunks)
+            if chunks:
+                self.embed_chunks(chunks)
+                graph_manager.set_chunk_embeddings(chunks)
+                stats.processed += len(chunks)
+
+            stats.elapsed = time.perf_counter() - start
+            if on_progress:
+                on_progress(stats)
+
+        stats.elapsed = time.perf_counter() - start
+        if stats.processed:
+            graph_manager.bump_graph_version()
+        return stats
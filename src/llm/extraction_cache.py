@@ -0,0 +1,76 @@
+"""
+Content-addressed cache for LLM graph extraction results.
+
+A cache key covers everything that determines the extraction output: the
+chunk text, the extraction prompt, the provider and the model name. Editing
+the prompt or switching models therefore misses exactly the affected entries,
+while re-ingesting unchanged text makes no LLM calls.
+"""
+import hashlib
+import json
+import threading
+from typing import Optional
+
+from pydantic import ValidationError
+
+from config.settings import settings, resolve_path
+from src.prompt_engineering.extraction import GraphData
+from .cache import DiskCache
+
+# Bump when the stored format or GraphData schema changes incompatibly
+CACHE_FORMAT_VERSION = 1
+
+
+def extraction_cache_key(text: str, prompt: str, provider: str, model: str) -> str:
+    payload = json.dumps(
+        {"v": CACHE_FORMAT_VERSION, "text": text, "prompt": prompt, "provider": provider, "model": model},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Stores validated GraphData per (text, prompt, provider, model).
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None, max_bytes: int = None):
+        config = settings.general.extraction_cache
+        self.store = DiskCache(
+            resolve_path(path or config.path),
+            max_entries=max_entries if max_entries is not None else config.max_entries,
+            max_bytes=max_bytes if max_bytes is not None else config.max_bytes,
+        )
+
+    def get(self, text: str, prompt: str, provider: str, model: str) -> Optional[dict]:
+        key = extraction_cache_key(text, prompt, provider, model)
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        try:
+            return GraphData.model_validate_json(raw).model_dump()
+        except ValidationError:
+            # Stale or corrupt entry: drop it and treat as a miss
+            self.store.delete(key)
+            return None
+
+    def put(self, text: str, prompt: str, provider: str, model: str, data: dict):
+        key = extraction_cache_key(text, prompt, provider, model)
+        self.store.set(key, GraphData.model_validate(data).model_dump_json().encode("utf-8"))
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """
+    Returns the shared extraction cache, or None when disabled in config.
+    """
+    global _cache
+    if not settings.general.extraction_cache.enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
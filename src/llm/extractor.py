@@ -1,18 +1,54 @@
+import threading
+from typing import Dict, List, Union
+
 from langchain_core.prompts import ChatPromptTemplate
 # from langchain_core.output_parsers import JsonOutputParser
 from src.llm import get_llm_client
-from src.prompt_engineering.extraction import GraphData
+from src.llm.factory import get_model_name
+from src.prompt_engineering.extraction import GraphData, PackedGraphData
 from config.settings import settings
 
-from .utils import retry_with_backoff
+from .context_builder import approximate_tokens
+from .extraction_cache import get_extraction_cache
+from .metrics import counter
+from .resilience import CircuitOpenError, is_retryable
 
-def get_extraction_chain():
-    # Use extraction_provider if configured, otherwise fallback to default logic
-    provider = getattr(settings.general.llm, "extraction_provider", None) 
+# Starts every chunk in a packed request; the model reports chunks by this number
+PACK_HEADER = "### Chunk {number}"
+
+def get_extraction_provider() -> str:
+    # Use extraction_provider if configured, otherwise fallback to LLM_PROVIDER
+    return getattr(settings.general.llm, "extraction_provider", None) or settings.env.llm_provider
+
+def packed_extraction_prompt() -> str:
+    return settings.prompts.extraction_prompt + "\n" + settings.prompts.packed_extraction_prompt
+
+_chains = {}
+_chains_lock = threading.Lock()
+
+def _cached_chain(kind: str, prompt_str: str, build):
+    """
+    Chains are built once per provider and prompt and reused (they share the
+    provider's pooled client from get_llm_client).
+    """
+    provider = get_extraction_provider()
     llm = get_llm_client(provider)
+    key = (kind, provider, prompt_str)
+    with _chains_lock:
+        cached = _chains.get(key)
+        # Rebuilt if get_llm_client hands out a different client (e.g. patched in benchmarks)
+        if cached is None or cached[0] is not llm:
+            _chains[key] = (llm, build(llm, prompt_str))
+        return _chains[key][1]
+
+def get_extraction_chain():
     # Use prompt from config
-    prompt_str = settings.prompts.extraction_prompt
-    
+    return _cached_chain("single", settings.prompts.extraction_prompt, _build_extraction_chain)
+
+def get_packed_extraction_chain():
+    return _cached_chain("packed", packed_extraction_prompt(), _build_packed_extraction_chain)
+
+def _build_extraction_chain(llm, prompt_str: str):
     prompt = ChatPromptTemplate.from_messages([
         ("system", prompt_str),
         ("human", "Text chunk: {text}")
@@ -24,9 +60,176 @@ def get_extraction_chain():
     chain = prompt | structured_llm
     return chain
 
-@retry_with_backoff(retries=3, initial_delay=2.0)
-def extract_graph_from_text(text: str) -> dict:
+def _build_packed_extraction_chain(llm, prompt_str: str):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", prompt_str),
+        ("human", "Text chunks:\n\n{chunks}")
+    ])
+    return prompt | llm.with_structured_output(PackedGraphData)
+
+def _extract_with_llm(text: str, rate_limiter=None) -> dict:
+    if rate_limiter is not None:
+        rate_limiter.acquire()
     chain = get_extraction_chain()
-    # Let decorator handle the exception for retries
+    # Transient provider errors are retried by the client (see resilience.py)
     result = chain.invoke({"text": text})
     return result.model_dump()
+
+def extract_graph_from_text(text: str, use_cache: bool = True, rate_limiter=None) -> dict:
+    """
+    Extracts graph data from a chunk, serving repeated chunks from the
+    extraction cache (keyed by text, prompt, provider and model).
+    The optional rate_limiter is only consulted for real LLM requests.
+    """
+    cache = get_extraction_cache() if use_cache else None
+    if cache is None:
+        return _extract_with_llm(text, rate_limiter=rate_limiter)
+
+    provider = get_extraction_provider()
+    key_parts = (text, settings.prompts.extraction_prompt, provider, get_model_name(provider))
+    cached = cache.get(*key_parts)
+    if cached is not None:
+        return cached
+
+    result = _extract_with_llm(text, rate_limiter=rate_limiter)
+    cache.put(*key_parts, result)
+    return result
+
+
+class PackPlanner:
+    """
+    Groups chunks into packed extraction requests.
+
+    A pack holds at most `limit` chunks and must fit the provider's context
+    window together with the prompt and the expected output of each chunk.
+    `limit` halves after a packed response fails validation and grows back
+    by one per clean response, up to max_chunks.
+    """
+
+    def __init__(self, context_tokens: int, prompt_tokens: int, output_tokens_per_chunk: int, max_chunks: int):
+        self.budget = context_tokens - prompt_tokens
+        self.output_tokens_per_chunk = output_tokens_per_chunk
+        self.max_chunks = max(1, max_chunks)
+        self.limit = self.max_chunks
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, provider: str) -> "PackPlanner":
+        config = settings.general.ingestion.packing
+        return cls(
+            context_tokens=config.context_tokens.get(provider, 8192),
+            prompt_tokens=approximate_tokens(packed_extraction_prompt()),
+            output_tokens_per_chunk=config.output_tokens_per_chunk,
+            max_chunks=config.max_chunks,
+        )
+
+    def plan(self, texts: List[str]) -> List[List[int]]:
+        """Splits text indices into consecutive packs."""
+        limit = self.limit
+        packs, current, used = [], [], 0
+        for i, text in enumerate(texts):
+            cost = approximate_tokens(PACK_HEADER.format(number=len(current) + 1) + "\n" + text)
+            cost += self.output_tokens_per_chunk
+            if current and (len(current) >= limit or used + cost > self.budget):
+                packs.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += cost
+        if current:
+            packs.append(current)
+        return packs
+
+    def record(self, complete: bool):
+        with self._lock:
+            if complete:
+                self.limit = min(self.max_chunks, self.limit + 1)
+            elif self.limit > 1:
+                self.limit = max(1, self.limit // 2)
+                print(f"[Extract] Packed response incomplete, packing at most {self.limit} chunks per request")
+
+
+_planners: Dict[str, PackPlanner] = {}
+_planners_lock = threading.Lock()
+
+def get_pack_planner(provider: str) -> PackPlanner:
+    with _planners_lock:
+        if provider not in _planners:
+            _planners[provider] = PackPlanner.from_settings(provider)
+        return _planners[provider]
+
+
+def _extract_packed_with_llm(texts: List[str], rate_limiter=None) -> Dict[int, dict]:
+    """
+    One request for several chunks. Returns graph data by position in
+    `texts`; chunks the response left out (or numbered wrongly) are missing.
+    """
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    chunks = "\n\n".join(f"{PACK_HEADER.format(number=n)}\n{text}" for n, text in enumerate(texts, 1))
+    result = get_packed_extraction_chain().invoke({"chunks": chunks})
+    graphs = {}
+    for entry in result.chunks:
+        position = entry.chunk - 1
+        if 0 <= position < len(texts) and position not in graphs:
+            graphs[position] = GraphData(nodes=entry.nodes, edges=entry.edges).model_dump()
+    return graphs
+
+
+def extract_graphs_from_texts(texts: List[str], use_cache: bool = True,
+                              rate_limiter=None) -> List[Union[dict, Exception]]:
+    """
+    Packed extraction: extracts several chunks per LLM request so the long
+    extraction prompt is sent once per pack instead of once per chunk.
+
+    Each chunk's nodes and edges come back separately, in input order.
+    Chunks missing from a packed response, or from a response that fails
+    validation, are extracted one at a time. A failed chunk's entry is the
+    exception instead of its graph data.
+    """
+    provider = get_extraction_provider()
+    cache = get_extraction_cache() if use_cache else None
+    model = get_model_name(provider)
+    packed_prompt = packed_extraction_prompt()
+
+    results: List[Union[dict, Exception, None]] = [None] * len(texts)
+    if cache is not None:
+        for i, text in enumerate(texts):
+            # A single-chunk extraction of the same text is just as good
+            results[i] = (cache.get(text, packed_prompt, provider, model)
+                          or cache.get(text, settings.prompts.extraction_prompt, provider, model))
+
+    def extract_one(i: int):
+        try:
+            results[i] = extract_graph_from_text(texts[i], use_cache=use_cache, rate_limiter=rate_limiter)
+        except Exception as e:
+            results[i] = e
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    planner = get_pack_planner(provider)
+    for pack in planner.plan([texts[i] for i in missing]):
+        indices = [missing[j] for j in pack]
+        if len(indices) == 1:
+            extract_one(indices[0])
+            continue
+
+        try:
+            graphs = _extract_packed_with_llm([texts[i] for i in indices], rate_limiter=rate_limiter)
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_retryable(e):
+                # The provider failed, not the response: single requests would fail too
+                for i in indices:
+                    results[i] = e
+                continue
+            print(f"[Extract] Packed response for {len(indices)} chunks failed validation: {str(e)[:100]}")
+            graphs = {}
+
+        planner.record(len(graphs) == len(indices))
+        for position, i in enumerate(indices):
+            if position in graphs:
+                results[i] = graphs[position]
+                if cache is not None:
+                    cache.put(texts[i], packed_prompt, provider, model, graphs[position])
+            else:
+                counter("extraction_pack_fallbacks_total", "Chunks re-extracted alone after a packed request").inc()
+                extract_one(i)
+    return results
@@ -1,23 +1,59 @@
-from .ollama_client import get_ollama_client
-from .gemini_client import get_gemini_client
-from .vllm_client import get_vllm_client
+import threading
+from typing import Dict
+
 from config.settings import settings
 from .enums import LLMProvider
+from .resilience import ResilientRunnable, get_resilience
+
+_clients: Dict[str, ResilientRunnable] = {}
+_clients_lock = threading.Lock()
 
 def get_llm_client(provider: str = None):
     """
     Get LLM client based on provider.
     
     Priority: argument > LLM_PROVIDER env var
+
+    Each provider's client is built once per process and shared, so its
+    pooled HTTP connections are reused. It is wrapped with the provider's
+    retry policy and circuit breaker (see resilience.py).
     """
     if provider is None:
         provider = settings.env.llm_provider
-            
+
+    with _clients_lock:
+        if provider not in _clients:
+            _clients[provider] = ResilientRunnable(_build_client(provider), get_resilience(provider))
+        return _clients[provider]
+
+
+def _build_client(provider: str):
+    """Provider SDKs are imported here, so only the one in use is ever loaded."""
     if provider == LLMProvider.GEMINI.value:
+        from .gemini_client import get_gemini_client
         return get_gemini_client()
     elif provider == LLMProvider.OLLAMA.value:
+        from .ollama_client import get_ollama_client
         return get_ollama_client()
     elif provider == LLMProvider.VLLM.value:
+        from .vllm_client import get_vllm_client
         return get_vllm_client()
     else:
         raise ValueError(f"Unknown LLM provider: {provider}. Valid options: ollama, gemini, vllm")
+
+
+def get_model_name(provider: str = None) -> str:
+    """
+    Model name configured for a provider (used e.g. in cache keys).
+    """
+    if provider is None:
+        provider = settings.env.llm_provider
+
+    if provider == LLMProvider.GEMINI.value:
+        return settings.env.gemini_model
+    elif provider == LLMProvider.OLLAMA.value:
+        return settings.env.ollama_model
+    elif provider == LLMProvider.VLLM.value:
+        return settings.env.vllm_model
+    else:
+        raise ValueError(f"Unknown LLM provider: {provider}. Valid options: ollama, gemini, vllm")
@@ -7,5 +7,6 @@ def get_gemini_client():
         temperature=settings.general.llm.temperature,
         google_api_key=settings.env.gemini_api_key,
         request_timeout=60,
-        max_retries=2
+        # Retries are handled by resilience.ResilientRunnable
+        max_retries=0
     )
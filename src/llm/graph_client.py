@@ -1,37 +1,368 @@
-from langchain_neo4j import Neo4jGraph
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
 from config.settings import settings
+from .neo4j_driver import READ, WRITE, arun_query, run_query, session
+
+
+def _sanitize_label(raw: str) -> str:
+    label = "".join(c for c in raw if c.isalnum() or c == '_')
+    return label or "Entity"
+
+
+def _sanitize_rel_type(raw: str) -> str:
+    rel_type = raw.replace(" ", "_").upper()
+    rel_type = "".join(c for c in rel_type if c.isalnum() or c == '_')
+    return rel_type or "RELATED_TO"
+
+
+VECTOR_QUERY = """
+CALL db.index.vector.queryNodes('chunk_vector_index', $k, $embedding)
+YIELD node, score
+RETURN node.text AS text, node.id AS id, score
+"""
+
+
+GRAPH_VERSION_QUERY = """
+MATCH (m:GraphMeta {id: 'graph'})
+RETURN m.version AS version
+"""
+
+
+# Keyset pages over the Chunk.id index; the first page starts after ""
+CHUNK_PAGE_QUERY = """
+MATCH (c:Chunk)
+WHERE c.id > $after_id
+RETURN c.id AS id, c.text AS text
+ORDER BY c.id
+LIMIT $limit
+"""
+
+MISSING_CHUNK_PAGE_QUERY = """
+MATCH (c:Chunk)
+WHERE c.id > $after_id AND c.embedding IS NULL
+RETURN c.id AS id, c.text AS text
+ORDER BY c.id
+LIMIT $limit
+"""
+
+
+EMBEDDING_PAGE_QUERY = """
+MATCH (c:Chunk)
+WHERE c.id > $after_id AND c.embedding IS NOT NULL
+RETURN c.id AS id, c.embedding AS embedding, c.updated_at AS updated_at
+ORDER BY c.id
+LIMIT $limit
+"""
+
+# Seeks the Chunk.updated_at index, so only recently written chunks are read
+UPDATED_EMBEDDING_PAGE_QUERY = """
+MATCH (c:Chunk)
+WHERE c.updated_at > $updated_after AND c.id > $after_id AND c.embedding IS NOT NULL
+RETURN c.id AS id, c.embedding AS embedding, c.updated_at AS updated_at
+ORDER BY c.id
+LIMIT $limit
+"""
+
+DELETED_CHUNKS_QUERY = """
+OPTIONAL MATCH (m:GraphMeta {id: 'graph'})
+WITH coalesce(m.tombstones_pruned_before, 0) AS pruned_before
+OPTIONAL MATCH (t:DeletedChunk) WHERE t.deleted_at > $deleted_after
+RETURN pruned_before, collect(t.id) AS ids
+"""
+
+# Tombstones of deleted chunks are kept this long for incremental index syncs
+TOMBSTONE_RETENTION_MS = 30 * 24 * 3600 * 1000
+
+
+def _batched(rows: list, size: int) -> Iterator[list]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
 
 def get_graph_client():
+    # Imported lazily: GraphManager itself only needs the neo4j driver.
+    # Schema introspection is an APOC call; skip it, callers pass explicit Cypher
+    from langchain_neo4j import Neo4jGraph
     return Neo4jGraph(
         url=settings.env.neo4j_uri,
         username=settings.env.neo4j_username,
-        password=settings.env.neo4j_password
+        password=settings.env.neo4j_password,
+        database=settings.general.graph.database,
+        refresh_schema=False,
     )
 
+
 class GraphManager:
-    def __init__(self):
-        self.driver = Neo4jGraph(
-            url=settings.env.neo4j_uri,
-            username=settings.env.neo4j_username,
-            password=settings.env.neo4j_password
-        )
+    """
+    Graph reads and writes on the process-wide Neo4j drivers, so any number
+    of managers share one connection pool.
+    """
+
+    def query(self, cypher: str, params: dict = None) -> List[dict]:
+        """
+        Runs a query routed for writing (the default for anything that may write).
+        """
+        return run_query(cypher, params, access=WRITE)
+
+    def read(self, cypher: str, params: dict = None) -> List[dict]:
+        """
+        Runs a read-only query; in a cluster it may be served by a replica.
+        """
+        return run_query(cypher, params, access=READ)
 
     def add_chunk(self, chunk_id: str, text: str, embedding: list = None):
         """
         Creates a Chunk node with the full text content and optional embedding.
         """
         try:
-            cypher = "MERGE (c:Chunk {id: $id}) SET c.text = $text"
+            cypher = "MERGE (c:Chunk {id: $id}) SET c.text = $text, c.updated_at = timestamp()"
             params = {"id": chunk_id, "text": text}
             
             if embedding:
-                cypher += ", c.embedding = $embedding"
+                cypher += " WITH c CALL db.create.setNodeVectorProperty(c, 'embedding', $embedding)"
                 params["embedding"] = embedding
                 
-            self.driver.query(cypher, params)
+            self.query(cypher, params)
         except Exception as e:
             print(f"Error adding chunk {chunk_id}: {e}")
 
+    def add_chunks(self, chunks: List[dict]):
+        """
+        Creates or updates many Chunk nodes in one UNWIND statement per batch.
+        Embeddings are stored through db.create.setNodeVectorProperty, i.e. as
+        float32 arrays rather than the float64 lists a plain SET writes.
+
+        Args:
+            chunks: dicts with 'id', 'text' and optional 'embedding' and
+                'doc_id' (links the chunk to its Document with PART_OF).
+        """
+        cypher = """
+        UNWIND $rows AS row
+        MERGE (c:Chunk {id: row.id})
+        SET c.text = row.text, c.updated_at = timestamp()
+        WITH c, row
+        CALL (c, row) {
+            UNWIND CASE WHEN row.embedding IS NULL THEN [] ELSE [row.embedding] END AS embedding
+            CALL db.create.setNodeVectorProperty(c, 'embedding', embedding)
+        }
+        WITH c, row
+        WHERE row.doc_id IS NOT NULL
+        MERGE (d:Document {id: row.doc_id})
+        MERGE (c)-[:PART_OF]->(d)
+        """
+        rows = [
+            {"id": c["id"], "text": c["text"], "embedding": c.get("embedding"), "doc_id": c.get("doc_id")}
+            for c in chunks
+        ]
+        statements = [
+            (cypher, {"rows": batch})
+            for batch in _batched(rows, settings.general.graph.write_batch_size)
+        ]
+        if statements:
+            self._execute_write(statements)
+
+    def get_chunk_page(self, after_id: str = "", limit: int = 500, only_missing: bool = False) -> List[dict]:
+        """
+        Returns up to `limit` chunks ordered by id, starting after `after_id`.
+        Keyset pagination keeps each page cheap no matter how deep the scan is:
+        the plain range predicate seeks into the Chunk.id index (a predicate
+        OR-ed with a parameter check would scan from the start every page).
+        """
+        cypher = MISSING_CHUNK_PAGE_QUERY if only_missing else CHUNK_PAGE_QUERY
+        return self.read(cypher, {"after_id": after_id or "", "limit": limit})
+
+    def get_chunk_embedding_page(self, updated_after: int = None, after_id: str = "", limit: int = 2000) -> List[dict]:
+        """
+        Returns embedded chunks (id, embedding, updated_at) ordered by id,
+        optionally only those updated after a timestamp (ms since epoch).
+        Chunks without an updated_at stamp are only returned by full scans;
+        backfill_chunk_timestamps stamps them once.
+        """
+        cypher = EMBEDDING_PAGE_QUERY if updated_after is None else UPDATED_EMBEDDING_PAGE_QUERY
+        return self.read(cypher, {"updated_after": updated_after, "after_id": after_id or "", "limit": limit})
+
+    def get_deleted_chunk_ids(self, deleted_after: int) -> Optional[set]:
+        """
+        Ids of chunks deleted after a timestamp (ms since epoch), from the
+        tombstones delete_chunks leaves. None if tombstones that old may
+        already have been pruned, in which case callers must rescan.
+        """
+        result = self.read(DELETED_CHUNKS_QUERY, {"deleted_after": deleted_after})
+        if not result or deleted_after < result[0]["pruned_before"]:
+            return None
+        return set(result[0]["ids"])
+
+    def get_embedded_chunk_ids(self) -> set:
+        """
+        Ids of all chunks that have an embedding.
+        """
+        cypher = "MATCH (c:Chunk) WHERE c.embedding IS NOT NULL RETURN c.id AS id"
+        return {row["id"] for row in self.read(cypher)}
+
+    def backfill_chunk_timestamps(self, batch_size: int = 10_000) -> int:
+        """
+        Stamps chunks written before chunks carried updated_at, in batches,
+        so incremental scans can rely on the stamp. Returns the count stamped.
+        """
+        cypher = """
+        MATCH (c:Chunk) WHERE c.updated_at IS NULL
+        WITH c LIMIT $limit
+        SET c.updated_at = timestamp()
+        RETURN count(c) AS stamped
+        """
+        total = 0
+        while True:
+            stamped = self.query(cypher, {"limit": batch_size})[0]["stamped"]
+            total += stamped
+            if stamped < batch_size:
+                return total
+
+    def set_chunk_embeddings(self, chunks: List[dict]):
+        """
+        Writes embeddings for existing chunks with batched UNWIND updates.
+
+        Args:
+            chunks: dicts with 'id' and 'embedding'.
+        """
+        cypher = """
+        UNWIND $rows AS row
+        MATCH (c:Chunk {id: row.id})
+        SET c.updated_at = timestamp()
+        WITH c, row
+        CALL db.create.setNodeVectorProperty(c, 'embedding', row.embedding)
+        """
+        rows = [{"id": c["id"], "embedding": c["embedding"]} for c in chunks]
+        statements = [
+            (cypher, {"rows": batch})
+            for batch in _batched(rows, settings.general.graph.write_batch_size)
+        ]
+        if statements:
+            self._execute_write(statements)
+
+    def get_document_chunk_ids(self, doc_id: str) -> set:
+        """
+        Ids of all Chunk nodes currently linked to a Document.
+        """
+        cypher = "MATCH (c:Chunk)-[:PART_OF]->(:Document {id: $doc_id}) RETURN c.id AS id"
+        return {row["id"] for row in self.read(cypher, {"doc_id": doc_id})}
+
+    def get_graph_version(self) -> int:
+        """
+        Current graph version stamp (0 if never bumped). Ingestion bumps it
+        whenever the graph content changes, so caches can invalidate.
+        """
+        result = self.read(GRAPH_VERSION_QUERY)
+        return result[0]["version"] if result else 0
+
+    async def aget_graph_version(self) -> int:
+        result = await self.aquery(GRAPH_VERSION_QUERY)
+        return result[0]["version"] if result else 0
+
+    def bump_graph_version(self) -> int:
+        """
+        Increments the graph version stamp and returns the new value.
+        """
+        cypher = """
+        MERGE (m:GraphMeta {id: 'graph'})
+        SET m.version = coalesce(m.version, 0) + 1, m.updated_at = datetime()
+        RETURN m.version AS version
+        """
+        return self.query(cypher)[0]["version"]
+
+    def get_document_manifest(self, doc_id: str) -> set:
+        """
+        Ids of the chunks recorded as fully ingested (embedded and extracted)
+        for a Document. Empty if the document was never ingested.
+        """
+        cypher = "MATCH (d:Document {id: $doc_id}) RETURN d.chunk_ids AS chunk_ids"
+        result = self.read(cypher, {"doc_id": doc_id})
+        return set(result[0]["chunk_ids"] or []) if result else set()
+
+    def get_document_source(self, doc_id: str) -> Optional[str]:
+        """
+        Path a Document was last ingested from, or None if it never was.
+        """
+        result = self.read("MATCH (d:Document {id: $doc_id}) RETURN d.source AS source", {"doc_id": doc_id})
+        return result[0]["source"] if result else None
+
+    def set_document_manifest(self, doc_id: str, source: str, chunk_ids: List[str]):
+        """
+        Stores the per-document manifest of fully ingested chunk ids.
+        """
+        cypher = """
+        MERGE (d:Document {id: $doc_id})
+        SET d.source = $source, d.chunk_ids = $chunk_ids,
+            d.chunk_count = size($chunk_ids), d.updated_at = datetime()
+        """
+        self.query(cypher, {"doc_id": doc_id, "source": source, "chunk_ids": sorted(chunk_ids)})
+
+    def delete_chunks(self, chunk_ids: List[str]) -> Tuple[int, int]:
+        """
+        Deletes chunks (with their MENTIONED_IN links) and then every entity
+        that was mentioned in them and no longer has any chunk link. Each
+        deleted chunk leaves a DeletedChunk tombstone for incremental syncs.
+
+        Returns:
+            (chunks_deleted, entities_deleted)
+        """
+        if not chunk_ids:
+            return 0, 0
+
+        delete_chunks = """
+        UNWIND $ids AS id
+        MATCH (c:Chunk {id: id})
+        OPTIONAL MATCH (e)-[:MENTIONED_IN]->(c)
+        WITH c, id, collect(elementId(e)) AS entity_ids
+        DETACH DELETE c
+        MERGE (t:DeletedChunk {id: id})
+        SET t.deleted_at = timestamp()
+        RETURN count(c) AS chunks, entity_ids
+        """
+        prune_tombstones = """
+        MATCH (t:DeletedChunk) WHERE t.deleted_at < timestamp() - $retention
+        DETACH DELETE t
+        WITH count(t) AS pruned
+        MERGE (m:GraphMeta {id: 'graph'})
+        SET m.tombstones_pruned_before = timestamp() - $retention
+        """
+        # Runs after the chunks are gone, so the orphan check sees the final state
+        delete_orphans = """
+        UNWIND $entity_ids AS entity_id
+        MATCH (e) WHERE elementId(e) = entity_id
+        WITH DISTINCT e
+        WHERE NOT (e)-[:MENTIONED_IN]->(:Chunk)
+        DETACH DELETE e
+        RETURN count(e) AS entities
+        """
+
+        def work(tx):
+            chunks, entity_ids = 0, set()
+            for record in tx.run(delete_chunks, {"ids": list(chunk_ids)}):
+                chunks += record["chunks"]
+                entity_ids.update(record["entity_ids"])
+            entities = 0
+            if entity_ids:
+                entities = tx.run(delete_orphans, {"entity_ids": list(entity_ids)}).single()["entities"]
+            tx.run(prune_tombstones, {"retention": TOMBSTONE_RETENTION_MS}).consume()
+            return chunks, entities
+
+        with session(WRITE) as s:
+            return s.execute_write(work)
+
+    def create_chunk_constraint(self):
+        """
+        Ensures Chunk.id is unique (and indexed) for MERGE and keyset scans,
+        and indexes the stamps incremental index syncs filter on.
+        """
+        try:
+            self.query(
+                "CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE c.id IS UNIQUE"
+            )
+            self.query("CREATE INDEX chunk_updated_at IF NOT EXISTS FOR (c:Chunk) ON (c.updated_at)")
+            self.query("CREATE INDEX deleted_chunk_at IF NOT EXISTS FOR (t:DeletedChunk) ON (t.deleted_at)")
+        except Exception as e:
+            print(f"Error creating chunk constraint: {e}")
+
     def create_vector_index(self, dimension: int = 384):
         """
         Creates a vector index on Chunk nodes if it doesn't exist.
@@ -48,7 +379,7 @@ class GraphManager:
                 `vector.similarity_function`: 'cosine'
             }}}}
             """
-            self.driver.query(cypher)
+            self.query(cypher)
             print("Vector index 'chunk_vector_index' ensured.")
         except Exception as e:
             print(f"Error creating vector index: {e}")
@@ -58,28 +389,143 @@ class GraphManager:
         Queries the vector index for similar chunks.
         """
         try:
-            cypher = """
-            CALL db.index.vector.queryNodes('chunk_vector_index', $k, $embedding)
-            YIELD node, score
-            RETURN node.text AS text, node.id AS id, score
-            """
-            result = self.driver.query(cypher, {"k": top_k, "embedding": query_embedding})
+            result = self.read(VECTOR_QUERY, {"k": top_k, "embedding": query_embedding})
             return result
         except Exception as e:
             print(f"Error querying vector index: {e}")
             return []
 
-    def add_graph_data(self, data: dict, chunk_id: str = None):
+    async def aquery(self, cypher: str, params: dict = None) -> List[dict]:
+        """
+        Runs a read query on the async driver without blocking the event loop.
+        """
+        return await arun_query(cypher, params, access=READ)
+
+    async def aquery_vector_index(self, query_embedding: list, top_k: int = 5) -> list:
+        """
+        Async variant of query_vector_index.
+        """
+        try:
+            return await self.aquery(VECTOR_QUERY, {"k": top_k, "embedding": query_embedding})
+        except Exception as e:
+            print(f"Error querying vector index: {e}")
+            return []
+
+    def add_graph_data(self, data: dict, chunk_id: str = None, bulk: bool = True):
         """
         Ingests data dictionary with 'nodes' and 'edges'.
+
+        With bulk=True (default) the data is written through add_graph_batch,
+        otherwise every node, link and edge is sent as its own query.
+        """
+        if bulk:
+            return self.add_graph_batch([(data, chunk_id)])
+        return self._add_graph_data_serial(data, chunk_id=chunk_id)
+
+    def add_graph_batch(self, items: List[Tuple[dict, Optional[str]]]) -> int:
+        """
+        Bulk-writes graph data for one or more chunks in a single transaction.
+
+        Nodes are grouped by label and edges by relationship type, and each group
+        is written with one parameterized UNWIND statement, so the number of
+        distinct query strings stays bounded by the number of labels/types.
+        MENTIONED_IN links are created in the same statement as their nodes.
+
+        Args:
+            items: (graph_data, chunk_id) pairs, chunk_id may be None.
+
+        Returns:
+            Number of statements sent to Neo4j.
+        """
+        node_groups: Dict[str, Dict[str, dict]] = defaultdict(dict)
+        edge_groups: Dict[str, List[dict]] = defaultdict(list)
+
+        for data, chunk_id in items:
+            if not data:
+                continue
+            for node in data.get("nodes", []) or data.get("entities", []):
+                label = _sanitize_label(node["type"])
+                props = dict(node.get("properties", {}))
+                props["id"] = node["id"]
+                props["name"] = node.get("name", "Unknown")
+
+                row = node_groups[label].setdefault(
+                    node["id"], {"id": node["id"], "props": {}, "chunk_ids": []}
+                )
+                row["props"].update(props)
+                if chunk_id and chunk_id not in row["chunk_ids"]:
+                    row["chunk_ids"].append(chunk_id)
+
+            for edge in data.get("edges", []) or data.get("relationships", []):
+                rel_type = _sanitize_rel_type(edge["type"])
+                edge_groups[rel_type].append({
+                    "source": edge["source"],
+                    "target": edge["target"],
+                    "props": edge.get("properties", {}),
+                })
+
+        statements = []
+        batch_size = settings.general.graph.write_batch_size
+
+        # Nodes first, so the edge MATCHes below can see them in the same transaction
+        for label, rows_by_id in node_groups.items():
+            cypher = f"""
+            UNWIND $rows AS row
+            MERGE (e:`{label}` {{id: row.id}})
+            SET e += row.props
+            WITH e, row
+            UNWIND row.chunk_ids AS chunk_id
+            MATCH (c:Chunk {{id: chunk_id}})
+            MERGE (e)-[:MENTIONED_IN]->(c)
+            """
+            rows = list(rows_by_id.values())
+            statements.extend((cypher, {"rows": batch}) for batch in _batched(rows, batch_size))
+
+        for rel_type, rows in edge_groups.items():
+            cypher = f"""
+            UNWIND $rows AS row
+            MATCH (a {{id: row.source}})
+            MATCH (b {{id: row.target}})
+            MERGE (a)-[r:`{rel_type}`]->(b)
+            SET r += row.props
+            """
+            statements.extend((cypher, {"rows": batch}) for batch in _batched(rows, batch_size))
+
+        if not statements:
+            return 0
+
+        try:
+            self._execute_write(statements)
+        except Exception as e:
+            # A single bad row (e.g. a nested map property) fails the whole
+            # transaction; retry item by item so the rest of the data still lands.
+            print(f"Error in bulk graph write ({len(statements)} statements), falling back to serial writes: {e}")
+            for data, chunk_id in items:
+                if data:
+                    self._add_graph_data_serial(data, chunk_id=chunk_id)
+        return len(statements)
+
+    def _execute_write(self, statements: List[Tuple[str, dict]]):
+        """
+        Runs (cypher, params) statements inside one managed write transaction.
+        """
+        def work(tx):
+            for cypher, params in statements:
+                tx.run(cypher, params).consume()
+
+        with session(WRITE) as s:
+            s.execute_write(work)
+
+    def _add_graph_data_serial(self, data: dict, chunk_id: str = None):
+        """
+        Ingests data dictionary with 'nodes' and 'edges', one query per item.
         """
         # 1. Merge Nodes
         nodes = data.get("nodes", []) or data.get("entities", [])
         for node in nodes:
             try:
                 # Sanitize type
-                label = "".join(c for c in node['type'] if c.isalnum() or c == '_')
-                if not label: label = "Entity"
+                label = _sanitize_label(node['type'])
                 
                 # Prepare properties for Cypher
                 props = node.get("properties", {})
@@ -89,7 +535,7 @@ class GraphManager:
                 # Cypher query to merge the node
                 # We simply set all properties found in the dict
                 cypher = f"MERGE (e:`{label}` {{id: $id}}) SET e += $props"
-                self.driver.query(cypher, {"id": node['id'], "props": props})
+                self.query(cypher, {"id": node['id'], "props": props})
 
                 # Link to Chunk
                 if chunk_id:
@@ -98,7 +544,7 @@ class GraphManager:
                     MATCH (c:Chunk {{id: $chunk_id}})
                     MERGE (e)-[:MENTIONED_IN]->(c)
                     """
-                    self.driver.query(link_cypher, {"id": node['id'], "chunk_id": chunk_id})
+                    self.query(link_cypher, {"id": node['id'], "chunk_id": chunk_id})
 
             except Exception as e:
                 print(f"Error adding node {node.get('id')}: {e}")
@@ -108,9 +554,7 @@ class GraphManager:
         for edge in edges:
             try:
                 # Sanitize relationship type
-                rel_type = edge['type'].replace(" ", "_").upper()
-                rel_type = "".join(c for c in rel_type if c.isalnum() or c == '_')
-                if not rel_type: rel_type = "RELATED_TO"
+                rel_type = _sanitize_rel_type(edge['type'])
                 
                 edge_props = edge.get("properties", {})
 
@@ -121,7 +565,7 @@ class GraphManager:
                 MERGE (a)-[r:`{rel_type}`]->(b)
                 SET r += $props
                 """
-                self.driver.query(cypher, {
+                self.query(cypher, {
                     "source": edge['source'], 
                     "target": edge['target'],
                     "props": edge_props
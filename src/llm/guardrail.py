@@ -1,16 +1,35 @@
 """
 LLM-based Guardrail for department-related questions.
 Uses structured output to classify if a question is within scope.
+
+Questions are first scored by a local embedding classifier against labelled
+in-scope and out-of-scope examples; only ambiguous scores are sent to the
+LLM, and decisions are cached by normalized question.
 """
-from pydantic import BaseModel, Field
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+import yaml
+from pydantic import BaseModel, Field, PrivateAttr
 from langchain_core.prompts import PromptTemplate
 from src.llm import get_llm_client
+from config.settings import settings, resolve_path
+from .cache import LRUCache, normalize_question
+from .embeddings import get_embedding_executor
 
 
 class GuardrailResult(BaseModel):
     """Structured output for guardrail check."""
     is_allowed: bool = Field(description="True if the question is about UET departments, programs, faculty, or admissions")
     reason: str = Field(description="Brief explanation of the classification")
+    # Private, so it stays out of the schema the LLM is asked to fill
+    _fallback: bool = PrivateAttr(default=False)
+
+    @property
+    def fallback(self) -> bool:
+        """True when the LLM check failed and this verdict is a guess."""
+        return self._fallback
 
 
 GUARDRAIL_PROMPT = """You are a classifier for a UET Lahore Prospectus Q&A system.
@@ -30,16 +49,57 @@ Question: {question}
 Respond with your classification."""
 
 
+class EmbeddingGuardrailClassifier:
+    """
+    Scores questions by embedding similarity to labelled examples.
+
+    score = mean of the top-k cosine similarities to in-scope examples
+            minus the same for out-of-scope examples
+    """
+
+    def __init__(self, embedding_model, in_scope: List[str], out_of_scope: List[str], top_k: int = 3):
+        self.embedding_model = embedding_model
+        self.top_k = top_k
+        self.in_scope = _unit_rows(embedding_model.embed_documents(in_scope))
+        self.out_of_scope = _unit_rows(embedding_model.embed_documents(out_of_scope))
+
+    @classmethod
+    def from_file(cls, embedding_model, path: str, top_k: int = 3) -> "EmbeddingGuardrailClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            examples = yaml.safe_load(f)
+        return cls(embedding_model, examples["in_scope"], examples["out_of_scope"], top_k=top_k)
+
+    def score(self, embedding: List[float]) -> float:
+        return self.score_batch([embedding])[0]
+
+    def score_batch(self, embeddings: List[List[float]]) -> List[float]:
+        """
+        Scores many questions with one matrix product per example set.
+        """
+        queries = _unit_rows(embeddings)
+        scores = self._top_k_mean(queries @ self.in_scope.T) - self._top_k_mean(queries @ self.out_of_scope.T)
+        return [float(score) for score in scores]
+
+    def _top_k_mean(self, similarities: np.ndarray) -> np.ndarray:
+        # One row of similarities per question
+        k = min(self.top_k, similarities.shape[1])
+        return np.mean(np.partition(similarities, -k, axis=1)[:, -k:], axis=1)
+
+
 class DepartmentGuardrail:
     """
-    LLM-based guardrail that checks if a question is department-related.
+    Tiered guardrail that checks if a question is department-related:
+    decision cache -> local embedding classifier -> LLM (ambiguous band only).
     """
     
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, classifier: EmbeddingGuardrailClassifier = None,
+                 allow_threshold: float = None, reject_threshold: float = None, cache_size: int = None):
         """
         Initialize guardrail with optional custom LLM.
         If not provided, uses the default from get_llm_client().
+        Without a classifier every uncached question goes to the LLM.
         """
+        config = settings.general.guardrail
         self.llm = llm or get_llm_client()
         self.prompt = PromptTemplate(
             input_variables=["question"],
@@ -48,6 +108,24 @@ class DepartmentGuardrail:
         
         # Create chain with structured output
         self.chain = self.prompt | self.llm.with_structured_output(GuardrailResult)
+
+        self.classifier = classifier
+        self.allow_threshold = allow_threshold if allow_threshold is not None else config.allow_threshold
+        self.reject_threshold = reject_threshold if reject_threshold is not None else config.reject_threshold
+        self.decisions = LRUCache(max_size=cache_size or config.cache_size)
+
+    @classmethod
+    def from_settings(cls, llm=None, embedding_model=None) -> "DepartmentGuardrail":
+        """
+        Builds the guardrail with the local classifier if enabled in config.
+        """
+        config = settings.general.guardrail
+        classifier = None
+        if config.local_classifier and embedding_model is not None:
+            classifier = EmbeddingGuardrailClassifier.from_file(
+                embedding_model, resolve_path(config.examples_file), top_k=config.top_k
+            )
+        return cls(llm=llm, classifier=classifier)
     
     def check(self, question: str) -> GuardrailResult:
         """
@@ -59,13 +137,137 @@ class DepartmentGuardrail:
         Returns:
             GuardrailResult with is_allowed and reason
         """
+        key = normalize_question(question)
+        cached = self.decisions.get(key)
+        if cached is not None:
+            return cached
+
+        score = None
+        if self.classifier is not None:
+            score = self.classifier.score(self.classifier.embedding_model.embed_query(question))
+            local = self._classify_locally(score)
+            if local is not None:
+                self.decisions.set(key, local)
+                return local
+
         try:
             result = self.chain.invoke({"question": question})
-            return result
         except Exception as e:
-            # On error, default to allowing (fail-open for better UX)
             print(f"Guardrail error: {e}")
-            return GuardrailResult(
+            return self._fallback(score)
+        self.decisions.set(key, result)
+        return result
+
+    async def acheck(self, question: str, embedding: List[float] = None) -> GuardrailResult:
+        """
+        Async variant of check; awaits the LLM without blocking the event loop.
+        Pass the query embedding when it is already known so the question is
+        not embedded twice.
+        """
+        key = normalize_question(question)
+        cached = self.decisions.get(key)
+        if cached is not None:
+            return cached
+
+        score = None
+        if self.classifier is not None:
+            if embedding is None:
+                # Model inference would block the event loop
+                loop = asyncio.get_running_loop()
+                embedding = await loop.run_in_executor(get_embedding_executor(),
+                                                       self.classifier.embedding_model.embed_query, question)
+            score = self.classifier.score(embedding)
+            local = self._classify_locally(score)
+            if local is not None:
+                self.decisions.set(key, local)
+                return local
+
+        try:
+            result = await self.chain.ainvoke({"question": question})
+        except Exception as e:
+            print(f"Guardrail error: {e}")
+            return self._fallback(score)
+        self.decisions.set(key, result)
+        return result
+
+    async def acheck_batch(self, questions: List[str], embeddings: List[List[float]] = None,
+                           max_concurrency: int = None) -> List[GuardrailResult]:
+        """
+        Classifies many questions at once: cached decisions are reused, the
+        local classifier scores the rest in one pass, and only the ambiguous
+        ones are sent to the LLM, as one batch of at most max_concurrency
+        concurrent requests. Each distinct (normalized) question is decided once.
+        """
+        keys = [normalize_question(q) for q in questions]
+        decided = {}
+        pending = {}
+        for i, key in enumerate(keys):
+            if key in decided or key in pending:
+                continue
+            cached = self.decisions.get(key)
+            if cached is not None:
+                decided[key] = cached
+            else:
+                pending[key] = i
+
+        scores = {}
+        if pending and self.classifier is not None:
+            if embeddings is None:
+                loop = asyncio.get_running_loop()
+                batch = await loop.run_in_executor(get_embedding_executor(),
+                                                   self.classifier.embedding_model.embed_documents,
+                                                   [questions[i] for i in pending.values()])
+            else:
+                batch = [embeddings[i] for i in pending.values()]
+            for key, score in zip(list(pending), self.classifier.score_batch(batch)):
+                scores[key] = score
+                local = self._classify_locally(score)
+                if local is not None:
+                    self.decisions.set(key, local)
+                    decided[key] = local
+                    del pending[key]
+
+        if pending:
+            inputs = [{"question": questions[i]} for i in pending.values()]
+            responses = await self.chain.abatch(inputs, config={"max_concurrency": max_concurrency},
+                                                return_exceptions=True)
+            for key, response in zip(pending, responses):
+                if isinstance(response, Exception):
+                    print(f"Guardrail error: {response}")
+                    decided[key] = self._fallback(scores.get(key))
+                else:
+                    self.decisions.set(key, response)
+                    decided[key] = response
+
+        return [decided[key] for key in keys]
+
+    def _classify_locally(self, score: float) -> Optional[GuardrailResult]:
+        if score >= self.allow_threshold:
+            return GuardrailResult(is_allowed=True, reason=f"Matches department topics (local score {score:.2f})")
+        if score <= self.reject_threshold:
+            return GuardrailResult(is_allowed=False, reason=f"Not about UET departments (local score {score:.2f})")
+        return None
+
+    @staticmethod
+    def _fallback(score: Optional[float]) -> GuardrailResult:
+        # Lean on the local score when there is one, otherwise fail open for better UX
+        if score is not None and score < 0:
+            result = GuardrailResult(
+                is_allowed=False,
+                reason="Guardrail check failed, question looks out of scope"
+            )
+        else:
+            result = GuardrailResult(
                 is_allowed=True,
                 reason="Guardrail check failed, allowing by default"
             )
+        # Not cached here, and callers must not cache what they derive from it
+        result._fallback = True
+        return result
+
+
+def _unit_rows(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -1,81 +1,399 @@
-from typing import List, Dict, Any
-from langchain_huggingface import HuggingFaceEmbeddings
+import asyncio
+import os
+from typing import List, Dict, Any, Tuple
 from config.settings import settings
+from src.llm.cache import load_questions, normalize_question
+from src.llm.context_builder import BuiltContext, ContextBuilder
+from src.llm.embeddings import EmbeddingMicroBatcher, QueryEmbeddingCache, get_embedding_executor, get_embedding_model
 from src.llm.graph_client import GraphManager
+from src.llm.vector_index import LocalVectorIndex
+
+# Entities MENTIONED_IN the retrieved chunks, appended to either chunk lookup
+# below so retrieval is one round trip. Entities are deduplicated by name,
+# ranked by how many retrieved chunks mention them, and only their type (the
+# node label) and allow-listed properties are projected, as [key, value]
+# pairs truncated to $max_length. List values are joined with ", ", since
+# toString() rejects lists.
+ENTITY_PROJECTION = """
+WITH collect({id: node.id, text: node.text, score: score}) AS chunks, collect(node) AS nodes
+UNWIND nodes AS c
+OPTIONAL MATCH (e)-[:MENTIONED_IN]->(c)
+WITH chunks, coalesce(e.name, e.id) AS name, collect(e) AS mentions
+ORDER BY size(mentions) DESC
+WITH chunks, collect(CASE WHEN name IS NULL THEN NULL ELSE {
+    name: name,
+    properties: [['type', labels(mentions[0])[0]]] +
+        [k IN $properties WHERE mentions[0][k] IS NOT NULL | [k, left(
+            CASE WHEN valueType(mentions[0][k]) STARTS WITH 'LIST'
+                 THEN reduce(s = '', x IN mentions[0][k] | s + CASE s WHEN '' THEN '' ELSE ', ' END + toString(x))
+                 ELSE toString(mentions[0][k]) END, $max_length)]]
+} END)[..$max_entities] AS entities
+RETURN chunks, entities
+"""
+
+# Vector search in Neo4j
+RETRIEVAL_QUERY = """
+CALL db.index.vector.queryNodes('chunk_vector_index', $k, $embedding)
+YIELD node, score
+""" + ENTITY_PROJECTION
+
+# Chunks already ranked by the local vector index ($hits: [{id, score}])
+LOCAL_RETRIEVAL_QUERY = """
+UNWIND $hits AS hit
+MATCH (node:Chunk {id: hit.id})
+WITH node, hit.score AS score
+ORDER BY score DESC
+""" + ENTITY_PROJECTION
+
+# k-hop expansion from the entities mentioned in the retrieved chunks.
+# Every hop follows at most $fan_out relationships per frontier node, nodes
+# with more than $max_degree relationships are kept but not expanded further,
+# and $budget caps the number of new nodes over all hops.
+EXPANSION_SEED = """
+MATCH (c:Chunk) WHERE c.id IN $chunk_ids
+MATCH (s)-[:MENTIONED_IN]->(c)
+WITH collect(DISTINCT s) AS seeds
+WITH seeds AS seen, [s IN seeds WHERE COUNT { (s)--() } <= $max_degree] AS frontier,
+     [] AS facts, $max_nodes AS budget
+"""
+
+EXPANSION_HOP = """
+CALL (frontier, seen, budget) {
+    UNWIND frontier AS n
+    CALL (n, seen) {
+        MATCH (n)-[r]-(m)
+        WHERE NOT m:Chunk AND NOT m:Document AND NOT m IN seen
+          AND (size($relationship_types) = 0 OR type(r) IN $relationship_types)
+        RETURN r, m
+        LIMIT $fan_out
+    }
+    WITH m, head(collect(r)) AS rel, COUNT { (m)--() } AS degree
+    ORDER BY degree
+    RETURN collect({
+        node: m,
+        degree: degree,
+        fact: {
+            source: coalesce(startNode(rel).name, startNode(rel).id),
+            type: type(rel),
+            target: coalesce(endNode(rel).name, endNode(rel).id),
+            hop: {hop}
+        }
+    })[..budget] AS hits
+}
+WITH seen + [h IN hits | h.node] AS seen,
+     [h IN hits WHERE h.degree <= $max_degree | h.node] AS frontier,
+     facts + [h IN hits | h.fact] AS facts,
+     budget - size(hits) AS budget
+"""
+
+EXPANSION_RETURN = """
+RETURN facts
+"""
+
+
+def _per_question(query: str) -> str:
+    """
+    Runs a single-question query once per entry of $batch inside one
+    statement. $batch[i] stands for the question's own parameter and every
+    result row is tagged with its index i; a question whose query returns
+    no rows gets none.
+    """
+    return (
+        "UNWIND range(0, size($batch) - 1) AS i\n"
+        "CALL (i) {" + query + "}\n"
+        "RETURN *\n"
+    )
+
+
+# Batch variants of the two chunk lookups ($batch: one embedding, or one
+# list of local index hits, per question)
+BATCH_RETRIEVAL_QUERY = _per_question(RETRIEVAL_QUERY.replace("$embedding", "$batch[i]"))
+BATCH_LOCAL_RETRIEVAL_QUERY = _per_question(LOCAL_RETRIEVAL_QUERY.replace("$hits", "$batch[i]"))
+
+
+def build_expansion_query(hops: int, batched: bool = False) -> str:
+    """
+    Unrolls the expansion into one query with a subquery per hop. With
+    batched=True $batch holds one list of chunk ids per question.
+    """
+    hop_clauses = [EXPANSION_HOP.replace("{hop}", str(hop)) for hop in range(1, hops + 1)]
+    query = EXPANSION_SEED + "".join(hop_clauses) + EXPANSION_RETURN
+    if batched:
+        return _per_question(query.replace("$chunk_ids", "$batch[i]"))
+    return query
+
 
 class HybridRetriever:
-    def __init__(self, graph_manager: GraphManager):
+    def __init__(self, graph_manager: GraphManager, embedding_model=None, query_cache: QueryEmbeddingCache = None,
+                 context_builder: ContextBuilder = None, vector_index: LocalVectorIndex = None):
         self.graph_manager = graph_manager
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=settings.general.llm.embedding_model
+        self.embedding_model = embedding_model or get_embedding_model()
+        model_name = getattr(self.embedding_model, "model_name", settings.general.llm.embedding_model)
+        # Repeated questions skip model inference entirely
+        self.query_cache = query_cache or QueryEmbeddingCache.from_settings(model_name)
+        # Concurrent aembed calls share one forward pass
+        self.batcher = EmbeddingMicroBatcher.from_settings(self.embed_queries)
+        config = settings.general.retrieval
+        self.entity_properties = list(config.entity_properties)
+        self.max_entities = config.max_entities
+        self.max_property_length = config.max_property_length
+        self.expansion = config.expansion
+        self.expansion_query = build_expansion_query(self.expansion.hops) if self.expansion.hops > 0 else None
+        self.batch_expansion_query = (
+            build_expansion_query(self.expansion.hops, batched=True) if self.expansion.hops > 0 else None
         )
+        self.context_builder = context_builder or ContextBuilder.from_settings()
+        if vector_index is None and config.vector_backend == "local":
+            vector_index = LocalVectorIndex.from_settings()
+        # None: vector search runs on the Neo4j index
+        self.vector_index = vector_index
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embeds a query, serving repeated (normalized) questions from the cache.
+        """
+        if self.query_cache is None:
+            return self.embedding_model.embed_query(query)
+
+        vector = self.query_cache.get(query)
+        if vector is None:
+            vector = self.embedding_model.embed_query(query)
+            self.query_cache.set(query, vector)
+            self.query_cache.log_question(query)
+        return vector
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Batch variant of embed_query: cached questions are served from the
+        cache and the rest are embedded in one call.
+        """
+        if len(queries) == 1:
+            return [self.embed_query(queries[0])]
+
+        vectors = [self.query_cache.get(q) if self.query_cache is not None else None for q in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Like warm_query_cache, queries go through embed_documents to be batched
+            embedded = self.embedding_model.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                if self.query_cache is not None:
+                    self.query_cache.set(queries[i], vector)
+                    self.query_cache.log_question(queries[i])
+        return vectors
+
+    def warm_query_cache(self, questions: List[str] = None) -> int:
+        """
+        Pre-computes embeddings for questions (default: the most recent
+        entries of the configured question log) in one batch.
+        Returns the number of newly embedded questions.
+        """
+        if self.query_cache is None:
+            return 0
+        if questions is None:
+            config = settings.general.retrieval.query_cache
+            log_path = self.query_cache.question_log
+            if not log_path or not os.path.exists(log_path):
+                return 0
+            questions = load_questions(log_path, limit=config.warm_limit)
+
+        # Deduplicate by normalized form and skip anything already cached
+        pending = {}
+        for question in questions:
+            key = normalize_question(question)
+            if key and key not in pending and not self.query_cache.contains(question):
+                pending[key] = question
+        if not pending:
+            return 0
+
+        vectors = self.embedding_model.embed_documents(list(pending.values()))
+        for question, vector in zip(pending.values(), vectors):
+            self.query_cache.set(question, vector)
+        return len(pending)
 
     def search(self, query: str, top_k: int = 5) -> str:
         """
         Performs hybrid search:
         1. Vector search for relevant chunks.
-        2. Retrieves entities mentioned in those chunks.
-        3. Formats context.
-        """
-        # 1. Vector Search
-        query_embedding = self.embedding_model.embed_query(query)
-        vector_results = self.graph_manager.query_vector_index(query_embedding, top_k=top_k)
-        
-        if not vector_results:
+        2. Retrieves entities mentioned in those chunks (same query).
+        3. Expands k hops from those entities.
+        4. Builds a token-budgeted context.
+        """
+        query_embedding = self.embed_query(query)
+        chunks, entities = self.retrieve(query_embedding, top_k=top_k)
+        if not chunks:
             return ""
+        facts = self.expand([c['id'] for c in chunks])
+        return self.build_context(chunks, entities, facts).text
 
-        context_parts = []
-        chunk_ids = []
-
-        # 2. Process Chunks
-        for result in vector_results:
-            text = result['text']
-            chunk_id = result['id']
-            score = result['score']
-            chunk_ids.append(chunk_id)
-            context_parts.append(f"--- Document Chunk (ID: {chunk_id}, Score: {score:.2f}) ---\n{text}")
-
-        # 3. Graph Enrichment (Get entities linked to these chunks)
-        # We find entities that are MENTIONED_IN these chunks
-        if chunk_ids:
-            cypher = """
-            MATCH (e)-[:MENTIONED_IN]->(c:Chunk)
-            WHERE c.id IN $chunk_ids
-            RETURN e.name AS name, e.type AS type, e.description AS description, labels(e) AS labels
-            """
-            # Note: e.description might not exist, but we get properties.
-            # Let's just return the whole node property map is better but Neo4j returns it as dict.
-            
-            # Revised Cypher to request specific properties or map
-            cypher = """
-            MATCH (e)-[:MENTIONED_IN]->(c:Chunk)
-            WHERE c.id IN $chunk_ids
-            RETURN DISTINCT e
-            """
-            
-            try:
-                # We need to access the driver directly or add a method.
-                # GraphManager exposes .driver (Neo4jGraph).
-                # Neo4jGraph.query returns a list of dictionaries.
-                entity_results = self.graph_manager.driver.query(cypher, {"chunk_ids": chunk_ids})
-                
-                if entity_results:
-                    context_parts.append("\n--- Key Entities Mentioned in Context ---")
-                    seen_entities = set()
-                    for record in entity_results:
-                        # record['e'] is the node dict properties
-                        node = record['e']
-                        # Try to get meaningful name
-                        name = node.get('name') or node.get('id')
-                        # Try to infer label/type (Neo4jGraph result might not include labels in the node dict easily unless we return labels(e))
-                        
-                        # Let's simplify the display
-                        if name and name not in seen_entities:
-                            props_str = ", ".join([f"{k}: {v}" for k, v in node.items() if k not in ['embedding', 'text', 'id']])
-                            context_parts.append(f"Entity: {name} | Details: {props_str}")
-                            seen_entities.add(name)
-
-            except Exception as e:
-                print(f"Error retrieving linked entities: {e}")
-
-        return "\n\n".join(context_parts)
+    async def asearch(self, query: str, top_k: int = 5) -> str:
+        """
+        Non-blocking variant of search: the query is embedded on the dedicated
+        embedding executor and Neo4j is queried through the async driver.
+        """
+        query_embedding = await self.aembed(query)
+        chunks, entities = await self.aretrieve(query_embedding, top_k=top_k)
+        if not chunks:
+            return ""
+        facts = await self.aexpand([c['id'] for c in chunks])
+        return self.build_context(chunks, entities, facts).text
+
+    def retrieve(self, query_embedding: List[float], top_k: int = 5) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Returns (chunks, entities) for an embedding in a single Neo4j query.
+        """
+        if self.vector_index is not None and self.vector_index.refresh_due():
+            self.vector_index.refresh(self.graph_manager)
+        try:
+            query, params = self._retrieval_query(query_embedding, top_k)
+            if not query:
+                return [], []
+            records = self.graph_manager.read(query, params)
+        except Exception as e:
+            print(f"Error retrieving chunks: {e}")
+            return [], []
+        return self._unpack(records)
+
+    def expand(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Returns relationship facts reached within the configured number of
+        hops from the entities mentioned in the given chunks.
+        """
+        if self.expansion_query is None or not chunk_ids:
+            return []
+        try:
+            records = self.graph_manager.read(self.expansion_query, self._expansion_params(chunk_ids))
+        except Exception as e:
+            print(f"Error expanding graph context: {e}")
+            return []
+        return records[0]["facts"] if records else []
+
+    # --- Individual async stages (used by the chat pipeline DAG) ---
+    async def aembed(self, query: str) -> List[float]:
+        if self.query_cache is not None:
+            # Memory hits are answered on the event loop; anything else
+            # (disk tier, model inference) runs on the embedding executor
+            vector = self.query_cache.get(query, memory_only=True)
+            if vector is not None:
+                return vector
+        if self.batcher is not None:
+            return await self.batcher.embed(query)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_embedding_executor(), self.embed_query, query)
+
+    async def aretrieve(self, query_embedding: List[float], top_k: int = 5) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        if self.vector_index is not None and self.vector_index.refresh_due():
+            self.vector_index.refresh_in_background(self.graph_manager)
+        try:
+            query, params = self._retrieval_query(query_embedding, top_k)
+            if not query:
+                return [], []
+            records = await self.graph_manager.aquery(query, params)
+        except Exception as e:
+            print(f"Error retrieving chunks: {e}")
+            return [], []
+        return self._unpack(records)
+
+    async def aexpand(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        if self.expansion_query is None or not chunk_ids:
+            return []
+        try:
+            records = await self.graph_manager.aquery(self.expansion_query, self._expansion_params(chunk_ids))
+        except Exception as e:
+            print(f"Error expanding graph context: {e}")
+            return []
+        return records[0]["facts"] if records else []
+
+    # --- Batches of questions (used by ChatPipeline.run_batch) ---
+    async def aretrieve_batch(self, query_embeddings: List[List[float]], top_k: int = 5
+                              ) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        (chunks, entities) for each embedding, all from one Neo4j query.
+        """
+        results = [([], []) for _ in query_embeddings]
+        try:
+            query, params = self._batch_retrieval_query(query_embeddings, top_k)
+            if not query:
+                return results
+            records = await self.graph_manager.aquery(query, params)
+        except Exception as e:
+            print(f"Error retrieving chunks for {len(query_embeddings)} questions: {e}")
+            return results
+        for record in records:
+            results[record["i"]] = (record["chunks"], record["entities"])
+        return results
+
+    async def aexpand_batch(self, chunk_id_lists: List[List[str]]) -> List[List[Dict[str, Any]]]:
+        """
+        Expansion facts for each list of chunk ids, all from one Neo4j query.
+        """
+        results = [[] for _ in chunk_id_lists]
+        if self.batch_expansion_query is None or not any(chunk_id_lists):
+            return results
+        try:
+            params = self._expansion_params(chunk_id_lists)
+            params["batch"] = params.pop("chunk_ids")
+            records = await self.graph_manager.aquery(self.batch_expansion_query, params)
+        except Exception as e:
+            print(f"Error expanding graph context for {len(chunk_id_lists)} questions: {e}")
+            return results
+        for record in records:
+            results[record["i"]] = record["facts"]
+        return results
+
+    def _batch_retrieval_query(self, query_embeddings: List[List[float]], top_k: int) -> Tuple[str, Dict[str, Any]]:
+        params = self._projection_params()
+        if self.vector_index is None:
+            return BATCH_RETRIEVAL_QUERY, {**params, "k": top_k, "batch": query_embeddings}
+
+        if self.vector_index.refresh_due():
+            self.vector_index.refresh_in_background(self.graph_manager)
+        hits = [self.vector_index.search(embedding, top_k=top_k) for embedding in query_embeddings]
+        if not any(hits):
+            return None, params
+        return BATCH_LOCAL_RETRIEVAL_QUERY, {**params, "batch": hits}
+
+    def _expansion_params(self, chunk_ids: List[str]) -> Dict[str, Any]:
+        return {
+            "chunk_ids": chunk_ids,
+            "fan_out": self.expansion.fan_out,
+            "max_degree": self.expansion.max_degree,
+            "max_nodes": self.expansion.max_nodes,
+            "relationship_types": self.expansion.relationship_types,
+        }
+
+    def _retrieval_query(self, query_embedding: List[float], top_k: int) -> Tuple[str, Dict[str, Any]]:
+        """
+        Query and parameters for the configured vector backend. With the
+        local index the query is None when it found no chunks.
+        """
+        params = self._projection_params()
+        if self.vector_index is None:
+            return RETRIEVAL_QUERY, {**params, "k": top_k, "embedding": query_embedding}
+
+        hits = self.vector_index.search(query_embedding, top_k=top_k)
+        if not hits:
+            return None, params
+        return LOCAL_RETRIEVAL_QUERY, {**params, "hits": hits}
+
+    def _projection_params(self) -> Dict[str, Any]:
+        return {
+            "properties": self.entity_properties,
+            "max_entities": self.max_entities,
+            "max_length": self.max_property_length,
+        }
+
+    @staticmethod
+    def _unpack(records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        # No rows means the vector search found nothing
+        if not records:
+            return [], []
+        return records[0]["chunks"], records[0]["entities"]
+
+    def build_context(self, chunks: List[Dict[str, Any]], entities: List[Dict[str, Any]],
+                      facts: List[Dict[str, Any]] = None) -> BuiltContext:
+        """
+        Assembles retrieved chunks, their linked entities and any expanded
+        relationship facts into prompt context within the token budget.
+        """
+        return self.context_builder.build(chunks, entities, facts)
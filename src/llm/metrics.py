@@ -0,0 +1,192 @@
+"""
+Minimal in-process metrics.
+
+Histograms use fixed cumulative buckets (Prometheus style) and, like
+counters, are kept in a process-wide registry keyed by name and labels, so
+any module can record into them. Values owned by other objects (cache hit
+counts, Neo4j operations in flight) are read at scrape time through collectors.
+render_prometheus() writes everything in the Prometheus text format.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Seconds, for latencies and queue waits
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+
+class Histogram:
+    def __init__(self, name: str, buckets: Sequence[float], description: str = "", labels: Dict[str, str] = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket plus the +Inf overflow bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self) -> List[int]:
+        with self._lock:
+            counts = list(self.counts)
+        total, cumulative = 0, []
+        for c in counts:
+            total += c
+            cumulative.append(total)
+        return cumulative
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile (inf if it overflows).
+        """
+        cumulative = self.cumulative()
+        if not cumulative[-1]:
+            return 0.0
+        rank = q * cumulative[-1]
+        index = bisect.bisect_left(cumulative, rank)
+        return self.buckets[index] if index < len(self.buckets) else float("inf")
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+
+
+class Counter:
+    def __init__(self, name: str, description: str = "", labels: Dict[str, str] = None):
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Sample(NamedTuple):
+    """One value reported by a collector."""
+    name: str
+    kind: str  # "counter" or "gauge"
+    description: str
+    labels: Dict[str, str]
+    value: float
+
+
+_registry: Dict[Tuple[str, tuple], Histogram] = {}
+_counters: Dict[Tuple[str, tuple], Counter] = {}
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+_registry_lock = threading.Lock()
+
+
+def _key(name: str, labels: Optional[Dict[str, str]]) -> Tuple[str, tuple]:
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def histogram(name: str, buckets: Sequence[float] = LATENCY_BUCKETS, description: str = "",
+              labels: Dict[str, str] = None) -> Histogram:
+    """
+    Returns the registered histogram with this name and labels, creating it on first use.
+    """
+    key = _key(name, labels)
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = Histogram(name, buckets, description, labels)
+        return _registry[key]
+
+
+def histograms() -> Dict[str, Histogram]:
+    """
+    Registered histograms by name (with labels appended, e.g. 'x{stage="embed"}').
+    """
+    with _registry_lock:
+        return {name + _format_labels(dict(labels)): h for (name, labels), h in _registry.items()}
+
+
+def counter(name: str, description: str = "", labels: Dict[str, str] = None) -> Counter:
+    key = _key(name, labels)
+    with _registry_lock:
+        if key not in _counters:
+            _counters[key] = Counter(name, description, labels)
+        return _counters[key]
+
+
+def register_collector(collect: Callable[[], Iterable[Sample]]):
+    """
+    Adds a callable that reports samples whenever metrics are rendered.
+    """
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def unregister_collector(collect: Callable[[], Iterable[Sample]]):
+    """
+    Removes a collector added with register_collector (no-op if absent).
+    """
+    with _registry_lock:
+        if collect in _collectors:
+            _collectors.remove(collect)
+
+
+def render_prometheus() -> str:
+    """
+    All histograms, counters and collector samples in the Prometheus text
+    exposition format (version 0.0.4).
+    """
+    with _registry_lock:
+        registered = sorted(_registry.values(), key=lambda h: h.name)
+        counters = sorted(_counters.values(), key=lambda c: c.name)
+        collectors = list(_collectors)
+
+    lines: List[str] = []
+    described = set()
+
+    def describe(name: str, kind: str, description: str):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {description or name}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for h in registered:
+        describe(h.name, "histogram", h.description)
+        cumulative = h.cumulative()
+        for bound, count in zip(list(h.buckets) + [math.inf], cumulative):
+            le = "+Inf" if bound == math.inf else repr(float(bound))
+            lines.append(f"{h.name}_bucket{_format_labels({**h.labels, 'le': le})} {count}")
+        lines.append(f"{h.name}_sum{_format_labels(h.labels)} {h.sum}")
+        lines.append(f"{h.name}_count{_format_labels(h.labels)} {cumulative[-1]}")
+
+    samples = [Sample(c.name, "counter", c.description, c.labels, c.value) for c in counters]
+    for collect in collectors:
+        try:
+            samples.extend(collect())
+        except Exception as e:
+            print(f"Error collecting metrics: {e}")
+    for sample in sorted(samples, key=lambda s: s.name):
+        describe(sample.name, sample.kind, sample.description)
+        lines.append(f"{sample.name}{_format_labels(sample.labels)} {float(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
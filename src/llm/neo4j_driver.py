@@ -0,0 +1,221 @@
+"""
+Process-wide Neo4j drivers.
+
+Every GraphManager, retriever and script in a process shares one sync and
+one async driver, each with a single connection pool configured under
+graph.pool. Queries are explicitly routed for reading or writing, so in a
+cluster read-only retrieval goes to replicas. Unlike Neo4jGraph, nothing
+here introspects the schema.
+"""
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase, READ_ACCESS, WRITE_ACCESS
+
+from config.settings import settings
+
+READ = "r"
+WRITE = "w"
+
+
+@dataclass
+class PoolMetrics:
+    """
+    Demand on a driver's pool, counted by this module: sessions and queries
+    in flight, not pool connections (a session may hold none yet, and the
+    driver does not expose its pool figures).
+    """
+    max_size: int
+    # Sessions / queries currently running or waiting for a connection
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    operations: int = 0
+    failures: int = 0
+    busy_seconds: float = 0.0
+
+    @property
+    def demand(self) -> float:
+        """In-flight operations per pooled connection; above 1 means work waits for connections."""
+        return self.in_flight / self.max_size if self.max_size else 0.0
+
+    def as_dict(self) -> Dict:
+        return {**asdict(self), "demand": round(self.demand, 3)}
+
+
+class _PoolTracker:
+    """Counts work in flight on a driver."""
+
+    def __init__(self, max_size: int):
+        self.metrics = PoolMetrics(max_size=max_size)
+        self._lock = threading.Lock()
+
+    def enter(self) -> float:
+        with self._lock:
+            m = self.metrics
+            m.in_flight += 1
+            m.operations += 1
+            m.peak_in_flight = max(m.peak_in_flight, m.in_flight)
+        return time.perf_counter()
+
+    def exit(self, started: float, failed: bool):
+        with self._lock:
+            m = self.metrics
+            m.in_flight -= 1
+            m.busy_seconds += time.perf_counter() - started
+            if failed:
+                m.failures += 1
+
+
+_lock = threading.Lock()
+_driver: Optional[Driver] = None
+_async_driver: Optional[AsyncDriver] = None
+_trackers: Dict[str, _PoolTracker] = {}
+
+
+def _driver_config() -> Dict:
+    pool = settings.general.graph.pool
+    return {
+        "max_connection_pool_size": pool.max_size,
+        "connection_acquisition_timeout": pool.acquisition_timeout,
+        "connection_timeout": pool.connection_timeout,
+        "max_connection_lifetime": pool.max_connection_lifetime,
+        "max_transaction_retry_time": pool.max_transaction_retry_time,
+    }
+
+
+def get_database() -> str:
+    return settings.general.graph.database
+
+
+def get_driver() -> Driver:
+    """
+    Process-wide sync driver (ingestion, scripts, sync retrieval).
+    """
+    global _driver
+    if _driver is None:
+        with _lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    settings.env.neo4j_uri,
+                    auth=(settings.env.neo4j_username, settings.env.neo4j_password),
+                    **_driver_config(),
+                )
+                _trackers["sync"] = _PoolTracker(settings.general.graph.pool.max_size)
+    return _driver
+
+
+def get_async_driver() -> AsyncDriver:
+    """
+    Process-wide async Neo4j driver for the non-blocking request path.
+    """
+    global _async_driver
+    if _async_driver is None:
+        with _lock:
+            if _async_driver is None:
+                _async_driver = AsyncGraphDatabase.driver(
+                    settings.env.neo4j_uri,
+                    auth=(settings.env.neo4j_username, settings.env.neo4j_password),
+                    **_driver_config(),
+                )
+                _trackers["async"] = _PoolTracker(settings.general.graph.pool.max_size)
+    return _async_driver
+
+
+@contextmanager
+def session(access: str = WRITE):
+    """
+    Sync session routed for reading (READ) or writing (WRITE).
+    """
+    driver = get_driver()
+    tracker = _trackers["sync"]
+    started = tracker.enter()
+    failed = False
+    try:
+        # Sharing execute_query's bookmark manager keeps reads causally consistent with session writes
+        with driver.session(database=get_database(),
+                            default_access_mode=READ_ACCESS if access == READ else WRITE_ACCESS,
+                            bookmark_manager=driver.execute_query_bookmark_manager) as s:
+            yield s
+    except Exception:
+        failed = True
+        raise
+    finally:
+        tracker.exit(started, failed)
+
+
+@asynccontextmanager
+async def async_session(access: str = READ):
+    driver = get_async_driver()
+    tracker = _trackers["async"]
+    started = tracker.enter()
+    failed = False
+    try:
+        async with driver.session(database=get_database(),
+                                  default_access_mode=READ_ACCESS if access == READ else WRITE_ACCESS,
+                                  bookmark_manager=driver.execute_query_bookmark_manager) as s:
+            yield s
+    except Exception:
+        failed = True
+        raise
+    finally:
+        tracker.exit(started, failed)
+
+
+def run_query(cypher: str, params: dict = None, access: str = WRITE) -> List[dict]:
+    """
+    Runs one auto-retried query and returns its records as dicts.
+    """
+    driver = get_driver()
+    tracker = _trackers["sync"]
+    started = tracker.enter()
+    failed = False
+    try:
+        records, _, _ = driver.execute_query(cypher, params or {}, database_=get_database(), routing_=access)
+        return [record.data() for record in records]
+    except Exception:
+        failed = True
+        raise
+    finally:
+        tracker.exit(started, failed)
+
+
+async def arun_query(cypher: str, params: dict = None, access: str = READ) -> List[dict]:
+    driver = get_async_driver()
+    tracker = _trackers["async"]
+    started = tracker.enter()
+    failed = False
+    try:
+        records, _, _ = await driver.execute_query(cypher, params or {}, database_=get_database(), routing_=access)
+        return [record.data() for record in records]
+    except Exception:
+        failed = True
+        raise
+    finally:
+        tracker.exit(started, failed)
+
+
+def pool_metrics() -> Dict[str, Dict]:
+    """
+    Demand on each driver created so far, keyed "sync"/"async".
+    """
+    return {name: tracker.metrics.as_dict() for name, tracker in _trackers.items()}
+
+
+def close_driver():
+    global _driver
+    with _lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+            _trackers.pop("sync", None)
+
+
+async def close_async_driver():
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+        _trackers.pop("async", None)
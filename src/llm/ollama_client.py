@@ -1,9 +1,21 @@
+import httpx
 from langchain_ollama import ChatOllama
 from config.settings import settings
+from .balancer import balanced, split_urls
 
-def get_ollama_client():
+def _replica_client(base_url: str) -> ChatOllama:
+    pool = settings.general.llm.pool
+    limits = httpx.Limits(max_connections=pool.max_connections,
+                          max_keepalive_connections=pool.max_keepalive_connections,
+                          keepalive_expiry=pool.keepalive_expiry)
     return ChatOllama(
         model=settings.env.ollama_model,
         temperature=settings.general.llm.temperature,
-        base_url=settings.env.ollama_base_url
+        base_url=base_url,
+        # Passed to the underlying httpx clients
+        client_kwargs={"limits": limits, "timeout": pool.timeout},
     )
+
+def get_ollama_client():
+    # With several comma-separated OLLAMA_BASE_URLs, requests are balanced across them
+    return balanced("ollama", split_urls(settings.env.ollama_base_url), _replica_client)
@@ -0,0 +1,57 @@
+"""
+Requests-per-minute limiting for LLM providers.
+"""
+import threading
+import time
+from typing import Dict
+
+from config.settings import settings
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces requests evenly to stay under a
+    requests-per-minute budget. A limit of 0 (or less) disables limiting.
+    """
+
+    def __init__(self, requests_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Claims the next request slot and returns how long to wait for it.
+        """
+        if self._interval == 0.0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            return slot - now
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Returns the shared limiter for a provider, configured from
+    settings.general.ingestion.requests_per_minute.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            rpm = settings.general.ingestion.requests_per_minute.get(provider, 0)
+            _limiters[provider] = RateLimiter(rpm)
+        return _limiters[provider]
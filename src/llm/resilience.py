@@ -0,0 +1,393 @@
+"""
+Retries, retry budgets and circuit breaking for LLM calls.
+
+get_llm_client wraps every client in a ResilientRunnable that shares its
+provider's Resilience (see get_resilience):
+
+- Only transient errors are retried: timeouts, connection errors, 429 and
+  5xx responses. Validation and other 4xx errors fail on the first attempt.
+- Backoff is exponential with jitter and capped at max_delay. A Retry-After
+  hint from the provider is used instead when present; a hint longer than
+  max_retry_after, or a retry that would end after the deadline, fails the
+  call instead of waiting.
+- Retries draw from a per-provider budget that only refills with new calls,
+  so during an incident retries cannot multiply the load on the provider.
+- After failure_threshold consecutive transient failures the circuit opens
+  and calls fail fast with CircuitOpenError for reset_timeout seconds; then
+  a single trial call decides whether it closes again.
+
+Async calls wait with asyncio.sleep, so retries never block the event loop.
+"""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from langchain_core.runnables import Runnable
+
+from config.settings import settings
+from .metrics import counter
+
+RETRYABLE_STATUS = {408, 409, 425, 429}
+# Provider SDK exceptions are recognised by class name, so no SDK is imported here
+TRANSIENT_NAMES = ("Timeout", "Connection", "RateLimit", "ResourceExhausted", "ServiceUnavailable",
+                   "InternalServerError", "DeadlineExceeded", "TooManyRequests", "Unavailable")
+# Bad requests, schema violations and unparseable output fail the same way every time
+# (pydantic's ValidationError and LangChain's OutputParserException are ValueErrors)
+PERMANENT_ERRORS = (ValueError, TypeError, KeyError, AttributeError, NotImplementedError)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"LLM provider '{provider}' is unavailable (circuit open, next trial in {retry_in:.1f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status carried by a provider error or its response, if any."""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status", "code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether another attempt may succeed. Errors that are neither known to be
+    transient nor known to be permanent are retried.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if any(name in cls.__name__ for cls in type(error).__mro__ for name in TRANSIENT_NAMES):
+        return True
+    return not isinstance(error, PERMANENT_ERRORS)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header on the error's response."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    Every call deposits `ratio` tokens (up to `burst`) and every retry
+    spends one, so retries stay a bounded fraction of the traffic.
+    """
+
+    def __init__(self, ratio: float = 0.2, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                return
+        counter("llm_circuit_rejections_total", "LLM calls failed fast by an open circuit",
+                {"provider": self.name}).inc()
+        raise CircuitOpenError(self.name, max(remaining, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"[LLM] {self.name}: circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_abandoned(self):
+        """
+        A call ended without a result (cancelled, or a stream closed early).
+        If it was the half-open trial, the next call may try again.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic() - self.reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                print(f"[LLM] {self.name}: circuit open after {self.failures} consecutive failures, "
+                      f"failing fast for {self.reset_timeout:.0f}s")
+
+
+class Resilience:
+    """
+    Retry policy, retry budget and circuit breaker of one provider.
+
+    Usage:
+        result = resilience.call(client.invoke, prompt)
+        result = await resilience.acall(client.ainvoke, prompt)
+    """
+
+    def __init__(self, name: str, max_attempts: int = 3, initial_delay: float = 0.5, max_delay: float = 8.0,
+                 max_retry_after: float = 30.0, deadline: float = 60.0,
+                 budget: RetryBudget = None, breaker: CircuitBreaker = None):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.deadline = deadline
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker(name)
+
+    @classmethod
+    def from_settings(cls, name: str) -> "Resilience":
+        config = settings.general.llm.resilience
+        return cls(
+            name,
+            max_attempts=config.max_attempts,
+            initial_delay=config.initial_delay,
+            max_delay=config.max_delay,
+            max_retry_after=config.max_retry_after,
+            deadline=config.deadline,
+            budget=RetryBudget(config.retry_budget_ratio, config.retry_budget_burst),
+            breaker=CircuitBreaker(name, config.failure_threshold, config.reset_timeout),
+        )
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        started = self._begin()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._on_failure(e, attempt, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            except BaseException:
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        started = self._begin()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._on_failure(e, attempt, started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _begin(self) -> float:
+        self.budget.deposit()
+        return time.monotonic()
+
+    def _on_failure(self, error: Exception, attempt: int, started: float, partial: bool = False) -> Optional[float]:
+        """
+        Records a failed attempt and returns the delay before the next one,
+        or None if the error should be raised. `partial` marks a stream that
+        already produced output, which is never retried.
+        """
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The provider answered; the request itself was at fault
+            self.breaker.record_success()
+        if partial or not retryable or attempt >= self.max_attempts:
+            return None
+
+        hint = retry_after(error)
+        if hint is not None:
+            if hint > self.max_retry_after:
+                return None
+            delay = hint
+        else:
+            cap = min(self.max_delay, self.initial_delay * 2 ** (attempt - 1))
+            delay = cap / 2 + random.uniform(0, cap / 2)
+        if time.monotonic() - started + delay > self.deadline or not self.budget.try_spend():
+            return None
+
+        counter("llm_retries_total", "LLM call retries", {"provider": self.name}).inc()
+        print(f"[LLM] {self.name}: {type(error).__name__}: {str(error)[:100]} "
+              f"(attempt {attempt}/{self.max_attempts}), retrying in {delay:.2f}s")
+        return delay
+
+
+_resilience: Dict[str, Resilience] = {}
+_resilience_lock = threading.Lock()
+
+
+def get_resilience(provider: str) -> Resilience:
+    """
+    Returns the shared Resilience for a provider, configured from
+    settings.general.llm.resilience.
+    """
+    with _resilience_lock:
+        if provider not in _resilience:
+            _resilience[provider] = Resilience.from_settings(provider)
+        return _resilience[provider]
+
+
+class ResilientRunnable(Runnable):
+    """
+    Wraps a chat model (or any runnable) so that invoke, ainvoke, stream,
+    astream and the default batch methods go through a Resilience. Runnables
+    derived with with_structured_output are wrapped too; every other
+    attribute is the wrapped model's.
+
+    Streams are only retried until their first chunk has been yielded.
+    """
+
+    def __init__(self, bound: Runnable, resilience: Resilience):
+        self.bound = bound
+        self.resilience = resilience
+
+    def __getattr__(self, name):
+        if name in ("bound", "resilience"):
+            raise AttributeError(name)
+        return getattr(self.bound, name)
+
+    def __repr__(self) -> str:
+        return f"ResilientRunnable({self.bound!r}, provider={self.resilience.name!r})"
+
+    @property
+    def InputType(self):
+        return self.bound.InputType
+
+    @property
+    def OutputType(self):
+        return self.bound.OutputType
+
+    def get_name(self, suffix: Optional[str] = None, *, name: Optional[str] = None) -> str:
+        return self.bound.get_name(suffix, name=name)
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.resilience.call(self.bound.invoke, input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.resilience.acall(self.bound.ainvoke, input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        resilience = self.resilience
+        started = resilience._begin()
+        attempt = 0
+        while True:
+            attempt += 1
+            resilience.breaker.before_call()
+            produced = False
+            try:
+                for chunk in self.bound.stream(input, config, **kwargs):
+                    produced = True
+                    yield chunk
+            except Exception as e:
+                delay = resilience._on_failure(e, attempt, started, partial=produced)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            except BaseException:
+                # Cancelled, or the consumer closed the stream early
+                resilience.breaker.record_abandoned()
+                raise
+            else:
+                resilience.breaker.record_success()
+                return
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        resilience = self.resilience
+        started = resilience._begin()
+        attempt = 0
+        while True:
+            attempt += 1
+            resilience.breaker.before_call()
+            produced = False
+            try:
+                async for chunk in self.bound.astream(input, config, **kwargs):
+                    produced = True
+                    yield chunk
+            except Exception as e:
+                delay = resilience._on_failure(e, attempt, started, partial=produced)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled, or the consumer closed the stream early
+                resilience.breaker.record_abandoned()
+                raise
+            else:
+                resilience.breaker.record_success()
+                return
+
+    def with_structured_output(self, *args, **kwargs) -> "ResilientRunnable":
+        return ResilientRunnable(self.bound.with_structured_output(*args, **kwargs), self.resilience)
+
+    def bind_tools(self, *args, **kwargs) -> "ResilientRunnable":
+        return ResilientRunnable(self.bound.bind_tools(*args, **kwargs), self.resilience)
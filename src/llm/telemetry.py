@@ -0,0 +1,147 @@
+"""
+Stage timing spans for the chat pipeline.
+
+The pipeline already knows when every stage started and finished (the DAG's
+RunResult.timings). record_run turns one run's timings into:
+
+- chat_stage_seconds histograms (labelled by pipeline and stage) and token
+  counters, rendered by metrics.render_prometheus for /metrics,
+- OpenTelemetry spans, if enabled and the SDK is installed.
+
+server_timing formats the same timings as a Server-Timing header.
+Until configure() is called with observability enabled, every function here
+returns immediately, so library use (scripts, benchmarks) records nothing.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from .metrics import LATENCY_BUCKETS, TOKEN_BUCKETS, counter, histogram
+
+Timings = Dict[str, Tuple[float, float]]
+
+_enabled = False
+_server_timing = False
+_tracer = None
+_trace_api = None
+_tracer_provider = None
+
+
+def configure(config) -> bool:
+    """
+    Applies an ObservabilityConfig. Returns whether recording is enabled.
+    """
+    global _enabled, _server_timing, _tracer
+    _enabled = config.enabled
+    _server_timing = config.enabled and config.server_timing
+    _tracer = _start_tracer(config.otel) if config.enabled and config.otel.enabled else None
+    return _enabled
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _start_tracer(config):
+    global _trace_api, _tracer_provider
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("[Telemetry] OpenTelemetry export requested but opentelemetry-sdk / "
+              "opentelemetry-exporter-otlp-proto-http are not installed; spans are not exported")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": config.service_name}))
+    # Without an explicit endpoint the exporter reads OTEL_EXPORTER_OTLP_* variables
+    exporter = OTLPSpanExporter(endpoint=config.endpoint) if config.endpoint else OTLPSpanExporter()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    _trace_api, _tracer_provider = trace, provider
+    print(f"[Telemetry] Exporting spans as '{config.service_name}'")
+    return provider.get_tracer("graph-rag")
+
+
+def shutdown():
+    """Flushes pending spans."""
+    global _tracer, _tracer_provider
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+    _tracer, _tracer_provider = None, None
+
+
+def record_run(pipeline: str, timings: Timings, attributes: Dict = None):
+    """
+    Records one run's stage timings; `pipeline` is "chat", "stream" or "batch".
+    """
+    if not _enabled or not timings:
+        return
+    for stage, (start, end) in timings.items():
+        _stage_histogram(pipeline, stage).observe(end - start)
+    start, end = _bounds(timings)
+    _stage_histogram(pipeline, "total").observe(end - start)
+    if _tracer is not None:
+        _export_spans(pipeline, timings, attributes or {})
+
+
+def observe_stage(pipeline: str, stage: str, seconds: float):
+    """Records a single stage duration outside a full run (e.g. per question in a batch)."""
+    if _enabled:
+        _stage_histogram(pipeline, stage).observe(seconds)
+
+
+def record_tokens(message, context_tokens: Optional[int] = None):
+    """
+    Counts LLM input/output tokens from a response's usage metadata (when the
+    provider reports it) and the size of the context sent with the prompt.
+    """
+    if not _enabled:
+        return
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        counter("llm_tokens_total", "LLM tokens reported by the provider", {"direction": "input"}).inc(
+            usage.get("input_tokens", 0))
+        counter("llm_tokens_total", "LLM tokens reported by the provider", {"direction": "output"}).inc(
+            usage.get("output_tokens", 0))
+    if context_tokens is not None:
+        histogram("chat_context_tokens", TOKEN_BUCKETS, "Estimated tokens of retrieved context per prompt").observe(
+            context_tokens)
+
+
+def server_timing(timings: Timings) -> Optional[str]:
+    """
+    Server-Timing header value, e.g. 'embed;dur=12.1, retrieve;dur=30.4, total;dur=51.0',
+    or None when disabled or there is nothing to report.
+    """
+    if not _server_timing or not timings:
+        return None
+    parts = [f"{stage};dur={(end - start) * 1000:.1f}" for stage, (start, end) in timings.items()]
+    start, end = _bounds(timings)
+    parts.append(f"total;dur={(end - start) * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _stage_histogram(pipeline: str, stage: str):
+    return histogram("chat_stage_seconds", LATENCY_BUCKETS, "Duration of chat pipeline stages",
+                     labels={"pipeline": pipeline, "stage": stage})
+
+
+def _bounds(timings: Timings) -> Tuple[float, float]:
+    return min(s for s, _ in timings.values()), max(e for _, e in timings.values())
+
+
+def _export_spans(pipeline: str, timings: Timings, attributes: Dict):
+    # Timings are perf_counter() seconds; spans need epoch nanoseconds
+    offset = time.time_ns() - time.perf_counter_ns()
+
+    def to_ns(t: float) -> int:
+        return int(t * 1e9) + offset
+
+    start, end = _bounds(timings)
+    root = _tracer.start_span(pipeline, start_time=to_ns(start), attributes=attributes)
+    context = _trace_api.set_span_in_context(root)
+    for stage, (stage_start, stage_end) in timings.items():
+        _tracer.start_span(f"{pipeline}.{stage}", context=context, start_time=to_ns(stage_start)).end(
+            end_time=to_ns(stage_end))
+    root.end(end_time=to_ns(end))
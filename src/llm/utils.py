@@ -1,50 +1,80 @@
+import asyncio
 import time
 import functools
+import inspect
 import random
 from typing import Callable, Any
 
+from .resilience import is_retryable, retry_after
+
 
 def retry_with_backoff(
     retries: int = 3,
     initial_delay: float = 1.0,
-    backoff_factor: float = 40.0,
+    backoff_factor: float = 2.0,
     jitter: bool = True,
+    max_delay: float = 30.0,
 ):
     """
-    A manual retry decorator with exponential backoff.
+    A manual retry decorator with exponential backoff, for sync and async functions.
+
+    Only errors that resilience.is_retryable considers transient are retried,
+    and a Retry-After hint on the error replaces the computed delay.
+    LLM clients from get_llm_client already retry; use this for other calls.
     """
 
+    def next_delay(e: Exception, delay: float) -> float:
+        hint = retry_after(e)
+        if hint is not None:
+            return min(hint, max_delay)
+        sleep_time = min(delay, max_delay)
+        if jitter:
+            sleep_time += random.uniform(0, 0.1 * sleep_time)
+        return sleep_time
+
+    def should_retry(e: Exception, attempt: int) -> bool:
+        if not is_retryable(e):
+            return False
+        if attempt == retries:
+            print(f"FAILED: All {retries} retries exhausted.")
+            return False
+        # Log the error
+        print(f"ERROR: {str(e)[:100]}... (Attempt {attempt+1}/{retries+1})")
+        return True
+
     def decorator(func: Callable[..., Any]):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                delay = initial_delay
+                for i in range(retries + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        if not should_retry(e, i):
+                            raise
+                        sleep_time = next_delay(e, delay)
+                        print(f"Retrying in {sleep_time:.2f} seconds...")
+                        await asyncio.sleep(sleep_time)
+                        delay *= backoff_factor
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             delay = initial_delay
-            last_exception = None
-
             for i in range(retries + 1):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    if i == retries:
-                        print(f"FAILED: All {retries} retries exhausted.")
-                        raise last_exception
-
-                    # Log the error
-                    print(f"ERROR: {str(e)[:100]}... (Attempt {i+1}/{retries+1})")
-
-                    # Calculate sleep time
-                    sleep_time = delay
-                    if jitter:
-                        sleep_time += random.uniform(0, 0.1 * delay)
-
+                    if not should_retry(e, i):
+                        raise
+                    sleep_time = next_delay(e, delay)
                     print(f"Retrying in {sleep_time:.2f} seconds...")
                     time.sleep(sleep_time)
-
                     # Update delay for next round
                     delay *= backoff_factor
 
-            return None  # Should not reach here
-
         return wrapper
 
     return decorator
@@ -0,0 +1,380 @@
+"""
+In-process vector index over chunk embeddings.
+
+Embeddings live in a memory-mapped float32 matrix (one L2-normalized row
+per chunk) next to a JSON list of chunk ids; a small manifest names the
+current generation of those files. Readers map the files read-only, so
+several uvicorn workers share the same pages, and a sync writes a new
+generation and swaps the manifest atomically.
+
+Syncs are incremental: chunks carry an updated_at stamp, so only chunks
+written since the last sync are fetched, and the tombstones deleted chunks
+leave drop their rows. A sync only runs when the graph version stamp has
+changed.
+
+Optionally the matrix is also stored as int8 or binary codes (4x / 32x
+smaller). Searches then scan only the codes and rescore a shortlist of
+top_k * rescore_factor rows exactly against the float32 matrix, so just
+those rows of the float file are paged in.
+
+Workers coordinate through a lock file in the index directory: a sync holds
+it exclusively while it writes a generation and removes stale files, and
+loads hold it shared while they open the files named by the manifest. A
+worker that waited for another one's sync loads that generation instead of
+writing the same one again.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no prefork workers, the in-process lock is enough
+    fcntl = None
+
+import numpy as np
+
+from config.settings import settings, resolve_path
+
+MANIFEST = "manifest.json"
+# Dot files are skipped by stale file cleanup
+LOCK_FILE = ".lock"
+# Chunks stamped shortly before the last sync are fetched again, in case
+# their transaction committed after the sync read
+WATERMARK_OVERLAP_MS = 60_000
+QUANTIZATIONS = ("none", "int8", "binary")
+# Rows scored per block when scanning int8 codes (bounds the float temporaries)
+SCAN_BLOCK_ROWS = 8192
+# Set bits per byte value, for Hamming distances between binary codes
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class LocalVectorIndex:
+    """
+    Args:
+        path: Directory holding the manifest and matrix files.
+        refresh_interval: Seconds between checks for a newer manifest or
+            graph version (see refresh_due).
+        page_size: Chunks fetched per query during a sync.
+        quantization: "none", "int8" or "binary" codes for the first pass.
+        rescore_factor: Shortlist size per requested result for exact rescoring.
+    """
+
+    def __init__(self, path: str, refresh_interval: float = 30.0, page_size: int = 2000,
+                 quantization: str = "none", rescore_factor: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}. Valid options: {', '.join(QUANTIZATIONS)}")
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        # (ids, matrix, codes) replaced as one reference so searches see one generation
+        self._snapshot = ([], None, None)
+        self.manifest: Dict = {}
+        self._last_refresh = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.load()
+
+    @classmethod
+    def from_settings(cls) -> "LocalVectorIndex":
+        config = settings.general.retrieval.local_index
+        return cls(
+            resolve_path(config.path),
+            refresh_interval=config.refresh_interval,
+            page_size=config.page_size,
+            quantization=config.quantization,
+            rescore_factor=config.rescore_factor,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def ids(self) -> List[str]:
+        return self._snapshot[0]
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        return self._snapshot[1]
+
+    @property
+    def graph_version(self) -> Optional[int]:
+        return self.manifest.get("graph_version")
+
+    def load(self) -> bool:
+        """
+        Maps the generation named by the manifest, if it is not the one
+        already loaded. Returns True if a new generation was loaded.
+        """
+        # A sync in another worker must not remove the files between reading
+        # the manifest and mapping them (mapped files survive removal)
+        with self._file_lock(shared=True):
+            return self._load()
+
+    def _load(self) -> bool:
+        manifest = self._read_manifest()
+        if not manifest or manifest.get("generation") == self.manifest.get("generation"):
+            return False
+
+        with open(os.path.join(self.path, manifest["ids_file"]), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        matrix, codes = None, None
+        if ids:
+            dimension = manifest["dimension"]
+            matrix = np.memmap(os.path.join(self.path, manifest["matrix_file"]), dtype=np.float32,
+                               mode="r", shape=(len(ids), dimension))
+            if manifest.get("codes_file"):
+                width = dimension if manifest["quantization"] == "int8" else (dimension + 7) // 8
+                dtype = np.int8 if manifest["quantization"] == "int8" else np.uint8
+                codes = np.memmap(os.path.join(self.path, manifest["codes_file"]), dtype=dtype,
+                                  mode="r", shape=(len(ids), width))
+        self._snapshot = (ids, matrix, codes)
+        self.manifest = manifest
+        return True
+
+    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
+        """
+        Returns up to top_k {'id', 'score'} dicts, best first. Scores use the
+        Neo4j cosine convention ((1 + cos) / 2) so both backends agree.
+        """
+        ids, matrix, codes = self._snapshot
+        if matrix is None or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        k = min(top_k, len(ids))
+        if codes is None:
+            candidates = np.arange(len(ids))
+        else:
+            approx = self._approximate_scores(codes, query)
+            shortlist = min(len(ids), k * self.rescore_factor)
+            candidates = np.argpartition(approx, -shortlist)[-shortlist:]
+            # Sorted indices keep the reads from the float file sequential
+            candidates.sort()
+
+        similarities = np.asarray(matrix[candidates]) @ query
+        top = np.argpartition(similarities, -k)[-k:]
+        top = top[np.argsort(similarities[top])[::-1]]
+        return [{"id": ids[candidates[i]], "score": float((1.0 + similarities[i]) / 2.0)} for i in top]
+
+    def _approximate_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self.manifest["quantization"] == "binary":
+            query_bits = np.packbits(query > 0)
+            # Fewer differing bits means more similar
+            return -POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def refresh_due(self) -> bool:
+        return not self._refreshing and time.monotonic() - self._last_refresh >= self.refresh_interval
+
+    def refresh_in_background(self, graph_manager) -> asyncio.Future:
+        """
+        Runs refresh on the event loop's default executor. Searches keep
+        using the current generation meanwhile.
+        """
+        # Set before the job starts, so refresh_due does not schedule a second one
+        self._refreshing = True
+        return asyncio.get_running_loop().run_in_executor(None, self.refresh, graph_manager)
+
+    def refresh(self, graph_manager) -> bool:
+        """
+        Picks up a generation written by another process, then syncs from
+        Neo4j if the graph version still differs. Errors are logged, so a
+        failed refresh keeps serving the current generation.
+        """
+        with self._lock:
+            self._refreshing = True
+            try:
+                self.load()
+                if self._is_current(graph_manager):
+                    return False
+                with self._file_lock():
+                    # Another worker may have synced while this one waited
+                    self._load()
+                    if self._is_current(graph_manager):
+                        return False
+                    return self._sync(graph_manager)
+            except Exception as e:
+                print(f"Error refreshing local vector index: {e}")
+                return False
+            finally:
+                self._last_refresh = time.monotonic()
+                self._refreshing = False
+
+    def sync(self, graph_manager) -> bool:
+        """
+        Brings the index up to date with the Chunk embeddings in Neo4j and
+        writes a new generation. Returns True if anything changed.
+        """
+        with self._file_lock():
+            self._load()
+            return self._sync(graph_manager)
+
+    def _is_current(self, graph_manager) -> bool:
+        return (bool(self.manifest) and self.manifest.get("quantization", "none") == self.quantization
+                and graph_manager.get_graph_version() == self.graph_version)
+
+    def _sync(self, graph_manager) -> bool:
+        graph_version = graph_manager.get_graph_version()
+        watermark = self.manifest.get("watermark")
+        since = watermark - WATERMARK_OVERLAP_MS if watermark is not None else None
+        if since is None:
+            # Full scan: stamp legacy chunks once so later syncs can skip them
+            graph_manager.backfill_chunk_timestamps()
+
+        changed_ids, changed_rows = [], []
+        new_watermark = watermark
+        after_id = ""
+        while True:
+            page = graph_manager.get_chunk_embedding_page(updated_after=since, after_id=after_id,
+                                                          limit=self.page_size)
+            if not page:
+                break
+            for row in page:
+                changed_ids.append(row["id"])
+                changed_rows.append(row["embedding"])
+                if row.get("updated_at") is not None:
+                    new_watermark = max(new_watermark or 0, row["updated_at"])
+            after_id = page[-1]["id"]
+
+        changed = set(changed_ids)
+        if since is None:
+            # Every embedded chunk was just fetched
+            keep = []
+        else:
+            deleted = graph_manager.get_deleted_chunk_ids(since)
+            if deleted is None:
+                # Tombstones this old were pruned: fall back to an id scan
+                current_ids = graph_manager.get_embedded_chunk_ids()
+                deleted = {chunk_id for chunk_id in self.ids if chunk_id not in current_ids}
+            keep = [i for i, chunk_id in enumerate(self.ids) if chunk_id not in deleted and chunk_id not in changed]
+        if self.manifest and len(keep) == len(self.ids) and not changed_ids:
+            self._write(self.ids, self.matrix, graph_version, new_watermark)
+            return False
+
+        ids = [self.ids[i] for i in keep] + changed_ids
+        parts = []
+        if keep:
+            parts.append(np.asarray(self.matrix[keep]))
+        if changed_rows:
+            parts.append(_unit_rows(changed_rows))
+        matrix = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+        self._write(ids, matrix, graph_version, new_watermark)
+        return True
+
+    def _write(self, ids: List[str], matrix: np.ndarray, graph_version: int, watermark: Optional[int]):
+        generation = f"{graph_version}-{uuid.uuid4().hex[:8]}"
+        unchanged = bool(self.manifest) and ids is self.ids
+        if unchanged:
+            # Same rows: point the new manifest at the existing files
+            matrix_file, ids_file = self.manifest["matrix_file"], self.manifest["ids_file"]
+        else:
+            matrix_file, ids_file = f"{generation}.f32", f"{generation}.ids.json"
+            np.ascontiguousarray(matrix, dtype=np.float32).tofile(os.path.join(self.path, matrix_file))
+            with open(os.path.join(self.path, ids_file), "w", encoding="utf-8") as f:
+                json.dump(ids, f)
+
+        codes_file = None
+        if self.quantization != "none" and len(ids):
+            if unchanged and self.manifest.get("quantization") == self.quantization:
+                codes_file = self.manifest.get("codes_file")
+            else:
+                codes_file = f"{generation}.{self.quantization}"
+                quantize(np.asarray(matrix), self.quantization).tofile(os.path.join(self.path, codes_file))
+
+        manifest = {
+            "generation": generation,
+            "matrix_file": matrix_file,
+            "ids_file": ids_file,
+            "codes_file": codes_file,
+            "quantization": self.quantization if codes_file else "none",
+            "dimension": int(matrix.shape[1]) if len(ids) else 0,
+            "count": len(ids),
+            "graph_version": graph_version,
+            "watermark": watermark,
+        }
+        tmp = os.path.join(self.path, f".{MANIFEST}.{uuid.uuid4().hex[:8]}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+        self._load()
+        self._remove_stale_files()
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """
+        Holds the index directory's lock file, exclusively unless shared.
+        Not reentrant: flock locks of two open files conflict even within
+        one process.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict:
+        try:
+            with open(os.path.join(self.path, MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _remove_stale_files(self):
+        # Other workers may still map the previous generation, so keep it
+        current = {self.manifest[key] for key in ("matrix_file", "ids_file", "codes_file") if self.manifest.get(key)}
+        generations = {}
+        for name in os.listdir(self.path):
+            if name == MANIFEST or name.startswith(".") or name in current:
+                continue
+            mtime = os.path.getmtime(os.path.join(self.path, name))
+            generation = name.split(".", 1)[0]
+            generations.setdefault(generation, (mtime, []))[1].append(name)
+        stale = sorted(generations.values(), key=lambda g: g[0])[:-1]
+        for _, names in stale:
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+
+def quantize(matrix: np.ndarray, quantization: str) -> np.ndarray:
+    """
+    Codes for L2-normalized rows: int8 scales every component by 127 (all
+    components lie in [-1, 1]); binary keeps one sign bit per dimension.
+    """
+    if quantization == "int8":
+        return np.clip(np.rint(matrix * 127.0), -127, 127).astype(np.int8)
+    if quantization == "binary":
+        return np.packbits(matrix > 0, axis=1)
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def _unit_rows(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
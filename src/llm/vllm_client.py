@@ -1,14 +1,32 @@
+import httpx
 from langchain_openai import ChatOpenAI
 from config.settings import settings
+from .balancer import balanced, split_urls
 
-def get_vllm_client():
-    """
-    Returns a configured ChatOpenAI client pointing to a vLLM server.
-    vLLM provides an OpenAI-compatible API.
-    """
+def _http_limits() -> httpx.Limits:
+    pool = settings.general.llm.pool
+    return httpx.Limits(max_connections=pool.max_connections,
+                        max_keepalive_connections=pool.max_keepalive_connections,
+                        keepalive_expiry=pool.keepalive_expiry)
+
+def _replica_client(base_url: str) -> ChatOpenAI:
+    timeout = settings.general.llm.pool.timeout
     return ChatOpenAI(
         model=settings.env.vllm_model,
         temperature=settings.general.llm.temperature,
         openai_api_key=settings.env.vllm_api_key,
-        openai_api_base=settings.env.vllm_base_url,
+        openai_api_base=base_url,
+        # Pooled keep-alive connections, reused for the life of the client
+        http_client=httpx.Client(limits=_http_limits(), timeout=timeout),
+        http_async_client=httpx.AsyncClient(limits=_http_limits(), timeout=timeout),
+        # Retries are handled by resilience.ResilientRunnable
+        max_retries=0,
     )
+
+def get_vllm_client():
+    """
+    Returns a configured ChatOpenAI client pointing to a vLLM server.
+    vLLM provides an OpenAI-compatible API.
+    With several comma-separated VLLM_BASE_URLs, requests are balanced across them.
+    """
+    return balanced("vllm", split_urls(settings.env.vllm_base_url), _replica_client)
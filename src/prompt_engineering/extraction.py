@@ -16,3 +16,9 @@ class Relationship(BaseModel):
 class GraphData(BaseModel):
     nodes: List[Entity] = Field(..., description="List of nodes (entities) found in the text")
     edges: List[Relationship] = Field(..., description="List of edges (relationships) between nodes")
+
+class ChunkGraphData(GraphData):
+    chunk: int = Field(..., description="Number of the text chunk these nodes and edges were extracted from")
+
+class PackedGraphData(BaseModel):
+    chunks: List[ChunkGraphData] = Field(..., description="One entry per text chunk in the request, in order")
@@ -0,0 +1,37 @@
+"""
+Startup timing report.
+
+Steps are timed with `startup_timer.step(name)`; the report lists each step
+and the time since the process started. Workers forked from a preloading
+master inherit the master's steps, so their report covers both.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps: List[Tuple[str, float, int]] = []
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started, os.getpid()))
+
+    def report(self) -> str:
+        pid = os.getpid()
+        lines = [f"[Startup] Timing report (pid {pid}):"]
+        for name, seconds, step_pid in self.steps:
+            where = "" if step_pid == pid else f" (master {step_pid})"
+            lines.append(f"  {name:<32} {seconds * 1000:8.1f} ms{where}")
+        lines.append(f"  {'total since start':<32} {(time.perf_counter() - self.started) * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer()
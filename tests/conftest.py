@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the project root importable and satisfy the required settings
+# so modules that read config.settings can be imported offline.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("NEO4J_PASSWORD", "test")
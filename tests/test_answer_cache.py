@@ -0,0 +1,46 @@
+import asyncio
+
+from src.llm.answer_cache import AnswerCache
+
+
+def embedder(vectors):
+    async def embed(question):
+        return vectors[question]
+    return embed
+
+
+def test_exact_and_semantic_lookup():
+    cache = AnswerCache(similarity_threshold=0.9)
+    vectors = {
+        "Who heads EE?": [1.0, 0.0, 0.1],
+        "Who is the head of EE?": [0.98, 0.0, 0.12],
+        "Where is CRP?": [0.0, 1.0, 0.0],
+    }
+    cache.put("Who heads EE?", "Dr. X", embedding=vectors["Who heads EE?"])
+
+    hit = asyncio.run(cache.lookup("who heads ee", embedder(vectors)))
+    assert hit.match == "exact" and hit.value == "Dr. X"
+
+    hit = asyncio.run(cache.lookup("Who is the head of EE?", embedder(vectors)))
+    assert hit.match == "semantic" and hit.similarity > 0.9
+
+    assert asyncio.run(cache.lookup("Where is CRP?", embedder(vectors))) is None
+    assert (cache.exact_hits, cache.semantic_hits, cache.misses) == (1, 1, 1)
+
+
+def test_graph_version_change_invalidates():
+    cache = AnswerCache(version_check_interval=0)
+    version = {"value": 1}
+
+    async def get_version():
+        return version["value"]
+
+    asyncio.run(cache.sync_version(get_version))
+    cache.put("Where is CRP?", "Main campus", embedding=[0.0, 1.0])
+    asyncio.run(cache.sync_version(get_version))
+    assert cache.get_exact("Where is CRP?") is not None
+
+    version["value"] = 2
+    asyncio.run(cache.sync_version(get_version))
+    assert cache.get_exact("Where is CRP?") is None
+    assert cache.get_similar([0.0, 1.0]) is None
@@ -0,0 +1,81 @@
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+from src.llm import extractor
+from src.llm.balancer import BalancedRunnable, LoadBalancer, split_urls
+from benchmarks.fakes import FakeChatModel
+
+
+def test_split_urls():
+    assert split_urls("http://a:8000/v1, http://b:8000/v1,") == ["http://a:8000/v1", "http://b:8000/v1"]
+    assert split_urls("http://localhost:11434") == ["http://localhost:11434"]
+
+
+def test_least_outstanding_routing():
+    balancer = LoadBalancer("test", ["a", "b", "c"])
+    first, second = balancer.acquire(), balancer.acquire()
+    assert first != second
+    # The idle replica gets the next request, then the least loaded ones
+    third = balancer.acquire()
+    assert {first, second, third} == {0, 1, 2}
+    balancer.release(second)
+    assert balancer.acquire() == second
+
+
+def test_failing_replica_is_ejected_and_returns():
+    balancer = LoadBalancer("test", ["a", "b"], failure_threshold=2, eject_seconds=60)
+    calls = []
+
+    def replica(name, healthy):
+        def call(_):
+            calls.append(name)
+            if not healthy:
+                raise ConnectionError(f"{name} is down")
+            return name
+        return RunnableLambda(call)
+
+    runnable = BalancedRunnable([replica("a", False), replica("b", True)], balancer)
+    results = []
+    for _ in range(8):
+        try:
+            results.append(runnable.invoke("x"))
+        except ConnectionError:
+            results.append("error")
+
+    assert results.count("error") == 2
+    assert calls[-4:] == ["b"] * 4
+    assert balancer.endpoints[0].outstanding == 0
+
+    balancer.endpoints[0].ejected_until = 0
+    assert balancer.acquire() == 0
+
+
+def test_async_requests_spread_over_replicas():
+    balancer = LoadBalancer("test", ["a", "b"])
+    seen = []
+
+    def replica(name):
+        async def call(_):
+            seen.append(name)
+            await asyncio.sleep(0.01)
+            return name
+        return RunnableLambda(lambda _: name, afunc=call)
+
+    runnable = BalancedRunnable([replica("a"), replica("b")], balancer)
+
+    async def run():
+        return await runnable.abatch(["x"] * 6)
+
+    asyncio.run(run())
+    assert seen.count("a") == seen.count("b") == 3
+
+
+def test_extraction_chain_is_reused(monkeypatch):
+    llm = FakeChatModel()
+    monkeypatch.setattr(extractor, "get_llm_client", lambda provider=None: llm)
+    chain = extractor.get_extraction_chain()
+    assert extractor.get_extraction_chain() is chain
+
+    monkeypatch.setattr(extractor, "get_llm_client", lambda provider=None: FakeChatModel())
+    assert extractor.get_extraction_chain() is not chain
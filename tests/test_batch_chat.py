@@ -0,0 +1,140 @@
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+from src.llm.chat_pipeline import ChatPipeline
+from src.llm.hybrid_search import BATCH_RETRIEVAL_QUERY, HybridRetriever
+
+
+class FakeEmbeddings:
+    model_name = "fake"
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        self.batches = getattr(self, "batches", 0) + 1
+        return [self.embed_query(t) for t in texts]
+
+
+class FakeGraphManager:
+    def __init__(self):
+        self.queries = []
+
+    async def aquery(self, cypher, params=None):
+        self.queries.append(cypher)
+        if cypher == BATCH_RETRIEVAL_QUERY:
+            # The question at index 1 has no vector hits
+            return [
+                {"i": i, "chunks": [{"id": f"c{i}", "text": f"chunk {i}", "score": 0.9}], "entities": []}
+                for i in range(len(params["batch"])) if i != 1
+            ]
+        return [{"i": i, "facts": []} for i, ids in enumerate(params["batch"]) if ids]
+
+
+def test_batch_runs_each_stage_once_and_isolates_failures():
+    graph_manager = FakeGraphManager()
+    embeddings = FakeEmbeddings()
+    retriever = HybridRetriever(graph_manager, embeddings)
+    in_flight = {"now": 0, "peak": 0}
+
+    async def generate(inputs):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        if "fail" in inputs["question"]:
+            raise RuntimeError("provider down")
+        return f"answer: {inputs['question']}"
+
+    pipeline = ChatPipeline(retriever, None, RunnableLambda(generate), top_k=2)
+    questions = ["q zero", "q one", "q fail", "q three", "q four", "q five"]
+
+    async def collect():
+        return [item async for item in pipeline.run_batch(questions, max_in_flight=2)]
+
+    results = dict(asyncio.run(collect()))
+
+    assert sorted(results) == list(range(len(questions)))
+    assert results[0].answer == "answer: q zero" and results[0].sources == ["c0"]
+    assert results[1].sources == [] and results[1].error is None
+    assert results[2].error == "LLM error: provider down"
+    assert in_flight["peak"] == 2
+    # One embedding call, one retrieval query and one expansion query
+    assert embeddings.batches == 1
+    assert len(graph_manager.queries) == 2
+
+
+def test_answers_without_context_are_not_cached():
+    from src.llm.answer_cache import AnswerCache
+
+    class FlakyGraphManager:
+        down = True
+
+        async def aget_graph_version(self):
+            return 1
+
+        async def aquery(self, cypher, params=None):
+            if self.down:
+                raise ConnectionError("Neo4j unavailable")
+            if "facts" in cypher:
+                return [{"facts": []}]
+            return [{"chunks": [{"id": "c0", "text": "chunk 0", "score": 0.9}], "entities": []}]
+
+    graph_manager = FlakyGraphManager()
+    cache = AnswerCache(version_check_interval=0)
+    chain = RunnableLambda(lambda inputs: f"answer: {inputs['question']}")
+    pipeline = ChatPipeline(HybridRetriever(graph_manager, FakeEmbeddings()), None, chain, answer_cache=cache)
+
+    # A failed retrieval must not pin "no information" for the cache TTL
+    assert asyncio.run(pipeline.run("Who heads EE?")).sources == []
+    assert cache.get_exact("Who heads EE?") is None
+
+    graph_manager.down = False
+    result = asyncio.run(pipeline.run("Who heads EE?"))
+    assert result.answer == "answer: Who heads EE?" and result.cache_match is None
+    assert cache.get_exact("Who heads EE?") is not None
+
+
+def test_guardrail_fallback_verdicts_are_not_cached():
+    from src.llm.answer_cache import AnswerCache
+    from src.llm.guardrail import DepartmentGuardrail
+
+    class FailingLLM:
+        def with_structured_output(self, schema):
+            def fail(_):
+                raise ConnectionError("provider down")
+            return RunnableLambda(fail)
+
+    class ContextGraphManager(FakeGraphManager):
+        async def aget_graph_version(self):
+            return 1
+
+        async def aquery(self, cypher, params=None):
+            if "batch" in (params or {}):
+                return await super().aquery(cypher, params)
+            if "facts" in cypher:
+                return [{"facts": []}]
+            return [{"chunks": [{"id": "c0", "text": "chunk 0", "score": 0.9}], "entities": []}]
+
+    guardrail = DepartmentGuardrail(llm=FailingLLM())
+    cache = AnswerCache(version_check_interval=0)
+    chain = RunnableLambda(lambda inputs: f"answer: {inputs['question']}")
+    pipeline = ChatPipeline(HybridRetriever(ContextGraphManager(), FakeEmbeddings()), guardrail, chain,
+                            answer_cache=cache)
+    # Fail open without a local score, fail closed with a negative one
+    verdicts = [guardrail._fallback(None), guardrail._fallback(-0.5)]
+    assert all(verdict.fallback for verdict in verdicts)
+    assert "fallback" not in type(verdicts[0]).model_json_schema()["properties"]
+
+    result = asyncio.run(pipeline.run("Who heads EE?"))
+    assert result.answer == "answer: Who heads EE?" and result.guardrail_fallback
+    assert cache.get_exact("Who heads EE?") is None
+
+    async def rejected():
+        guardrail.acheck_batch = lambda questions, **kwargs: asyncio.sleep(0, [verdicts[1]] * len(questions))
+        return [item async for item in pipeline.run_batch(["Who heads CS?"])]
+
+    (_, result), = asyncio.run(rejected())
+    assert not result.is_department_related and result.guardrail_fallback
+    assert cache.get_exact("Who heads CS?") is None
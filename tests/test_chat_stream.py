@@ -0,0 +1,85 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.runnables import RunnableGenerator
+
+from api import endpoints
+from src.llm.answer_cache import AnswerCache
+from src.llm.chat_pipeline import OUT_OF_SCOPE_MESSAGE, ChatPipeline
+from src.llm.guardrail import GuardrailResult
+from src.llm.hybrid_search import HybridRetriever
+
+
+class FakeEmbeddings:
+    model_name = "fake"
+
+    def embed_query(self, text):
+        # Orthogonal vectors, so the two topics never match semantically
+        return [float("EE" in text), float("EE" not in text)]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+class FakeGraphManager:
+    async def aget_graph_version(self):
+        return 1
+
+    async def aquery(self, cypher, params=None):
+        if "facts" in cypher:
+            return [{"facts": []}]
+        return [{"chunks": [{"id": "c0", "text": "EE is headed by Dr. A.", "score": 0.9}], "entities": []}]
+
+
+class FakeGuardrail:
+    async def acheck(self, question, embedding=None):
+        if "weather" in question:
+            return GuardrailResult(is_allowed=False, reason="Not about UET")
+        return GuardrailResult(is_allowed=True, reason="About EE")
+
+
+async def generate(inputs):
+    async for _ in inputs:
+        for piece in ["EE ", "is headed ", "by Dr. A."]:
+            yield piece
+
+
+def stream(client, question):
+    """Posts a question and returns the (event, data) pairs of the SSE response."""
+    response = client.post("/api/v1/chat/stream", json={"question": question})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for frame in response.text.split("\n\n"):
+        if frame:
+            event, data = frame.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_stream_sends_meta_then_tokens_then_done(monkeypatch):
+    pipeline = ChatPipeline(HybridRetriever(FakeGraphManager(), FakeEmbeddings()), FakeGuardrail(),
+                            RunnableGenerator(generate), answer_cache=AnswerCache(version_check_interval=0))
+    monkeypatch.setattr(endpoints, "_pipeline", pipeline)
+    app = FastAPI()
+    app.include_router(endpoints.router, prefix="/api/v1")
+    client = TestClient(app)
+
+    events = stream(client, "Who heads EE?")
+    assert [event for event, _ in events] == ["meta", "token", "token", "token", "done"]
+    assert events[0][1]["sources"] == ["c0"] and not events[0][1]["cached"]
+    assert "".join(data["text"] for event, data in events if event == "token") == "EE is headed by Dr. A."
+    assert events[-1][1] == {"answer": "EE is headed by Dr. A."}
+
+    # The streamed answer was cached, so it now comes back in one piece
+    events = stream(client, "Who heads EE?")
+    assert [event for event, _ in events] == ["meta", "token", "done"]
+    assert events[0][1]["cached"]
+    assert events[1][1] == {"text": "EE is headed by Dr. A."}
+
+    # So does a guardrail rejection, without generating anything
+    events = stream(client, "What is the weather today?")
+    assert [event for event, _ in events] == ["meta", "token", "done"]
+    assert not events[0][1]["is_department_related"]
+    assert events[1][1]["text"].startswith(OUT_OF_SCOPE_MESSAGE)
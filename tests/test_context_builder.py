@@ -0,0 +1,59 @@
+from src.llm.context_builder import ContextBuilder, approximate_tokens
+
+
+def words(start, stop):
+    return " ".join(f"w{i}" for i in range(start, stop))
+
+
+def test_overlapping_chunks_are_trimmed():
+    # Neighbouring chunks share 40 words, like chunk_overlap in ingestion
+    chunks = [
+        {"id": "a", "text": words(0, 100), "score": 0.9},
+        {"id": "b", "text": words(60, 160), "score": 0.8},
+        {"id": "c", "text": words(10, 50), "score": 0.7},
+    ]
+    builder = ContextBuilder(max_tokens=10_000, min_overlap=20, count_tokens=approximate_tokens)
+
+    built = builder.build(chunks)
+
+    assert "(ID: a," in built.text and "(ID: b," in built.text and "(ID: c," not in built.text
+    assert built.text.count("w70 ") == 1
+    assert built.stats.chunks == 2 and built.stats.dropped_chunks == 1
+    assert built.stats.tokens_saved > 0
+
+
+def test_budget_keeps_highest_scores_first():
+    chunks = [
+        {"id": "low", "text": words(0, 50), "score": 0.2},
+        {"id": "high", "text": words(100, 150), "score": 0.9},
+    ]
+    entities = [{"name": "CS", "properties": [["type", "Department"]]}]
+    builder = ContextBuilder(max_tokens=120, count_tokens=approximate_tokens)
+
+    built = builder.build(chunks, entities)
+
+    assert built.text.startswith("--- Document Chunk (ID: high,")
+    assert "(ID: low," not in built.text
+    assert "Entity: CS" in built.text
+    assert built.stats.tokens <= 120
+
+
+def test_token_counter_loads_local_tokenizers_only(tmp_path, monkeypatch):
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    from src.llm.context_builder import get_token_counter
+
+    tokenizer = Tokenizer(WordLevel({"[UNK]": 0, "computer": 1, "science": 2}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    # The directory and the file both load without touching the Hub
+    assert get_token_counter(str(tmp_path))("computer science department") == 3
+    assert get_token_counter(str(tmp_path / "tokenizer.json"))("computer science") == 2
+
+    def no_downloads(*args, **kwargs):
+        raise AssertionError("tokenizer download attempted")
+
+    monkeypatch.setattr(Tokenizer, "from_pretrained", no_downloads)
+    assert get_token_counter("example-org/uncached-model") is approximate_tokens
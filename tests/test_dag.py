@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+from src.llm.dag import PipelineAborted, StageError, StageGraph
+
+
+def sleeper(value, delay=0.1):
+    async def stage(ctx):
+        await asyncio.sleep(delay)
+        return value
+    return stage
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph()
+    graph.add("a", sleeper("a"))
+    graph.add("b", sleeper("b"))
+    graph.add("c", lambda ctx: sleeper(ctx["a"] + ctx["b"], 0)(ctx), deps=["a", "b"])
+
+    start = time.perf_counter()
+    run = asyncio.run(graph.run())
+    elapsed = time.perf_counter() - start
+
+    assert run.results["c"] == "ab"
+    assert elapsed < 0.18
+    assert set(run.timings) == {"a", "b", "c"}
+
+
+def test_abort_cancels_running_stages():
+    cancelled = []
+
+    async def slow(ctx):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def reject(ctx):
+        raise PipelineAborted("rejected")
+
+    graph = StageGraph()
+    graph.add("slow", slow)
+    graph.add("gate", reject)
+
+    with pytest.raises(PipelineAborted) as info:
+        asyncio.run(graph.run())
+    assert info.value.result == "rejected"
+    assert cancelled == [True]
+
+
+def test_stage_errors_name_the_failing_stage():
+    async def boom(ctx):
+        raise RuntimeError("neo4j down")
+
+    graph = StageGraph()
+    graph.add("search", boom)
+    graph.add("format", sleeper("x", 0), deps=["search"])
+
+    with pytest.raises(StageError) as info:
+        asyncio.run(graph.run())
+    assert info.value.stage == "search"
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        StageGraph().add("b", sleeper("b"), deps=["a"])
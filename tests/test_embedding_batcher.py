@@ -0,0 +1,39 @@
+import asyncio
+
+from src.llm.embeddings import EmbeddingMicroBatcher
+
+
+def test_concurrent_queries_share_batches():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    batcher = EmbeddingMicroBatcher(embed_batch, max_batch_size=4, max_wait_ms=20)
+    batcher.batch_sizes.reset()
+
+    async def run():
+        questions = ["a", "bb", "ccc", "bb", "eeeee", "ffffff"]
+        return await asyncio.gather(*(batcher.embed(q) for q in questions))
+
+    vectors = asyncio.run(run())
+
+    assert vectors == [[1.0], [2.0], [3.0], [2.0], [5.0], [6.0]]
+    # A full batch of four (one duplicate) and the remaining two after the wait
+    assert calls == [["a", "bb", "ccc"], ["eeeee", "ffffff"]]
+    assert batcher.batch_sizes.count == 2
+    assert batcher.queue_wait.count >= 6
+
+
+def test_batch_errors_reach_every_caller():
+    def embed_batch(texts):
+        raise RuntimeError("model crashed")
+
+    batcher = EmbeddingMicroBatcher(embed_batch, max_batch_size=8, max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(batcher.embed("x"), batcher.embed("y"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
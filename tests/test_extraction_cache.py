@@ -0,0 +1,43 @@
+from src.llm.cache import DiskCache
+from src.llm.extraction_cache import ExtractionCache
+
+GRAPH = {
+    "nodes": [{"id": "dept::computer_science", "type": "Department", "name": "Computer Science", "properties": {}}],
+    "edges": [],
+}
+
+
+def test_extraction_cache_round_trip_and_invalidation(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / "extraction.sqlite"))
+    key = ("chunk text", "prompt v1", "vllm", "llama")
+
+    assert cache.get(*key) is None
+    cache.put(*key, GRAPH)
+    assert cache.get(*key) == GRAPH
+
+    # Any change to prompt, provider or model is a different entry
+    assert cache.get("chunk text", "prompt v2", "vllm", "llama") is None
+    assert cache.get("chunk text", "prompt v1", "gemini", "llama") is None
+    assert cache.get("chunk text", "prompt v1", "vllm", "mistral") is None
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"  # "b" is now least recently used
+    cache.set("c", b"3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert cache.stats().evictions == 1
+
+
+def test_disk_cache_prune_by_size(tmp_path):
+    cache = DiskCache(str(tmp_path / "size.sqlite"))
+    for i in range(10):
+        cache.set(f"k{i}", b"x" * 100)
+    removed = cache.prune(max_bytes=450)
+    assert removed == 6
+    assert cache.stats().total_bytes == 400
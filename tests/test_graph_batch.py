@@ -0,0 +1,56 @@
+from src.llm.graph_client import GraphManager
+
+
+class RecordingGraphManager(GraphManager):
+    """GraphManager that records statements instead of talking to Neo4j."""
+
+    def __init__(self):
+        self.statements = []
+
+    def _execute_write(self, statements):
+        self.statements.extend(statements)
+
+
+def make_chunk_data(dept_id):
+    return {
+        "nodes": [
+            {"id": dept_id, "type": "Department", "name": dept_id, "properties": {}},
+            {"id": "person::dr_usman_ghani", "type": "Person", "name": "Dr. Usman Ghani",
+             "properties": {"role": "Professor"}},
+        ],
+        "edges": [
+            {"source": dept_id, "target": "person::dr_usman_ghani", "type": "has faculty", "properties": {}},
+        ],
+    }
+
+
+def test_add_graph_batch_groups_by_label_and_type():
+    manager = RecordingGraphManager()
+    items = [
+        (make_chunk_data("dept::computer_science"), "chunk-1"),
+        (make_chunk_data("dept::computer_science"), "chunk-2"),
+        (make_chunk_data("dept::mathematics"), "chunk-3"),
+    ]
+
+    count = manager.add_graph_batch(items)
+
+    # One statement per label (Department, Person) and per type (HAS_FACULTY)
+    assert count == 3
+    by_query = {cypher: params["rows"] for cypher, params in manager.statements}
+    assert all("UNWIND $rows" in cypher for cypher in by_query)
+
+    person_rows = next(rows for cypher, rows in by_query.items() if "`Person`" in cypher)
+    assert len(person_rows) == 1
+    assert person_rows[0]["chunk_ids"] == ["chunk-1", "chunk-2", "chunk-3"]
+
+    dept_rows = next(rows for cypher, rows in by_query.items() if "`Department`" in cypher)
+    assert {row["id"] for row in dept_rows} == {"dept::computer_science", "dept::mathematics"}
+
+    edge_rows = next(rows for cypher, rows in by_query.items() if "`HAS_FACULTY`" in cypher)
+    assert len(edge_rows) == 3
+
+
+def test_add_graph_batch_skips_empty_items():
+    manager = RecordingGraphManager()
+    assert manager.add_graph_batch([(None, "chunk-1"), ({"nodes": [], "edges": []}, "chunk-2")]) == 0
+    assert manager.statements == []
@@ -0,0 +1,98 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from src.llm.guardrail import DepartmentGuardrail, EmbeddingGuardrailClassifier
+
+
+class FakeEmbeddings:
+    """Embeds by keyword so scores are predictable."""
+
+    def embed_query(self, text):
+        text = text.lower()
+        return [float("department" in text or "program" in text), float("weather" in text), 0.1]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+class CountingLLM(FakeListChatModel):
+    calls: int = 0
+
+    def with_structured_output(self, schema):
+        def fail(_):
+            self.calls += 1
+            raise RuntimeError("LLM unavailable")
+        return RunnableLambda(fail)
+
+
+def make_guardrail():
+    classifier = EmbeddingGuardrailClassifier(
+        FakeEmbeddings(),
+        in_scope=["Which programs does the CS department offer?", "Department of EE programs"],
+        out_of_scope=["What is the weather today?", "Weather in Lahore"],
+        top_k=1,
+    )
+    llm = CountingLLM(responses=["unused"])
+    return DepartmentGuardrail(llm=llm, classifier=classifier, allow_threshold=0.1, reject_threshold=-0.1), llm
+
+
+def test_confident_scores_skip_llm_and_are_cached():
+    guardrail, llm = make_guardrail()
+
+    assert guardrail.check("Tell me about the Civil department").is_allowed
+    assert not asyncio.run(guardrail.acheck("Will the weather be nice?")).is_allowed
+    assert guardrail.check("tell me about the civil department").is_allowed
+    assert llm.calls == 0
+    assert guardrail.decisions.hits == 1
+
+
+def test_ambiguous_score_goes_to_llm_and_falls_back():
+    guardrail, llm = make_guardrail()
+
+    result = asyncio.run(guardrail.acheck("Who is the vice chancellor?"))
+    assert llm.calls == 1
+    assert result.is_allowed
+    # Failed LLM checks are not cached
+    guardrail.check("Who is the vice chancellor?")
+    assert llm.calls == 2
+
+
+def test_batch_scores_locally_and_sends_only_ambiguous_questions_once():
+    guardrail, llm = make_guardrail()
+    questions = [
+        "Which programs does the Civil department offer?",
+        "Weather tomorrow?",
+        "Who is the vice chancellor?",
+        "who is the vice chancellor",
+    ]
+
+    results = asyncio.run(guardrail.acheck_batch(questions))
+
+    assert [r.is_allowed for r in results] == [True, False, True, True]
+    # Both spellings of the ambiguous question share one (failed) LLM call
+    assert llm.calls == 1
+    assert guardrail.classifier.score_batch([[1.0, 0.0, 0.1]])[0] == guardrail.classifier.score([1.0, 0.0, 0.1])
+
+
+def test_async_checks_embed_off_the_event_loop():
+    import threading
+
+    guardrail, _ = make_guardrail()
+    embedding_model = guardrail.classifier.embedding_model
+    threads = []
+    embed_query, embed_documents = embedding_model.embed_query, embedding_model.embed_documents
+
+    def recording(embed):
+        def call(arg):
+            threads.append(threading.current_thread().name)
+            return embed(arg)
+        return call
+
+    embedding_model.embed_query = recording(embed_query)
+    embedding_model.embed_documents = recording(embed_documents)
+
+    assert asyncio.run(guardrail.acheck("Tell me about the Civil department")).is_allowed
+    assert not asyncio.run(guardrail.acheck_batch(["Weather tomorrow?"]))[0].is_allowed
+    assert threads and all(name.startswith("embed") for name in threads)
@@ -0,0 +1,131 @@
+from langchain_core.documents import Document
+
+import src.ingestion.pipeline as pipeline_module
+from src.ingestion.pipeline import IngestionPipeline, chunk_id, document_id
+
+
+class FakeGraphManager:
+    """In-memory stand-in for the parts of GraphManager the pipeline uses."""
+
+    def __init__(self):
+        self.chunks = {}
+        self.manifests = {}
+        self.sources = {}
+        self.mentions = {}
+        self.version = 0
+
+    def create_chunk_constraint(self):
+        pass
+
+    def create_vector_index(self):
+        pass
+
+    def add_chunks(self, chunks):
+        for c in chunks:
+            self.chunks[c["id"]] = c["doc_id"]
+
+    def add_graph_batch(self, items):
+        for data, cid in items:
+            for node in data["nodes"]:
+                self.mentions.setdefault(node["id"], set()).add(cid)
+        return len(items)
+
+    def bump_graph_version(self):
+        self.version += 1
+        return self.version
+
+    def get_document_manifest(self, doc_id):
+        return set(self.manifests.get(doc_id, []))
+
+    def get_document_source(self, doc_id):
+        return self.sources.get(doc_id)
+
+    def set_document_manifest(self, doc_id, source, chunk_ids):
+        self.manifests[doc_id] = list(chunk_ids)
+        self.sources[doc_id] = source
+
+    def get_document_chunk_ids(self, doc_id):
+        return {cid for cid, d in self.chunks.items() if d == doc_id}
+
+    def delete_chunks(self, chunk_ids):
+        for cid in chunk_ids:
+            del self.chunks[cid]
+        orphans = []
+        for entity, linked in self.mentions.items():
+            linked.difference_update(chunk_ids)
+            if not linked:
+                orphans.append(entity)
+        for entity in orphans:
+            del self.mentions[entity]
+        return len(chunk_ids), len(orphans)
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[0.0, 1.0] for _ in texts]
+
+
+def run_ingest(monkeypatch, manager, pages, calls, path="data/files/prospectus.pdf", doc_id=None):
+    class FakeLoader:
+        def __init__(self, path):
+            pass
+
+        def lazy_load(self):
+            return [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(pages)]
+
+    def fake_extract(text, **kwargs):
+        calls.append(text)
+        entity = "entity::" + text.split()[0]
+        return {"nodes": [{"id": entity, "type": "Entity", "name": entity, "properties": {}}], "edges": []}
+
+    monkeypatch.setattr(pipeline_module, "StreamingPDFLoader", FakeLoader)
+    monkeypatch.setattr(pipeline_module, "extract_graph_from_text", fake_extract)
+    pipeline = IngestionPipeline(graph_manager=manager, embedding_model=FakeEmbeddings(), requests_per_minute=0)
+    return pipeline.run(path, doc_id=doc_id)
+
+
+def test_chunk_ids_are_deterministic():
+    doc = document_id("data/files/UET lahore Document.pdf")
+    assert doc == "doc::uet_lahore_document"
+    assert chunk_id(doc, "text") == chunk_id(doc, "text")
+    assert chunk_id(doc, "text") != chunk_id(doc, "text", occurrence=1)
+    assert chunk_id(doc, "text") != chunk_id("doc::other", "text")
+
+
+def test_incremental_reingest_only_processes_changes(monkeypatch):
+    manager = FakeGraphManager()
+    calls = []
+
+    stats = run_ingest(monkeypatch, manager, ["alpha page", "beta page", "gamma page"], calls)
+    assert stats.chunks == 3 and len(calls) == 3
+
+    calls.clear()
+    stats = run_ingest(monkeypatch, manager, ["alpha page", "beta page", "gamma page"], calls)
+    assert calls == []
+    assert stats.unchanged == 3
+    assert manager.version == 1  # nothing changed, so no new graph version
+
+    calls.clear()
+    stats = run_ingest(monkeypatch, manager, ["alpha page", "delta page", "gamma page"], calls)
+    assert calls == ["delta page"]
+    assert stats.removed_chunks == 1
+    assert stats.removed_entities == 1
+    assert "entity::beta" not in manager.mentions
+    assert len(manager.manifests["doc::prospectus"]) == 3
+
+
+def test_same_file_name_in_another_directory_is_refused(monkeypatch):
+    import pytest
+
+    manager = FakeGraphManager()
+    run_ingest(monkeypatch, manager, ["alpha page"], [])
+
+    # Same derived id, different file: syncing would delete the first one's chunks
+    with pytest.raises(ValueError, match="doc::prospectus"):
+        run_ingest(monkeypatch, manager, ["other page"], [], path="archive/prospectus.pdf")
+    assert len(manager.chunks) == 1
+
+    stats = run_ingest(monkeypatch, manager, ["other page"], [], path="archive/prospectus.pdf",
+                       doc_id="doc::prospectus_archive")
+    assert stats.removed_chunks == 0
+    assert len(manager.chunks) == 2
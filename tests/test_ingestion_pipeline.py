@@ -0,0 +1,124 @@
+import threading
+import time
+
+from langchain_core.documents import Document
+
+import src.ingestion.pipeline as pipeline_module
+from src.ingestion.pipeline import IngestionPipeline
+from benchmarks.fakes import HashingEmbeddings, InMemoryGraph
+
+
+class RecordingGraph(InMemoryGraph):
+    def __init__(self):
+        super().__init__()
+        self.chunk_batches = []
+        self.graph_batches = []
+
+    def add_chunks(self, chunks):
+        self.chunk_batches.append([c["text"] for c in chunks])
+        super().add_chunks(chunks)
+
+    def add_graph_batch(self, items):
+        self.graph_batches.append(len(items))
+        return super().add_graph_batch(items)
+
+
+class FailingEmbeddings(HashingEmbeddings):
+    def embed_documents(self, texts):
+        if any("poison" in text for text in texts):
+            raise RuntimeError("embedding server down")
+        return super().embed_documents(texts)
+
+
+def pages(n):
+    return [f"page {i} text" for i in range(n)]
+
+
+def patch_stages(monkeypatch, texts, extract, pulled=None):
+    class FakeLoader:
+        def __init__(self, path):
+            pass
+
+        def lazy_load(self):
+            for i, text in enumerate(texts):
+                if pulled is not None:
+                    pulled.append(i)
+                yield Document(page_content=text, metadata={"page": i})
+
+    monkeypatch.setattr(pipeline_module, "StreamingPDFLoader", FakeLoader)
+    monkeypatch.setattr(pipeline_module, "extract_graph_from_text", extract)
+
+
+def entity_of(text, **kwargs):
+    entity = "entity::" + text.replace(" ", "_")
+    return {"nodes": [{"id": entity, "type": "Entity", "name": text, "properties": {}}], "edges": []}
+
+
+def make_pipeline(graph, embeddings=None, **kwargs):
+    return IngestionPipeline(graph_manager=graph, embedding_model=embeddings or HashingEmbeddings(),
+                             requests_per_minute=0, pack_extraction=False, **kwargs)
+
+
+def test_chunks_keep_page_order_and_are_written_in_batches(monkeypatch):
+    texts = pages(23)
+    patch_stages(monkeypatch, texts, entity_of)
+    graph = RecordingGraph()
+
+    stats = make_pipeline(graph, embedding_batch_size=5, write_batch_size=4, max_in_flight=3).run("doc.pdf")
+
+    assert (stats.pages, stats.chunks, stats.embedded, stats.extracted, stats.failed) == (23, 23, 23, 23, 0)
+    # The single embedder keeps page order; batches never exceed their size
+    assert [text for batch in graph.chunk_batches for text in batch] == texts
+    assert all(len(batch) <= 5 for batch in graph.chunk_batches)
+    assert all(size <= 4 for size in graph.graph_batches) and sum(graph.graph_batches) == 23
+    assert stats.graph_writes == len(graph.graph_batches)
+    assert len(graph.nodes) == 23
+
+
+def test_failures_are_counted_and_retried_next_run(monkeypatch):
+    texts = pages(6) + ["poison page"]
+
+    def extract(text, **kwargs):
+        if text == "page 3 text":
+            raise RuntimeError("model overloaded")
+        return entity_of(text)
+
+    patch_stages(monkeypatch, texts, extract)
+    graph = RecordingGraph()
+    # Batches of one, so only the poisoned chunk's embedding batch fails
+    stats = make_pipeline(graph, FailingEmbeddings(), embedding_batch_size=1).run("doc.pdf")
+
+    assert stats.failed == 2 and len(stats.errors) == 2
+    assert any("Extraction failed" in e for e in stats.errors)
+    assert any("Embedding batch of 1 failed" in e for e in stats.errors)
+    (manifest,) = [doc["manifest"] for doc in graph.documents.values() if "manifest" in doc]
+    assert len(manifest) == 5
+
+    # Failed chunks stay out of the manifest, so only they are processed again
+    patch_stages(monkeypatch, texts, entity_of)
+    stats = make_pipeline(graph, embedding_batch_size=1).run("doc.pdf")
+    assert (stats.unchanged, stats.embedded, stats.extracted, stats.failed) == (5, 2, 2, 0)
+
+
+def test_bounded_queues_hold_back_the_chunker(monkeypatch):
+    release = threading.Event()
+    pulled = []
+
+    def blocked_extract(text, **kwargs):
+        release.wait(5)
+        return entity_of(text)
+
+    patch_stages(monkeypatch, pages(50), blocked_extract, pulled=pulled)
+    pipeline = make_pipeline(RecordingGraph(), embedding_batch_size=1, write_batch_size=1,
+                             queue_size=1, max_in_flight=1)
+    runner = threading.Thread(target=pipeline.run, args=("doc.pdf",))
+    runner.start()
+    time.sleep(0.5)
+
+    # One chunk in extraction, one waiting for a slot, and at most one held
+    # by or queued before each upstream stage
+    assert len(pulled) <= 6
+    release.set()
+    runner.join(10)
+    assert not runner.is_alive()
+    assert len(pulled) == 50 and pipeline.stats.extracted == 50
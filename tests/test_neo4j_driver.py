@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from neo4j import READ_ACCESS, WRITE_ACCESS
+
+from src.llm import neo4j_driver
+from src.llm.neo4j_driver import READ, WRITE, _PoolTracker
+
+
+class Record:
+    def __init__(self, data):
+        self._data = data
+
+    def data(self):
+        return self._data
+
+
+class FakeSession:
+    def __init__(self, driver, access_mode):
+        self.driver = driver
+        self.access_mode = access_mode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeDriver:
+    """Records how sessions and queries are routed."""
+
+    execute_query_bookmark_manager = object()
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.routes = []
+        self.sessions = []
+
+    def execute_query(self, cypher, params, database_=None, routing_=None):
+        self.routes.append(routing_)
+        if self.fail:
+            raise ConnectionError("Neo4j unavailable")
+        return [Record({"n": 1})], None, None
+
+    def session(self, database=None, default_access_mode=None, bookmark_manager=None):
+        assert bookmark_manager is self.execute_query_bookmark_manager
+        self.sessions.append(default_access_mode)
+        return FakeSession(self, default_access_mode)
+
+
+class FakeAsyncDriver(FakeDriver):
+    async def execute_query(self, cypher, params, database_=None, routing_=None):
+        return FakeDriver.execute_query(self, cypher, params, database_=database_, routing_=routing_)
+
+
+@pytest.fixture
+def drivers(monkeypatch):
+    sync, async_ = FakeDriver(), FakeAsyncDriver()
+    trackers = {"sync": _PoolTracker(max_size=4), "async": _PoolTracker(max_size=2)}
+    monkeypatch.setattr(neo4j_driver, "_trackers", trackers)
+    monkeypatch.setattr(neo4j_driver, "get_driver", lambda: sync)
+    monkeypatch.setattr(neo4j_driver, "get_async_driver", lambda: async_)
+    return sync, async_
+
+
+def test_queries_and_sessions_are_routed(drivers):
+    sync, async_ = drivers
+    assert neo4j_driver.run_query("RETURN 1", access=READ) == [{"n": 1}]
+    neo4j_driver.run_query("CREATE ()")
+    assert sync.routes == [READ, WRITE]
+
+    with neo4j_driver.session(READ) as s:
+        assert s.access_mode == READ_ACCESS
+    with neo4j_driver.session() as s:
+        assert s.access_mode == WRITE_ACCESS
+
+    async def run():
+        await neo4j_driver.arun_query("RETURN 1")
+        async with neo4j_driver.async_session(WRITE) as s:
+            return s.access_mode
+
+    assert asyncio.run(run()) == WRITE_ACCESS
+    # The async request path reads by default
+    assert async_.routes == [READ]
+
+
+def test_tracker_counts_success_and_failure(drivers):
+    sync, _ = drivers
+    with neo4j_driver.session(READ):
+        with neo4j_driver.session(READ):
+            assert neo4j_driver.pool_metrics()["sync"]["in_flight"] == 2
+    neo4j_driver.run_query("RETURN 1")
+
+    sync.fail = True
+    with pytest.raises(ConnectionError):
+        neo4j_driver.run_query("RETURN 1")
+    with pytest.raises(ValueError):
+        with neo4j_driver.session():
+            raise ValueError("bad row")
+
+    metrics = neo4j_driver.pool_metrics()["sync"]
+    assert (metrics["in_flight"], metrics["peak_in_flight"]) == (0, 2)
+    assert (metrics["operations"], metrics["failures"]) == (5, 2)
+    assert metrics["max_size"] == 4 and metrics["demand"] == 0.0
+    assert metrics["busy_seconds"] > 0
+
+
+def test_pool_metrics_per_driver(drivers):
+    async def run():
+        async with neo4j_driver.async_session():
+            return neo4j_driver.pool_metrics()
+
+    metrics = asyncio.run(run())
+    assert set(metrics) == {"sync", "async"}
+    assert metrics["async"]["in_flight"] == 1 and metrics["async"]["demand"] == 0.5
+    assert neo4j_driver.pool_metrics()["async"]["in_flight"] == 0
@@ -0,0 +1,59 @@
+from langchain_core.runnables import RunnableLambda
+
+from src.llm import extractor
+from src.llm.extractor import PackPlanner, extract_graphs_from_texts
+from src.prompt_engineering.extraction import ChunkGraphData, PackedGraphData
+from benchmarks.fakes import FakeChatModel
+
+TEXTS = ["Department of Computer Science offers programs.", "Dr Usman Ghani is a Professor.",
+         "Lahore Campus hosts the Library.", "Electrical Engineering Department."]
+
+
+def test_planner_fits_context_and_adapts():
+    planner = PackPlanner(context_tokens=1000, prompt_tokens=200, output_tokens_per_chunk=100, max_chunks=8)
+    # 8 chunks of ~100 tokens (with their header) plus 100 output tokens each: four fit in 800 tokens
+    assert planner.plan(["x" * 380] * 8) == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    planner.record(False)
+    assert planner.limit == 4
+    assert planner.plan(["x"] * 6) == [[0, 1, 2, 3], [4, 5]]
+    planner.record(True)
+    assert planner.limit == 5
+
+
+def test_packed_extraction_keeps_chunks_apart(monkeypatch):
+    monkeypatch.setattr(extractor, "get_llm_client", lambda provider=None: FakeChatModel())
+    monkeypatch.setattr(extractor, "_planners", {})
+    single = [extractor.extract_graph_from_text(text, use_cache=False) for text in TEXTS]
+    assert extract_graphs_from_texts(TEXTS, use_cache=False) == single
+
+
+def test_incomplete_packed_response_falls_back_to_single_chunks(monkeypatch):
+    monkeypatch.setattr(extractor, "get_llm_client", lambda provider=None: FakeChatModel())
+    monkeypatch.setattr(extractor, "_planners", {})
+    singles = []
+    extract_one = extractor.extract_graph_from_text
+
+    def extract_graph_from_text(text, **kwargs):
+        singles.append(text)
+        return extract_one(text, **kwargs)
+
+    # The model only answers for the first chunk
+    partial = RunnableLambda(lambda _: PackedGraphData(chunks=[ChunkGraphData(chunk=1, nodes=[], edges=[])]))
+    monkeypatch.setattr(extractor, "get_packed_extraction_chain", lambda: partial)
+    monkeypatch.setattr(extractor, "extract_graph_from_text", extract_graph_from_text)
+
+    results = extract_graphs_from_texts(TEXTS, use_cache=False)
+    assert results[0] == {"nodes": [], "edges": []}
+    assert singles == TEXTS[1:]
+    assert all(result["nodes"] for result in results[1:])
+
+    # A response that fails validation sends every chunk of the pack alone
+    def invalid(_):
+        raise ValueError("not a PackedGraphData")
+
+    singles.clear()
+    monkeypatch.setattr(extractor, "get_packed_extraction_chain", lambda: RunnableLambda(invalid))
+    results = extract_graphs_from_texts(TEXTS[:2], use_cache=False)
+    assert singles == TEXTS[:2]
+    assert not any(isinstance(result, Exception) for result in results)
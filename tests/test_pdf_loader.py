@@ -0,0 +1,49 @@
+import pytest
+
+from src.ingestion import pdf_loader
+from src.ingestion.pdf_loader import PDFTextCache, StreamingPDFLoader, file_hash
+
+PDF = "data/files/UET lahore Document.pdf"
+
+
+def loader(cache=None, **kwargs):
+    instance = StreamingPDFLoader(PDF, use_cache=False, **kwargs)
+    instance.cache = cache
+    return instance
+
+
+def test_parallel_parsing_streams_pages_in_order():
+    serial = loader(workers=1).load()
+    parallel = loader(workers=2, pages_per_task=8).load()
+
+    assert [d.metadata["page"] for d in parallel] == list(range(len(serial)))
+    assert [d.page_content for d in parallel] == [d.page_content for d in serial]
+    assert parallel[0].metadata["total_pages"] == len(serial)
+
+
+def test_cached_pages_are_not_parsed_again(tmp_path, monkeypatch):
+    cache = PDFTextCache(path=str(tmp_path / "pdf_text.sqlite"))
+    first = loader(cache, workers=1, pages_per_task=4).load()
+
+    digest = file_hash(PDF)
+    # Drop two pages: only those are parsed on the next run, as one range
+    cache.store.delete(PDFTextCache.key(digest, 5))
+    cache.store.delete(PDFTextCache.key(digest, 6))
+    assert loader(cache, pages_per_task=4)._uncached_ranges(digest, len(first)) == [(5, 7)]
+
+    parsed = []
+    parse_pages = pdf_loader.parse_pages
+
+    def counting_parse(path, start, end):
+        parsed.append((start, end))
+        return parse_pages(path, start, end)
+
+    monkeypatch.setattr(pdf_loader, "parse_pages", counting_parse)
+    second = loader(cache, workers=1, pages_per_task=4).load()
+    assert parsed == [(5, 7)]
+    assert [d.page_content for d in second] == [d.page_content for d in first]
+
+
+@pytest.mark.parametrize("pages_per_task, expected", [(8, [(0, 8), (8, 10)]), (20, [(0, 10)])])
+def test_uncached_ranges_split_by_task_size(pages_per_task, expected):
+    assert loader(pages_per_task=pages_per_task)._uncached_ranges(None, 10) == expected
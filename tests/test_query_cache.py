@@ -0,0 +1,78 @@
+from config.settings import settings
+from src.llm.cache import LRUCache, load_questions, normalize_question
+from src.llm.embeddings import QueryEmbeddingCache
+from src.llm.hybrid_search import HybridRetriever
+
+
+class CountingEmbeddings:
+    model_name = "test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_normalize_question():
+    assert normalize_question("  What is   CS? ") == normalize_question("what is cs")
+    assert normalize_question("What is CS?!") == "what is cs"
+
+
+def test_lru_cache_counts_and_evicts():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_retriever_skips_model_for_repeated_questions():
+    model = CountingEmbeddings()
+    retriever = HybridRetriever(graph_manager=None, embedding_model=model,
+                                query_cache=QueryEmbeddingCache("test-model", max_size=16))
+
+    first = retriever.embed_query("What programs does the CS department offer?")
+    again = retriever.embed_query("what programs does the cs department offer")
+
+    assert first == again
+    assert model.calls == 1
+    assert (retriever.query_cache.hits, retriever.query_cache.misses) == (1, 1)
+
+
+def test_persistent_tier_survives_restart_and_warms(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    model = CountingEmbeddings()
+    retriever = HybridRetriever(None, model, QueryEmbeddingCache("test-model", persistent_path=path))
+    assert retriever.warm_query_cache(["Who is the head of EE?", "who is the head of ee", "Where is CRP?"]) == 2
+    assert model.calls == 1  # one batched call
+
+    restarted = HybridRetriever(None, model, QueryEmbeddingCache("test-model", persistent_path=path))
+    assert restarted.embed_query("Where is CRP?") == [float(len("Where is CRP?")), 1.0]
+    assert model.calls == 1
+
+    # A different model must not reuse the stored vectors
+    other = HybridRetriever(None, model, QueryEmbeddingCache("other-model", persistent_path=path))
+    other.embed_query("Where is CRP?")
+    assert model.calls == 2
+
+
+def test_warm_up_reads_only_the_tail_of_the_question_log(tmp_path, monkeypatch):
+    log = tmp_path / "questions.log"
+    log.write_text("".join(f"question {i}\n" for i in range(1000)) + "\n", encoding="utf-8")
+    assert load_questions(str(log), limit=3) == ["question 997", "question 998", "question 999"]
+
+    monkeypatch.setattr(settings.general.retrieval.query_cache, "warm_limit", 5)
+    model = CountingEmbeddings()
+    retriever = HybridRetriever(None, model, QueryEmbeddingCache("test-model", question_log=str(log)))
+    assert retriever.warm_query_cache() == 5
+    assert retriever.query_cache.contains("question 995")
+    assert not retriever.query_cache.contains("question 994")
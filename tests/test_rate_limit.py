@@ -0,0 +1,69 @@
+import threading
+
+from src.llm import rate_limit
+from src.llm.rate_limit import RateLimiter, get_rate_limiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_requests_are_spaced_evenly(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    limiter = RateLimiter(requests_per_minute=60)
+
+    # A burst claims consecutive one-second slots
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 1.0, 2.0]
+    # After an idle period the next request goes out at once
+    clock.now += 10
+    assert limiter.reserve() == 0.0
+
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == [1.0, 1.0]
+
+
+def test_zero_disables_limiting(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    limiter = RateLimiter(0)
+    for _ in range(100):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+
+def test_threads_share_slots(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    limiter = RateLimiter(requests_per_minute=600)
+    delays = []
+    lock = threading.Lock()
+
+    def claim():
+        delay = limiter.reserve()
+        with lock:
+            delays.append(round(delay, 6))
+
+    threads = [threading.Thread(target=claim) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Every thread got its own 0.1 s slot
+    assert sorted(delays) == [round(0.1 * i, 6) for i in range(20)]
+
+
+def test_limiters_are_shared_per_provider(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    assert get_rate_limiter("gemini") is get_rate_limiter("gemini")
+    assert get_rate_limiter("gemini") is not get_rate_limiter("vllm")
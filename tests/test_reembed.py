@@ -0,0 +1,81 @@
+from config.settings import settings
+from src.llm.embeddings import EmbeddingService
+from src.llm.graph_client import CHUNK_PAGE_QUERY, MISSING_CHUNK_PAGE_QUERY, GraphManager
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class PagingGraphManager(GraphManager):
+    """Answers the keyset page queries from a dict and records writes."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks  # id -> {"text", "embedding"}
+        self.pages = []
+        self.statements = []
+        self.version = 0
+
+    def read(self, cypher, params=None):
+        assert cypher in (CHUNK_PAGE_QUERY, MISSING_CHUNK_PAGE_QUERY)
+        self.pages.append(params["after_id"])
+        rows = [
+            {"id": cid, "text": chunk["text"]}
+            for cid, chunk in sorted(self.chunks.items())
+            if cid > params["after_id"] and (cypher == CHUNK_PAGE_QUERY or chunk.get("embedding") is None)
+        ]
+        return rows[:params["limit"]]
+
+    def _execute_write(self, statements):
+        for cypher, params in statements:
+            assert cypher.strip().startswith("UNWIND $rows")
+            for row in params["rows"]:
+                self.chunks[row["id"]]["embedding"] = row["embedding"]
+        self.statements.extend(statements)
+
+    def bump_graph_version(self):
+        self.version += 1
+        return self.version
+
+
+def make_chunks():
+    chunks = {f"c{i:02d}": {"text": f"chunk {i}"} for i in range(7)}
+    chunks["c03"]["embedding"] = [0.0, 0.0]
+    chunks["c05"]["text"] = ""
+    return chunks
+
+
+def test_reembed_walks_pages_and_writes_in_batches(monkeypatch):
+    monkeypatch.setattr(settings.general.graph, "write_batch_size", 2)
+    graph = PagingGraphManager(make_chunks())
+    embeddings = FakeEmbeddings()
+    progress = []
+
+    stats = EmbeddingService(embeddings, batch_size=3).reembed(
+        graph, only_missing=True, page_size=3, on_progress=lambda s: progress.append(s.processed))
+
+    # Each page starts after the last id of the previous one; c03 is already embedded
+    assert graph.pages == ["", "c02", "c06"]
+    assert (stats.processed, stats.skipped) == (5, 1)
+    assert progress == [3, 5]
+    assert embeddings.batches == [3, 2]
+    # One UNWIND statement per write batch of at most two rows
+    assert [len(params["rows"]) for _, params in graph.statements] == [2, 1, 2]
+    assert graph.chunks["c00"]["embedding"] == [7.0, 1.0]
+    assert graph.chunks["c03"]["embedding"] == [0.0, 0.0]
+    assert "embedding" not in graph.chunks["c05"]
+    assert graph.version == 1
+
+
+def test_reembed_all_rewrites_existing_vectors():
+    graph = PagingGraphManager(make_chunks())
+    stats = EmbeddingService(FakeEmbeddings()).reembed(graph, only_missing=False, page_size=4)
+
+    assert graph.pages == ["", "c03", "c06"]
+    assert stats.processed == 6
+    assert graph.chunks["c03"]["embedding"] == [7.0, 1.0]
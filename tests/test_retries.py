@@ -1,32 +1,170 @@
-import sys
-import os
-import time
+import asyncio
+from types import SimpleNamespace
 
-# Add src to path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from langchain_core.runnables import RunnableLambda
 
+from src.llm.resilience import (CircuitBreaker, CircuitOpenError, Resilience, ResilientRunnable, RetryBudget,
+                                is_retryable, retry_after)
 from src.llm.utils import retry_with_backoff
 
-@retry_with_backoff(retries=2, initial_delay=0.1, backoff_factor=2)
-def failing_function(context):
-    print(f"  Executing function for attempt {context['attempts'] + 1}...")
-    context['attempts'] += 1
-    if context['attempts'] < 3:
-        raise ValueError("Simulated transient error")
-    return "Success!"
-
-def test_retries():
-    print("Testing retry mechanism...")
-    context = {'attempts': 0}
-    try:
-        result = failing_function(context)
-        print(f"Final Result: {result}")
-        if context['attempts'] == 3:
-            print("SUCCESS: Function retried 2 times and succeeded on the 3rd attempt.")
-        else:
-            print(f"FAILURE: Expected 3 attempts, got {context['attempts']}")
-    except Exception as e:
-        print(f"Final Error: {e}")
-
-if __name__ == "__main__":
-    test_retries()
+
+class ProviderError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def flaky(failures, error=ConnectionError("connection reset")):
+    """Callable that raises `error` for its first `failures` calls."""
+    calls = {"n": 0}
+
+    def call(*_):
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise error
+        return "ok"
+
+    return call, calls
+
+
+def fast_resilience(**kwargs):
+    return Resilience("test", initial_delay=0.001, max_delay=0.01, **kwargs)
+
+
+def test_retry_decorator_retries_transient_errors():
+    call, calls = flaky(2)
+    assert retry_with_backoff(retries=2, initial_delay=0.01)(call)() == "ok"
+    assert calls["n"] == 3
+
+
+def test_retry_decorator_does_not_retry_permanent_errors():
+    call, calls = flaky(1, ValueError("schema mismatch"))
+    with pytest.raises(ValueError):
+        retry_with_backoff(retries=2, initial_delay=0.01)(call)()
+    assert calls["n"] == 1
+
+
+def test_retry_decorator_async():
+    calls = {"n": 0}
+
+    @retry_with_backoff(retries=2, initial_delay=0.01)
+    async def call():
+        calls["n"] += 1
+        if calls["n"] < 3:
+            raise TimeoutError()
+        return "ok"
+
+    assert asyncio.run(call()) == "ok"
+    assert calls["n"] == 3
+
+
+def test_error_classification():
+    assert is_retryable(ProviderError(429))
+    assert is_retryable(ProviderError(503))
+    assert not is_retryable(ProviderError(400))
+    assert not is_retryable(ValueError("bad output"))
+    assert is_retryable(type("ResourceExhausted", (Exception,), {})())
+    assert retry_after(ProviderError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after(ProviderError(429)) is None
+
+
+def test_retry_after_hint_is_honoured_or_fails_fast():
+    resilience = fast_resilience(max_retry_after=0.05)
+    call, calls = flaky(1, ProviderError(429, {"Retry-After": "0.02"}))
+    assert resilience.call(call) == "ok"
+    assert calls["n"] == 2
+
+    call, calls = flaky(1, ProviderError(429, {"Retry-After": "120"}))
+    with pytest.raises(ProviderError):
+        resilience.call(call)
+    assert calls["n"] == 1
+
+
+def test_async_calls_retry():
+    resilience = fast_resilience()
+    call, calls = flaky(2)
+
+    async def acall(*args):
+        return call(*args)
+
+    assert asyncio.run(resilience.acall(acall)) == "ok"
+    assert calls["n"] == 3
+
+
+def test_budget_limits_retries():
+    resilience = fast_resilience(max_attempts=5, budget=RetryBudget(ratio=0.0, burst=1.0),
+                                 breaker=CircuitBreaker("test", failure_threshold=100))
+    call, calls = flaky(10)
+    with pytest.raises(ConnectionError):
+        resilience.call(call)
+    # One retry paid for by the burst allowance, then the budget is empty
+    assert calls["n"] == 2
+
+
+def test_circuit_opens_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    resilience = fast_resilience(max_attempts=1, breaker=breaker)
+    call, calls = flaky(10)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            resilience.call(call)
+
+    with pytest.raises(CircuitOpenError):
+        resilience.call(call)
+    assert calls["n"] == 2
+
+    # After the reset timeout one trial call goes through and closes the circuit
+    breaker.reset_timeout = 0
+    calls["n"] = 10
+    assert resilience.call(call) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_resilient_runnable_retries_invoke_and_stream():
+    call, calls = flaky(1)
+    runnable = ResilientRunnable(RunnableLambda(call), fast_resilience())
+    assert runnable.invoke("x") == "ok"
+    assert list(runnable.stream("x")) == ["ok"]
+    assert calls["n"] == 3
+
+
+def test_cancelled_half_open_trial_frees_the_slot():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    resilience = fast_resilience(max_attempts=1, breaker=breaker)
+
+    async def down():
+        raise ConnectionError("down")
+
+    async def ok():
+        return "ok"
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await resilience.acall(down)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        # The trial call is cancelled before it finishes
+        trial = asyncio.create_task(resilience.acall(asyncio.sleep, 10))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        return await resilience.acall(ok)
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_closed_stream_frees_the_half_open_slot():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    runnable = ResilientRunnable(RunnableLambda(lambda _: iter(["a", "b"])), fast_resilience(breaker=breaker))
+
+    stream = runnable.stream("x")
+    next(stream)
+    stream.close()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert runnable.invoke("x") is not None
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,141 @@
+import asyncio
+
+from src.llm.hybrid_search import LOCAL_RETRIEVAL_QUERY, RETRIEVAL_QUERY, HybridRetriever, build_expansion_query
+
+
+class FakeEmbeddings:
+    model_name = "fake"
+
+    def embed_query(self, text):
+        return [0.1, 0.2]
+
+
+class FakeGraphManager:
+    def __init__(self, records, facts=None):
+        self.records = records
+        self.facts = facts or []
+        self.queries = []
+
+    async def aquery(self, cypher, params=None):
+        self.queries.append((cypher, params))
+        if cypher in (RETRIEVAL_QUERY, LOCAL_RETRIEVAL_QUERY):
+            return self.records
+        return [{"facts": self.facts}]
+
+
+def test_single_round_trip_with_projected_entities():
+    records = [{
+        "chunks": [{"id": "c1", "text": "CS offers BSc", "score": 0.91}],
+        "entities": [{"name": "Computer Science", "properties": [["type", "Department"]]}],
+    }]
+    graph_manager = FakeGraphManager(records)
+    retriever = HybridRetriever(graph_manager, FakeEmbeddings())
+    retriever.expansion_query = None
+
+    context = asyncio.run(retriever.asearch("What does CS offer?", top_k=3))
+
+    assert len(graph_manager.queries) == 1
+    cypher, params = graph_manager.queries[0]
+    assert cypher == RETRIEVAL_QUERY
+    assert params["k"] == 3 and params["properties"] == retriever.entity_properties
+    assert "(ID: c1, Score: 0.91)" in context
+    assert "Entity: Computer Science | Details: type: Department" in context
+
+
+def test_entity_projection_keeps_type_and_tolerates_lists():
+    from benchmarks.fakes import HashingEmbeddings, InMemoryGraph
+
+    embeddings = HashingEmbeddings()
+    graph = InMemoryGraph()
+    text = "Dr. Ali chairs Computer Science"
+    graph.add_chunks([{"id": "c1", "text": text, "embedding": embeddings.embed_query(text)}])
+    graph.add_graph_batch([({"nodes": [{
+        "id": "person::ali", "type": "Person", "name": "Dr. Ali",
+        # Extraction may store lists; the label carries the entity type
+        "properties": {"title": "Chairman", "program": ["BSc CS", "MSc CS"], "type": "stale"},
+    }], "edges": []}, "c1")])
+    retriever = HybridRetriever(graph, embeddings)
+    retriever.expansion_query = None
+
+    chunks, entities = asyncio.run(retriever.aretrieve(embeddings.embed_query("Who chairs CS?")))
+
+    assert [c["id"] for c in chunks] == ["c1"]
+    assert entities == [{"name": "Dr. Ali", "properties": [
+        ["type", "Person"], ["title", "Chairman"], ["program", "BSc CS, MSc CS"],
+    ]}]
+    context = retriever.build_context(chunks, entities, []).text
+    assert "Entity: Dr. Ali | Details: type: Person, title: Chairman, program: BSc CS, MSc CS" in context
+
+
+def test_no_vector_hits_gives_empty_context():
+    retriever = HybridRetriever(FakeGraphManager([]), FakeEmbeddings())
+    assert asyncio.run(retriever.asearch("anything")) == ""
+
+
+def test_expansion_adds_related_facts():
+    records = [{"chunks": [{"id": "c1", "text": "CS offers PhD", "score": 0.8}], "entities": []}]
+    facts = [{"source": "Dr. A", "type": "TEACHES_IN", "target": "Computer Science", "hop": 1}]
+    graph_manager = FakeGraphManager(records, facts)
+    retriever = HybridRetriever(graph_manager, FakeEmbeddings())
+
+    context = asyncio.run(retriever.asearch("Who teaches in CS?"))
+
+    cypher, params = graph_manager.queries[1]
+    assert params["chunk_ids"] == ["c1"] and params["max_nodes"] == retriever.expansion.max_nodes
+    assert "Dr. A -[TEACHES_IN]-> Computer Science" in context
+
+
+def test_expansion_respects_fan_out_degree_and_node_budget():
+    from benchmarks.fakes import HashingEmbeddings, InMemoryGraph
+    from config.settings import ExpansionConfig
+
+    def node(name):
+        return {"id": name, "type": "Entity", "name": name, "properties": {}}
+
+    def edges(source, targets):
+        return [{"source": source, "target": target, "type": "links"} for target in targets]
+
+    hub_neighbours = [f"x{i}" for i in range(10)]
+    others = ["hub", "a1", "a2", "a3", "a4", "b1", "b2"] + hub_neighbours
+    graph = InMemoryGraph()
+    graph.add_chunks([{"id": "c1", "text": "seed", "embedding": None}])
+    graph.add_graph_batch([
+        ({"nodes": [node("seed")], "edges": []}, "c1"),
+        ({"nodes": [node(name) for name in others],
+          "edges": edges("seed", ["hub", "a1", "a2", "a3", "a4"]) + edges("hub", hub_neighbours)
+          + edges("a1", ["b1", "b2"])}, None),
+    ])
+    retriever = HybridRetriever(graph, HashingEmbeddings())
+    retriever.expansion = ExpansionConfig(hops=2, fan_out=3, max_degree=6, max_nodes=4)
+    retriever.expansion_query = build_expansion_query(2)
+
+    facts = asyncio.run(retriever.aexpand(["c1"]))
+
+    # fan_out: only three of the seed's five links are followed
+    first = [f for f in facts if f["hop"] == 1]
+    assert {f["target"] for f in first} == {"hub", "a1", "a2"}
+    # max_degree: the hub is reached but not expanded; max_nodes caps hop 2 at one node
+    second = [f for f in facts if f["hop"] == 2]
+    assert len(second) == 1 and second[0]["source"] == "a1"
+    assert len(facts) == 4
+    assert not any(f["target"].startswith("x") for f in facts)
+
+
+class FakeVectorIndex:
+    def refresh_due(self):
+        return False
+
+    def search(self, embedding, top_k=5):
+        return [{"id": "c1", "score": 0.9}][:top_k]
+
+
+def test_local_backend_looks_up_ranked_chunk_ids():
+    records = [{"chunks": [{"id": "c1", "text": "CS offers BSc", "score": 0.9}], "entities": []}]
+    graph_manager = FakeGraphManager(records)
+    retriever = HybridRetriever(graph_manager, FakeEmbeddings(), vector_index=FakeVectorIndex())
+
+    chunks, _ = asyncio.run(retriever.aretrieve([0.1, 0.2], top_k=3))
+
+    cypher, params = graph_manager.queries[0]
+    assert cypher == LOCAL_RETRIEVAL_QUERY and params["hits"] == [{"id": "c1", "score": 0.9}]
+    assert chunks[0]["id"] == "c1"
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from src.startup import StartupTimer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_settings_are_loaded_on_first_attribute_access(tmp_path):
+    # A fresh interpreter without NEO4J_PASSWORD and away from any .env file:
+    # the import succeeds, and only the first attribute access validates them
+    script = textwrap.dedent("""
+        import config.settings as config_settings
+        from config.settings import settings
+        assert config_settings.get_settings.cache_info().currsize == 0
+        try:
+            settings.general
+        except Exception as e:
+            print(type(e).__name__)
+    """)
+    env = {k: v for k, v in os.environ.items() if k != "NEO4J_PASSWORD"}
+    env["PYTHONPATH"] = ROOT
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "ValidationError"
+
+
+def test_report_labels_steps_inherited_from_the_master():
+    timer = StartupTimer()
+    master = os.getpid() + 1
+    timer.steps.append(("load embedding model", 1.5, master))
+    with timer.step("LLM client"):
+        pass
+
+    lines = timer.report().splitlines()
+    assert lines[0] == f"[Startup] Timing report (pid {os.getpid()}):"
+    assert lines[1].startswith("  load embedding model") and lines[1].endswith(f"1500.0 ms (master {master})")
+    assert lines[2].startswith("  LLM client") and "master" not in lines[2]
+    assert lines[3].startswith("  total since start")
+
+
+def test_supervisor_replaces_workers_that_exit():
+    from main import WorkerSupervisor
+
+    pids = iter(range(100, 200))
+    killed = []
+
+    def stop_then_exit(pid):
+        # SIGTERM reaches the master while it waits
+        def event():
+            supervisor.stop()
+            return pid, 0
+        return event
+
+    # Worker 101 crashes, then the master is stopped and the workers exit
+    events = [lambda: (101, 1 << 8), stop_then_exit(100), lambda: (102, 0)]
+    supervisor = WorkerSupervisor(lambda: next(pids), min_uptime=0, wait=lambda: events.pop(0)(),
+                                  kill=lambda pid, signum: killed.append(pid))
+    supervisor.start(2)
+    assert list(supervisor.children) == [100, 101]
+    supervisor.run()
+
+    # 102 replaced the crashed worker; nothing is re-forked after stop()
+    assert killed == [100, 102]
+    assert supervisor.children == {} and events == []
@@ -0,0 +1,45 @@
+import pytest
+
+from config.settings import ObservabilityConfig
+from src.llm import telemetry
+from src.llm.metrics import Sample, histogram, register_collector, render_prometheus, unregister_collector
+
+TIMINGS = {"embed": (10.0, 10.012), "retrieve": (10.012, 10.042), "generate": (10.042, 10.5)}
+
+
+def test_disabled_records_nothing():
+    telemetry.configure(ObservabilityConfig(enabled=False))
+    telemetry.record_run("chat", TIMINGS)
+
+    assert telemetry.server_timing(TIMINGS) is None
+    assert 'stage="embed"' not in render_prometheus()
+
+
+@pytest.fixture
+def cache_collector():
+    def collect():
+        return [Sample("cache_hits_total", "counter", "Cache hits", {"cache": "answer"}, 3)]
+
+    register_collector(collect)
+    yield collect
+    unregister_collector(collect)
+
+
+def test_stage_timings_reach_header_and_metrics(cache_collector):
+    telemetry.configure(ObservabilityConfig(enabled=True))
+    telemetry.record_run("chat", TIMINGS)
+
+    assert telemetry.server_timing(TIMINGS) == "embed;dur=12.0, retrieve;dur=30.0, generate;dur=458.0, total;dur=500.0"
+    text = render_prometheus()
+    assert "# TYPE chat_stage_seconds histogram" in text
+    assert 'chat_stage_seconds_bucket{pipeline="chat",stage="generate",le="0.5"} 1' in text
+    assert 'chat_stage_seconds_count{pipeline="chat",stage="total"} 1' in text
+    assert 'cache_hits_total{cache="answer"} 3.0' in text
+    assert histogram("chat_stage_seconds", labels={"pipeline": "chat", "stage": "retrieve"}).count == 1
+    telemetry.configure(ObservabilityConfig(enabled=False))
+
+
+def test_unregistered_collectors_are_not_rendered(cache_collector):
+    assert "cache_hits_total" in render_prometheus()
+    unregister_collector(cache_collector)
+    assert "cache_hits_total" not in render_prometheus()
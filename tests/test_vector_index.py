@@ -0,0 +1,193 @@
+from src.llm.vector_index import LocalVectorIndex
+
+
+class FakeGraphManager:
+    def __init__(self):
+        self.version = 1
+        self.chunks = {}  # id -> (embedding, updated_at)
+        self.clock = 1_000_000
+        self.pages_requested = []
+        self.deleted = {}  # id -> deleted_at
+        self.pruned_before = 0
+        self.id_scans = 0
+
+    def put(self, chunk_id, embedding, stamped=True):
+        self.clock += 100_000
+        self.chunks[chunk_id] = (embedding, self.clock if stamped else None)
+
+    def delete(self, chunk_id):
+        self.clock += 100_000
+        del self.chunks[chunk_id]
+        self.deleted[chunk_id] = self.clock
+
+    def get_graph_version(self):
+        return self.version
+
+    def get_chunk_embedding_page(self, updated_after=None, after_id="", limit=2000):
+        self.pages_requested.append(updated_after)
+        rows = [
+            {"id": cid, "embedding": emb, "updated_at": ts}
+            for cid, (emb, ts) in sorted(self.chunks.items())
+            if cid > after_id and (updated_after is None or (ts is not None and ts > updated_after))
+        ]
+        return rows[:limit]
+
+    def get_deleted_chunk_ids(self, deleted_after):
+        if deleted_after < self.pruned_before:
+            return None
+        return {cid for cid, ts in self.deleted.items() if ts > deleted_after}
+
+    def get_embedded_chunk_ids(self):
+        self.id_scans += 1
+        return set(self.chunks)
+
+    def backfill_chunk_timestamps(self, batch_size=10_000):
+        legacy = [cid for cid, (_, ts) in self.chunks.items() if ts is None]
+        for cid in legacy:
+            self.chunks[cid] = (self.chunks[cid][0], self.clock)
+        return len(legacy)
+
+
+def test_sync_search_and_incremental_update(tmp_path):
+    graph = FakeGraphManager()
+    graph.put("a", [1.0, 0.0, 0.0])
+    graph.put("b", [0.0, 1.0, 0.0])
+    graph.put("c", [0.7, 0.7, 0.0])
+
+    index = LocalVectorIndex(str(tmp_path), refresh_interval=0)
+    assert index.refresh(graph)
+    hits = index.search([1.0, 0.1, 0.0], top_k=2)
+    assert [h["id"] for h in hits] == ["a", "c"]
+    assert 0.5 < hits[0]["score"] <= 1.0
+
+    # Same version: nothing is fetched
+    assert not index.refresh(graph)
+
+    graph.version = 2
+    graph.put("d", [0.0, 0.0, 1.0])
+    graph.delete("b")
+    assert index.refresh(graph)
+    assert sorted(index.ids) == ["a", "c", "d"]
+    # Incremental: the second sync only asked for recently updated chunks,
+    # and found the deletion from its tombstone
+    assert graph.pages_requested[-1] is not None
+    assert graph.id_scans == 0
+
+    # Another worker maps the same files read-only
+    other = LocalVectorIndex(str(tmp_path))
+    assert other.graph_version == 2
+    assert other.search([0.0, 0.0, 1.0], top_k=1)[0]["id"] == "d"
+
+
+def test_empty_index_returns_no_hits(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    assert index.search([1.0, 0.0], top_k=3) == []
+
+
+def test_quantized_search_matches_exact_top_k(tmp_path):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    graph = FakeGraphManager()
+    vectors = rng.normal(size=(500, 384))
+    for i, vector in enumerate(vectors):
+        graph.put(f"c{i:03d}", vector.tolist())
+    # Queries near stored chunks, as with real questions
+    queries = vectors[:10] + rng.normal(scale=0.5, size=(10, 384))
+
+    exact = LocalVectorIndex(str(tmp_path / "exact"))
+    exact.sync(graph)
+    for quantization in ("int8", "binary"):
+        index = LocalVectorIndex(str(tmp_path / quantization), quantization=quantization, rescore_factor=10)
+        index.sync(graph)
+        assert index.manifest["codes_file"].endswith(quantization)
+        for query in queries:
+            expected = exact.search(query, top_k=5)
+            found = index.search(query, top_k=5)
+            assert found[0] == expected[0]
+            if quantization == "int8":
+                assert [h["id"] for h in found] == [h["id"] for h in expected]
+
+
+def test_workers_sync_one_generation_at_a_time(tmp_path):
+    import threading
+    import time
+
+    graph = FakeGraphManager()
+    graph.put("a", [1.0, 0.0])
+    get_page = graph.get_chunk_embedding_page
+
+    def slow_page(**kwargs):
+        time.sleep(0.05)
+        return get_page(**kwargs)
+
+    graph.get_chunk_embedding_page = slow_page
+    # Two prefork workers: separate index objects over one directory
+    workers = [LocalVectorIndex(str(tmp_path)) for _ in range(2)]
+    results = []
+    threads = [threading.Thread(target=lambda w=w: results.append(w.refresh(graph))) for w in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The worker that waited loads the generation the other one wrote
+    assert sorted(results) == [False, True]
+    assert graph.pages_requested == [None, None]
+    assert workers[0].manifest["generation"] == workers[1].manifest["generation"]
+    assert workers[1].search([1.0, 0.0], top_k=1)[0]["id"] == "a"
+
+
+def test_background_refresh_is_scheduled_once(tmp_path):
+    import asyncio
+
+    graph = FakeGraphManager()
+    graph.put("a", [1.0, 0.0])
+    index = LocalVectorIndex(str(tmp_path), refresh_interval=0)
+
+    async def schedule():
+        assert index.refresh_due()
+        job = index.refresh_in_background(graph)
+        # Marked before the executor picks the job up
+        assert not index.refresh_due()
+        return await job
+
+    assert asyncio.run(schedule())
+    assert index.refresh_due()
+
+
+def test_legacy_chunks_are_stamped_once_and_pruned_tombstones_rescan(tmp_path):
+    graph = FakeGraphManager()
+    graph.put("a", [1.0, 0.0], stamped=False)
+    graph.put("b", [0.0, 1.0])
+    index = LocalVectorIndex(str(tmp_path))
+    index.sync(graph)
+    assert sorted(index.ids) == ["a", "b"]
+
+    # The legacy chunk got a stamp, so once past the overlap window it is
+    # no longer fetched as changed
+    fetched = []
+    get_page = graph.get_chunk_embedding_page
+
+    def recording_page(**kwargs):
+        page = get_page(**kwargs)
+        fetched.extend(row["id"] for row in page)
+        return page
+
+    graph.get_chunk_embedding_page = recording_page
+    for version, chunk_id in ((2, "c"), (3, "d")):
+        graph.version = version
+        graph.put(chunk_id, [1.0, 1.0])
+        fetched.clear()
+        index.sync(graph)
+    # c is still within the overlap window of the last watermark
+    assert fetched == ["c", "d"]
+
+    # Tombstones older than the watermark were pruned: the deletion is found by an id scan
+    graph.version = 4
+    graph.delete("b")
+    graph.deleted.clear()
+    graph.pruned_before = graph.clock
+    index.sync(graph)
+    assert sorted(index.ids) == ["a", "c", "d"]
+    assert graph.id_scans == 1